@@ -0,0 +1,236 @@
+"""
+Micro-benchmark of the client side cost of a request.
+
+Sends requests to a fake session answering at once, so that only the
+work done by salvo around each request is measured:
+
+- legacy: the request function before salvo.request, looking up the
+  options of the run with molotov.get_var for every request
+- general: the compiled function used when optional features are on
+- basic: the compiled function used when they are all off
+
+Then sends requests through the session a salvo worker gets, set up by
+salvo.scenario.init_worker, to an aiohttp server running in another
+process, so that the cost of aiohttp and of its request tracing is
+measured too:
+
+- session: the default session, without tracing
+- phases: the session of --phases, with its trace hooks
+
+Run it with ``python benchmarks/hotpath.py``.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import time
+
+import molotov
+from aiohttp import ClientResponseError, web
+from molotov.session import LoggedClientSession
+
+from salvo.connector import SharedConnector
+from salvo.monitor import LoopMonitor
+from salvo.output import RunResults
+from salvo.request import _request, compile_request
+from salvo.scenario import close_worker, init_worker
+
+
+class FakeResponse(object):
+    status = 200
+    content_length = 0
+
+
+class FakeContext(object):
+    async def __aenter__(self):
+        return FakeResponse()
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class FakeSession(object):
+    worker_id = 0
+
+    def request(self, method, url, **options):
+        return FakeContext()
+
+    def get(self, url, **options):
+        return FakeContext()
+
+
+async def legacy_request(session):
+    url = molotov.get_var("url")
+    res = molotov.get_var("results")
+    meth = molotov.get_var("method")
+    options = {}
+    pre_hook = molotov.get_var("pre_hook")
+    if pre_hook is not None:
+        meth, url, options = pre_hook(meth, url, options)
+
+    post_hook = molotov.get_var("post_hook")
+    data = molotov.get_var("data")
+    if data:
+        if callable(data):
+            options["data"] = data(meth, url, options)
+        else:
+            options["data"] = data
+
+    meth = getattr(session, meth.lower())
+    start = time.perf_counter()
+    try:
+        async with meth(url, raise_for_status=True, **options) as resp:
+            if post_hook is not None:
+                resp = await post_hook(resp)
+            res.incr(resp.status, time.perf_counter() - start, start)
+    except ClientResponseError as exc:
+        res.incr(exc.status, time.perf_counter() - start, start)
+
+
+def _variants(url):
+    molotov.set_var("url", url)
+    molotov.set_var("method", "GET")
+    molotov.set_var("pre_hook", None)
+    molotov.set_var("post_hook", None)
+    molotov.set_var("data", None)
+
+    def legacy(res):
+        molotov.set_var("results", res)
+        return legacy_request
+
+    def general(res):
+        return _request(url, "GET", res)
+
+    def basic(res):
+        return compile_request(url, "GET", res)
+
+    return [("legacy", legacy), ("general", general), ("basic", basic)]
+
+
+async def _send(request, session, count):
+    for _ in range(count):
+        await request(session)
+
+
+def measure(build, count):
+    """Returns the CPU seconds per request of a request function."""
+    res = RunResults(num=None, quiet=True)
+    request = build(res)
+    loop = asyncio.new_event_loop()
+    try:
+        session = FakeSession()
+        # warms up the caches and the histograms
+        loop.run_until_complete(_send(request, session, count // 10))
+        start = time.process_time()
+        loop.run_until_complete(_send(request, session, count))
+        return (time.process_time() - start) / count
+    finally:
+        loop.close()
+
+
+def _serve(port):
+    async def _hello(request):
+        return web.Response(body=b"x" * 1024)
+
+    app = web.Application()
+    app.router.add_get("/", _hello)
+    web.run_app(app, host="127.0.0.1", port=port, print=None)
+
+
+def _start_server(port):
+    job = multiprocessing.Process(target=_serve, args=(port,), daemon=True)
+    job.start()
+    start = time.time()
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return job
+        except OSError:
+            if time.time() - start > 10:
+                job.terminate()
+                raise
+            time.sleep(0.1)
+
+
+async def _send_concurrently(request, session, count, concurrency):
+    await asyncio.gather(
+        *[_send(request, session, count // concurrency) for _ in range(concurrency)]
+    )
+
+
+def measure_session(url, phases, count, concurrency):
+    """Returns the CPU seconds per request sent through a worker session."""
+    res = RunResults(num=None, quiet=True, phases=phases)
+    # what salvo.scenario.run_test sets up for init_worker
+    molotov.set_var("results", res)
+    molotov.set_var("monitor", LoopMonitor(res))
+    molotov.set_var("auth", None)
+    molotov.set_var("content_type", None)
+    molotov.set_var("connector", SharedConnector({}, connections=res.connections))
+    request = compile_request(url, "GET", res)
+
+    async def _measure():
+        options = await init_worker(0, None)
+        loop = asyncio.get_event_loop()
+        async with LoggedClientSession(loop, None, **options) as session:
+            session.worker_id = 0
+            await _send_concurrently(request, session, count // 10, concurrency)
+            start = time.process_time()
+            await _send_concurrently(request, session, count, concurrency)
+            cost = (time.process_time() - start) / count
+        await close_worker(0, session)
+        return cost
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(_measure())
+    finally:
+        loop.close()
+
+
+def _report(name, cost, baseline):
+    print("%-10s%8.2f us/request%8.0f%%" % (name, cost * 1e6, cost / baseline * 100))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("-n", "--requests", type=int, default=200000)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument(
+        "--session-requests",
+        type=int,
+        default=20000,
+        help="Requests sent through the worker sessions",
+    )
+    parser.add_argument("-c", "--concurrency", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    baseline = None
+    for name, build in _variants("http://localhost:8080/"):
+        cost = min(measure(build, args.requests) for _ in range(args.repeat))
+        if baseline is None:
+            baseline = cost
+        _report(name, cost, baseline)
+
+    url = "http://127.0.0.1:%d/" % args.port
+    job = _start_server(args.port)
+    try:
+        baseline = None
+        for name, phases in (("session", False), ("phases", True)):
+            cost = min(
+                measure_session(url, phases, args.session_requests, args.concurrency)
+                for _ in range(args.repeat)
+            )
+            if baseline is None:
+                baseline = cost
+            _report(name, cost, baseline)
+    finally:
+        job.terminate()
+        job.join()
+
+
+if __name__ == "__main__":
+    main()
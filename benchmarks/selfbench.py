@@ -0,0 +1,231 @@
+"""
+Self-benchmark measuring how fast salvo itself can go.
+
+Runs salvo against the stand-in server of benchmarks/server.py, which
+answers much faster than salvo can ask, for each combination of
+concurrency and process count, and reports for each run:
+
+- the requests per second salvo sustained
+- the CPU time, user and system, spent by salvo per request
+- its peak memory, and the memory per request above an idle run
+
+Results can be saved in a JSON file and compared to a previous one, in
+which case runs slower than the baseline by more than the tolerance are
+reported and the exit code is 1::
+
+    python benchmarks/selfbench.py --save benchmarks/results/base.json
+    python benchmarks/selfbench.py --compare benchmarks/results/base.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import urllib.request
+
+import server
+from salvo import __version__
+
+
+def _parse_levels(value):
+    return [int(level) for level in value.split(",")]
+
+
+def run_salvo(
+    url, concurrency, processes, duration=None, requests=None, loop="asyncio"
+):
+    """Runs salvo in a subprocess and returns its JSON results and usage."""
+    command = [sys.executable, "-m", "salvo.run", url, "--json-output", "-q"]
+    command += ["--loop", loop]
+    command += ["-c", str(concurrency), "-p", str(processes)]
+    if duration is not None:
+        command += ["-d", str(duration)]
+    else:
+        command += ["-n", str(requests)]
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE)
+    output = proc.stdout.read()
+    proc.stdout.close()
+    # wait4 gives the usage of salvo and of its own processes
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+    if proc.returncode != 0:
+        raise Exception("salvo exited with %d" % proc.returncode)
+    return json.loads(output.decode().strip().splitlines()[-1]), usage
+
+
+def _max_rss(usage):
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    if sys.platform == "darwin":
+        return usage.ru_maxrss
+    return usage.ru_maxrss * 1024
+
+
+def measure(url, concurrency, processes, duration, idle_rss, loop="asyncio"):
+    results, usage = run_salvo(
+        url, concurrency, processes, duration=duration, loop=loop
+    )
+    count = results["count"]
+    max_rss = _max_rss(usage)
+    return {
+        "concurrency": concurrency,
+        "processes": processes,
+        # the loop actually used, salvo falls back on asyncio
+        "loop": results["loop"],
+        "requests": count,
+        "rps": results["rps"],
+        "p99": results["percentiles"]["p99"],
+        "cpu_per_request": (usage.ru_utime + usage.ru_stime) / max(count, 1),
+        "max_rss": max_rss,
+        "memory_per_request": max(max_rss - idle_rss, 0) / max(count, 1),
+    }
+
+
+def _key(run):
+    # results saved before --loop ran on asyncio
+    return run.get("loop", "asyncio"), run["processes"], run["concurrency"]
+
+
+def compare(results, baseline, tolerance):
+    """Returns the regressions of `results` over `baseline`.
+
+    Only the runs with the same event loop, processes and concurrency are
+    compared.
+    """
+    previous = {_key(run): run for run in baseline}
+    regressions = []
+    for run in results:
+        before = previous.get(_key(run))
+        if before is None:
+            continue
+        name = "%s -p %d -c %d" % _key(run)
+        if run["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(
+                "%s: %.0f requests per second, down from %.0f"
+                % (name, run["rps"], before["rps"])
+            )
+        if run["cpu_per_request"] > before["cpu_per_request"] * (1 + tolerance):
+            regressions.append(
+                "%s: %.1f us of CPU per request, up from %.1f"
+                % (name, run["cpu_per_request"] * 1e6, before["cpu_per_request"] * 1e6)
+            )
+    return regressions
+
+
+def _wait_for(url, timeout=10):
+    start = time.time()
+    while True:
+        try:
+            urllib.request.urlopen(url).read()
+            return
+        except OSError:
+            if time.time() - start > timeout:
+                raise
+            time.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("\n\n", 1)[1],
+    )
+    parser.add_argument(
+        "-c", "--concurrency", type=_parse_levels, default=[1, 10, 50, 200]
+    )
+    parser.add_argument("-p", "--processes", type=_parse_levels, default=[1, 2, 4])
+    parser.add_argument("-d", "--duration", type=int, default=5)
+    parser.add_argument(
+        "--path",
+        default="/size/1024",
+        help="Path of the stand-in server to hit, eg. /stream/65536?delay=5",
+    )
+    parser.add_argument("--loop", choices=("asyncio", "uvloop"), default="asyncio")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--server-processes", type=int, default=max(os.cpu_count() // 2, 1)
+    )
+    parser.add_argument("--save", help="Saves the results in this JSON file")
+    parser.add_argument("--compare", help="JSON results to compare with")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Relative slow down reported as a regression, 0.1 by default",
+    )
+    args = parser.parse_args()
+
+    url = "http://127.0.0.1:%d%s" % (args.port, args.path)
+    jobs = server.start(port=args.port, processes=args.server_processes)
+    try:
+        _wait_for(url)
+        _, usage = run_salvo(url, 1, 1, requests=1, loop=args.loop)
+        idle_rss = _max_rss(usage)
+
+        print(
+            "%10s%12s%12s%12s%10s%12s%12s"
+            % (
+                "Processes",
+                "Concurrency",
+                "Requests",
+                "RPS",
+                "CPU/req",
+                "Max RSS",
+                "Mem/req",
+            )
+        )
+        results = []
+        for processes in args.processes:
+            for concurrency in args.concurrency:
+                if concurrency < processes:
+                    continue
+                run = measure(
+                    url, concurrency, processes, args.duration, idle_rss, args.loop
+                )
+                results.append(run)
+                print(
+                    "%10d%12d%12d%12.0f%7.1f us%9.1f MB%10.0f B"
+                    % (
+                        processes,
+                        concurrency,
+                        run["requests"],
+                        run["rps"],
+                        run["cpu_per_request"] * 1e6,
+                        run["max_rss"] / 1e6,
+                        run["memory_per_request"],
+                    )
+                )
+    finally:
+        server.stop(jobs)
+
+    report = {
+        "salvo": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "loop": results[0]["loop"] if results else args.loop,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "path": args.path,
+        "duration": args.duration,
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print("\nRegressions over %s:" % args.compare)
+            for regression in regressions:
+                print("  " + regression)
+            sys.exit(1)
+        print("\nNo regression over %s" % args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Fast stand-in HTTP server for the self-benchmarks.
+
+A bare asyncio protocol answering keep-alive HTTP/1.1 requests with
+prebuilt responses, in one or more processes sharing the port, so that
+the server is never what limits salvo:
+
+- ``/`` and ``/size/N`` answer with a body of N bytes, 2 by default
+- ``/stream/N`` sends N bytes with a chunked transfer encoding
+- a ``delay=MS`` query waits this many milliseconds before answering
+- ``HEAD`` requests get the headers of the same response, without body
+
+Run it with ``python benchmarks/server.py --port 8080``.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+
+
+CHUNK_SIZE = 16 * 1024
+_OK = b"HTTP/1.1 200 OK\r\nServer: salvo-bench\r\n"
+_NOT_FOUND = b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n"
+
+
+def _fixed(size):
+    return _OK + b"Content-Length: %d\r\n\r\n" % size + b"x" * size
+
+
+def _chunked(size):
+    parts = [_OK + b"Transfer-Encoding: chunked\r\n\r\n"]
+    while size > 0:
+        chunk = min(size, CHUNK_SIZE)
+        parts.append(b"%x\r\n" % chunk + b"x" * chunk + b"\r\n")
+        size -= chunk
+    parts.append(b"0\r\n\r\n")
+    return b"".join(parts)
+
+
+_KINDS = {"size": _fixed, "stream": _chunked}
+_responses = {}
+
+
+def response(target):
+    """Returns the response to a request target and its delay in seconds."""
+    path, _, query = target.partition(b"?")
+    delay = 0.0
+    for option in query.split(b"&"):
+        name, _, value = option.partition(b"=")
+        if name == b"delay":
+            delay = float(value) / 1000
+    cached = _responses.get(path)
+    if cached is None:
+        parts = path.strip(b"/").split(b"/")
+        try:
+            if parts == [b""]:
+                cached = _fixed(2)
+            elif len(parts) == 2 and parts[0].decode() in _KINDS:
+                cached = _KINDS[parts[0].decode()](int(parts[1]))
+            else:
+                cached = _NOT_FOUND
+        except ValueError:
+            cached = _NOT_FOUND
+        _responses[path] = cached
+    return cached, delay
+
+
+class HTTPProtocol(asyncio.Protocol):
+    def connection_made(self, transport):
+        self.transport = transport
+        self.buffer = b""
+
+    def data_received(self, data):
+        self.buffer += data
+        while True:
+            end = self.buffer.find(b"\r\n\r\n")
+            if end == -1:
+                return
+            request, *headers = self.buffer[:end].split(b"\r\n")
+            length = 0
+            close = request.endswith(b"HTTP/1.0")
+            for line in headers:
+                name, _, value = line.partition(b":")
+                name = name.strip().lower()
+                if name == b"content-length":
+                    length = int(value)
+                elif name == b"connection":
+                    close = value.strip().lower() == b"close"
+            size = end + 4 + length
+            if len(self.buffer) < size:
+                return
+            self.buffer = self.buffer[size:]
+            method, target = request.split(b" ")[:2]
+            self._respond(target, method == b"HEAD", close)
+
+    def _respond(self, target, head, close):
+        data, delay = response(target)
+        if head:
+            # the headers only, Content-Length still gives the body size
+            data = data[: data.find(b"\r\n\r\n") + 4]
+        if delay > 0:
+            asyncio.get_event_loop().call_later(delay, self._write, data, close)
+        else:
+            self._write(data, close)
+
+    def _write(self, data, close):
+        if self.transport.is_closing():
+            return
+        self.transport.write(data)
+        if close:
+            self.transport.close()
+
+
+def _serve(host, port):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    server = loop.run_until_complete(
+        loop.create_server(HTTPProtocol, sock=sock, backlog=1024)
+    )
+    loop.add_signal_handler(signal.SIGTERM, loop.stop)
+    try:
+        loop.run_forever()
+    finally:
+        server.close()
+        loop.close()
+
+
+def start(host="127.0.0.1", port=8080, processes=1):
+    """Starts the server in `processes` processes and returns them."""
+    jobs = []
+    for _ in range(processes):
+        job = multiprocessing.Process(target=_serve, args=(host, port))
+        job.daemon = True
+        job.start()
+        jobs.append(job)
+    return jobs
+
+
+def stop(jobs):
+    for job in jobs:
+        if job.is_alive():
+            os.kill(job.pid, signal.SIGTERM)
+    for job in jobs:
+        job.join(timeout=5)
+        if job.is_alive():
+            job.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("-p", "--processes", type=int, default=1)
+    args = parser.parse_args()
+    if args.processes == 1:
+        _serve(args.host, args.port)
+    else:
+        jobs = start(args.host, args.port, args.processes)
+        try:
+            for job in jobs:
+                job.join()
+        except KeyboardInterrupt:
+            stop(jobs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Early abort of a run breaking its rules, see ``--abort-on``.
+
+A rule bounds a latency or the error rate over a sliding window of the
+last seconds of the run, e.g. ``p99>500ms over 10s`` or ``errors>5%``.
+The window is made of the last completed intervals of the time series
+(see salvo.timeseries), checked by a thread each time one completes.
+When a rule breaks, the run stops like at the end of its duration and
+salvo exits with EXIT_ABORTED.
+"""
+
+import math
+import re
+import threading
+import time
+from collections import namedtuple
+
+from molotov import util
+
+from salvo.capacity import UNITS, parse_error_rate
+from salvo.histogram import Histogram, percentile_label
+
+
+Rule = namedtuple("Rule", ["spec", "label", "percentile", "threshold", "window"])
+
+# the process exit code of an aborted run, report uses 1 and 2
+EXIT_ABORTED = 3
+# seconds of the window of a rule without "over"
+DEFAULT_WINDOW = 10.0
+# requests a window needs before its rules are checked
+MIN_REQUESTS = 10
+# seconds between two checks for a completed interval
+POLL_INTERVAL = 0.1
+
+_RULE = re.compile(
+    r"^\s*(p\d+(?:\.\d+)?|max|avg|errors)\s*>\s*(\d+(?:\.\d+)?\s*(?:us|ms|s|%)?)"
+    r"\s*(?:over\s+(\d+(?:\.\d+)?)\s*s)?\s*$"
+)
+_LATENCY = re.compile(r"^(\d+(?:\.\d+)?)\s*(us|ms|s)$")
+
+
+def parse_rule(spec):
+    """Parses an abort rule such as ``p99>500ms over 10s`` or ``errors>5%``."""
+    match = _RULE.match(spec)
+    if match is None:
+        raise ValueError(
+            "Malformed abort rule %r, expected something like "
+            "'p99>500ms over 10s' or 'errors>5%%'" % spec
+        )
+    label, value, window = match.groups()
+    window = DEFAULT_WINDOW if window is None else float(window)
+    if window <= 0:
+        raise ValueError("The window of %r must be positive" % spec)
+
+    if label == "errors":
+        return Rule(spec.strip(), label, None, parse_error_rate(value), window)
+    latency = _LATENCY.match(value)
+    if latency is None:
+        raise ValueError("The latency of %r needs a unit, us, ms or s" % spec)
+    threshold = float(latency.group(1)) * UNITS[latency.group(2)]
+    if label == "avg":
+        percentile = None
+    else:
+        percentile = 100.0 if label == "max" else float(label[1:])
+        if percentile > 100:
+            raise ValueError("Percentiles go up to 100")
+        label = percentile_label(percentile)
+    return Rule(spec.strip(), label, percentile, threshold, window)
+
+
+class AbortWatcher(object):
+    """Stops the run of `results` when one of `rules` breaks.
+
+    The rules are checked each time an interval of the time series is
+    over, on the last intervals covering their window, once the run has
+    lasted that long and the window holds MIN_REQUESTS requests. Errors
+    are the HTTP errors and the requests that got no response.
+
+    The reason of the abort goes to `results.aborted`.
+    """
+
+    def __init__(self, results, rules):
+        self.results = results
+        self.rules = rules
+        # intervals completed at the last check
+        self.index = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._poll)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+
+    def _poll(self):
+        while not self._stopped.wait(POLL_INTERVAL):
+            if self.check() is not None:
+                util.stop()
+                return
+
+    def _window(self, end, seconds):
+        # the intervals covering `seconds` before the interval `end`
+        series = self.results.timeseries
+        size = int(math.ceil(seconds / series.interval - 1e-9))
+        start = end - size
+        if start < 0:
+            return None
+        histogram = Histogram(significant_figures=series.significant_figures)
+        errors = failed = 0
+        for bucket in series.buckets[start:end]:
+            if bucket is not None:
+                histogram.merge(bucket.histogram)
+                errors += bucket.errors
+                failed += bucket.failed
+        return histogram, errors, failed
+
+    def _broken(self, rule, end):
+        window = self._window(end, rule.window)
+        if window is None:
+            return None
+        histogram, errors, failed = window
+        total = histogram.count + failed
+        if total < MIN_REQUESTS:
+            return None
+        if rule.label == "errors":
+            value = float(errors + failed) / total
+            if value > rule.threshold:
+                return "%.2f%% of errors" % (value * 100)
+            return None
+        if not histogram.count:
+            return None
+        if rule.percentile is None:
+            value = histogram.mean
+        else:
+            value = histogram.value_at_percentile(rule.percentile)
+        if value > rule.threshold:
+            return "%s of %.4f s" % (rule.label, value)
+        return None
+
+    def check(self, now=None):
+        """Checks the rules on the intervals completed at `now`.
+
+        `now` is a perf_counter() value. Returns the reason of the abort,
+        also set in `results.aborted`, or None.
+        """
+        series = self.results.timeseries
+        if series.origin is None or self.results.aborted is not None:
+            return self.results.aborted
+        if now is None:
+            now = time.perf_counter()
+        end = int((now - series.origin) / series.interval)
+        if end <= self.index:
+            return None
+        self.index = end
+        for rule in self.rules:
+            broken = self._broken(rule, end)
+            if broken is not None:
+                self.results.aborted = "%s: %s over the last %g s" % (
+                    rule.spec,
+                    broken,
+                    rule.window,
+                )
+                return self.results.aborted
+        return None
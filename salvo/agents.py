@@ -0,0 +1,572 @@
+"""
+Distributed load generation.
+
+``salvo agent`` listens on a TCP port for the loads of a coordinator,
+``salvo --agents host:port,...``, which splits its concurrency across
+the agents like it does across processes:
+
+1. the coordinator sends its command line and the share of each agent
+2. the agents parse it, prepare the run and answer they are ready
+3. once they all are, the coordinator sends them a common start time
+4. the agents send their progress, requests done and abort reason,
+   every AGENT_PROGRESS_INTERVAL seconds, a checkpoint of their results (see
+   salvo.output.RunResults.snapshot) every CHECKPOINT_INTERVAL seconds,
+   then their final results, which the coordinator merges
+
+When the coordinator exports live metrics, the progress messages carry
+the intervals of the time series completed since the previous one too.
+
+Checkpoints only matter when an agent is lost, its results then stop
+at its last one. When an agent aborts its run on an --abort-on rule,
+the coordinator sends a stop message to the others.
+
+Messages are JSON objects, one per line. An agent started with
+``--token`` only runs the loads carrying the same token. It refuses the
+options running code of the coordinator, the hooks and the ``py:``
+callables, unless started with ``--allow-hooks``, and the ones reading
+or writing its files unless started with ``--allow-files``. The files
+and modules given in the options must exist on the agents, and their
+clocks need to be synchronized, with NTP for instance, for their results
+to line up.
+"""
+
+import argparse
+import contextlib
+import hmac
+import io
+import json
+import queue as _queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+
+from molotov import util
+
+from salvo.export import LiveSeries, completed_intervals
+from salvo.output import RunResults
+from salvo.processes import PROGRESS_INTERVAL, merge_molotov_results, split
+from salvo.trace import process_path
+from salvo.util import warmup_requests
+
+
+DEFAULT_PORT = 8877
+# seconds between two progress messages of an agent
+AGENT_PROGRESS_INTERVAL = 1.0
+# seconds between two checkpoints of the results of an agent, a full
+# snapshot growing with the length of the run
+CHECKPOINT_INTERVAL = 30.0
+# seconds between the start message and the start of the run
+START_DELAY = 1.0
+CONNECT_TIMEOUT = 5.0
+# seconds without news of a running agent before giving up on it
+LOST_TIMEOUT = 10 * AGENT_PROGRESS_INTERVAL
+# options running code given by the coordinator, and the ones touching
+# the files of the agent, by attribute of the parsed options
+HOOK_OPTIONS = {"pre_hook": "--pre-hook", "post_hook": "--post-hook"}
+FILE_OPTIONS = {
+    "payloads": "--payloads",
+    "scenario_file": "--scenario-file",
+    "trace_file": "--trace-file",
+}
+
+
+class AgentError(Exception):
+    """An agent could not be reached or did not accept the load."""
+
+
+def parse_agents(spec):
+    """Parses ``host:port,host:port`` into a list of (host, port) tuples."""
+    agents = []
+    for agent in spec.split(","):
+        host, sep, port = agent.strip().rpartition(":")
+        if not sep or not host or not port.isdigit():
+            raise ValueError("An agent must be of the form host:port, not %r" % agent)
+        agents.append((host, int(port)))
+    return agents
+
+
+def _clock_offset():
+    # moves perf_counter() values to the wall clock shared by the agents
+    return time.time() - time.perf_counter()
+
+
+def _encode(message):
+    return (json.dumps(message) + "\n").encode("utf-8")
+
+
+# agent side
+
+
+def _stream_progress(res, send, stopped, live=False):
+    # with `live`, the intervals completed go to the live metrics, from
+    # the processes of the agent when it runs several
+    if res.live is not None:
+        series, clock = res.live.timeseries, res.live.clock
+    else:
+        series, clock = res.timeseries, time.perf_counter
+    start = 0
+    checkpoint = time.perf_counter() + CHECKPOINT_INTERVAL
+    while not stopped.wait(AGENT_PROGRESS_INTERVAL):
+        try:
+            if time.perf_counter() >= checkpoint:
+                checkpoint += CHECKPOINT_INTERVAL
+                snapshot = res.snapshot(_clock_offset())
+                send({"type": "checkpoint", "results": snapshot})
+                continue
+            progress = {"type": "progress", "done": res.done, "aborted": res.aborted}
+            if live:
+                # the processes of the agent may not have started yet
+                now = clock() if series.origin is not None else time.perf_counter()
+                progress["live"], start = completed_intervals(
+                    series, start, now, _clock_offset()
+                )
+            send(progress)
+        except OSError:
+            # the coordinator is gone, nobody waits for the results
+            util.stop()
+            return
+    if live:
+        progress = {"type": "progress", "done": res.done, "aborted": res.aborted}
+        progress["live"], start = completed_intervals(
+            series, start, None, _clock_offset(), final=True
+        )
+        try:
+            send(progress)
+        except OSError:
+            pass
+
+
+def _wait_stop(receive):
+    try:
+        message = receive()
+    except (OSError, ValueError):
+        return
+    if message is not None and message.get("type") == "stop":
+        util.stop()
+
+
+def refused_options(argv, allow_hooks=False, allow_files=False):
+    """Returns the options of `argv` an agent refuses to run.
+
+    The hooks and ``py:`` callables run code of the coordinator, unless
+    `allow_hooks`, and the payloads, scenario and trace files read or
+    write the files of the agent, unless `allow_files`. Replays, which
+    read a log, are always refused: they can't run on agents.
+    """
+    from salvo.run import build_parser
+
+    if argv[:1] == ["replay"]:
+        return ["replay"]
+    # parsed without checks, which already read files and call callables
+    args = build_parser().parse_args(argv)
+    refused = []
+    if not allow_hooks:
+        refused += [
+            option for name, option in HOOK_OPTIONS.items() if getattr(args, name)
+        ]
+        if args.data is not None and args.data.startswith("py:"):
+            refused.append("--data py:")
+    if not allow_files:
+        refused += [
+            option for name, option in FILE_OPTIONS.items() if getattr(args, name)
+        ]
+    return refused
+
+
+def run_load(request, send, receive, allow_hooks=False, allow_files=False):
+    """Runs the load of a coordinator `request`.
+
+    `send` sends a message to the coordinator and `receive` waits for the
+    next one. See refused_options for `allow_hooks` and `allow_files`.
+    """
+    from salvo.run import parse_args
+
+    output = io.StringIO()
+    try:
+        # errors are printed by parse_args, for the coordinator to show
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            refused = refused_options(request["argv"], allow_hooks, allow_files)
+            if not refused:
+                args = parse_args(request["argv"])
+    except SystemExit:
+        send({"type": "error", "error": output.getvalue().strip()})
+        return
+    if refused:
+        send(
+            {
+                "type": "error",
+                "error": "The agent refuses %s, see salvo agent --help"
+                % ", ".join(refused),
+            }
+        )
+        return
+    args.agents = None
+    args.quiet = True
+    args.concurrency = request["concurrency"]
+    args.rate = request["rate"]
+    if args.trace_file is not None:
+        # agents may share a machine
+        args.trace_file = process_path(args.trace_file, request["index"])
+
+    res = RunResults(
+        num=None,
+        quiet=True,
+        significant_figures=args.precision,
+        rate=args.rate,
+        profile=args.profile,
+        interval=args.interval,
+        phases=args.phases,
+        endpoints=[endpoint.name for endpoint in args.endpoints],
+        loop=args.loop,
+        warmup=args.warmup,
+        warmup_requests=warmup_requests(args),
+    )
+    live = args.statsd is not None or args.prometheus_port is not None
+    if args.processes > 1:
+        from salvo.processes import run_processes as run_test
+
+        if live:
+            res.live = LiveSeries(args.interval)
+    else:
+        from salvo.scenario import run_test
+
+    send({"type": "ready"})
+    start = receive()
+    if start is None or start.get("type") != "start":
+        return
+    delay = start["at"] - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+    stopped = threading.Event()
+    streamer = threading.Thread(
+        target=_stream_progress, args=(res, send, stopped, live)
+    )
+    streamer.daemon = True
+    streamer.start()
+    # another agent may abort the run, nothing else comes until the end
+    waiter = threading.Thread(target=_wait_stop, args=(receive,))
+    waiter.daemon = True
+    waiter.start()
+    # Molotov replaces them to stop its run, and leaves them behind
+    handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        molotov_res = run_test(args.url, res, args)
+    except (Exception, SystemExit):
+        result = {"type": "error", "error": traceback.format_exc()}
+    else:
+        result = {
+            "type": "done",
+            "results": res.snapshot(_clock_offset()),
+            "molotov": molotov_res,
+        }
+    finally:
+        for sig, handler in handlers.items():
+            signal.signal(sig, handler)
+        stopped.set()
+        streamer.join()
+    send(result)
+    return res
+
+
+class AgentHandler(socketserver.StreamRequestHandler):
+    """Runs the load of the coordinator connected."""
+
+    def handle(self):
+        lock = threading.Lock()
+
+        def send(message):
+            with lock:
+                self.wfile.write(_encode(message))
+                self.wfile.flush()
+
+        def receive():
+            line = self.rfile.readline()
+            return json.loads(line) if line else None
+
+        try:
+            request = receive()
+            if request is None or request.get("type") != "run":
+                return
+            token = self.server.token
+            if token is not None and not hmac.compare_digest(
+                str(request.get("token")), token
+            ):
+                print("Refused a load of %s:%d, wrong token" % self.client_address[:2])
+                send({"type": "error", "error": "Wrong agent token"})
+                return
+            print("Running a load of %s:%d" % self.client_address[:2])
+            res = run_load(
+                request,
+                send,
+                receive,
+                allow_hooks=self.server.allow_hooks,
+                allow_files=self.server.allow_files,
+            )
+        except (OSError, ValueError) as e:
+            print("Lost the coordinator: %s" % e)
+            return
+        if res is not None:
+            print("Done, %d requests" % res.done)
+
+
+class AgentServer(socketserver.TCPServer):
+    allow_reuse_address = True
+
+    def __init__(self, address, token=None, allow_hooks=False, allow_files=False):
+        socketserver.TCPServer.__init__(self, address, AgentHandler)
+        self.token = token
+        self.allow_hooks = allow_hooks
+        self.allow_files = allow_files
+
+
+def agent_main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="salvo agent",
+        description="Runs the loads of a salvo coordinator, see --agents.",
+    )
+    parser.add_argument(
+        "--host",
+        help=(
+            "Address to listen on, 0.0.0.0 for all the interfaces. The "
+            "agent runs the loads it is sent, protect it with --token "
+            "and only listen on trusted networks"
+        ),
+        default="127.0.0.1",
+    )
+    parser.add_argument(
+        "--port", help="Port to listen on", type=int, default=DEFAULT_PORT
+    )
+    parser.add_argument(
+        "--token",
+        help="Only runs the loads of coordinators given this --agent-token",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--allow-hooks",
+        help=(
+            "Runs the loads using --pre-hook, --post-hook or a --data py: "
+            "callable, which import and call code named by the coordinator"
+        ),
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--allow-files",
+        help=(
+            "Runs the loads using --payloads, --scenario-file or "
+            "--trace-file, which read or write files of the agent"
+        ),
+        action="store_true",
+        default=False,
+    )
+    args = parser.parse_args(argv)
+
+    server = AgentServer(
+        (args.host, args.port),
+        token=args.token,
+        allow_hooks=args.allow_hooks,
+        allow_files=args.allow_files,
+    )
+    print("Salvo agent listening on %s:%d" % server.server_address[:2])
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# coordinator side
+
+
+class _Agent(object):
+    def __init__(self, index, address):
+        self.index = index
+        self.address = address
+        self.name = "%s:%d" % address
+        self.sock = socket.create_connection(address, timeout=CONNECT_TIMEOUT)
+        # preparing a run, e.g. pregenerating payloads, may take a while
+        self.sock.settimeout(None)
+        self.rfile = self.sock.makefile("rb")
+
+    def send(self, message):
+        self.sock.sendall(_encode(message))
+
+    def receive(self):
+        line = self.rfile.readline()
+        if not line:
+            raise OSError("connection closed")
+        return json.loads(line)
+
+    def read_run(self, queue):
+        try:
+            self.sock.settimeout(LOST_TIMEOUT)
+            while True:
+                message = self.receive()
+                queue.put((self.index, message))
+                if message["type"] not in ("progress", "checkpoint"):
+                    return
+        except (OSError, ValueError) as e:
+            queue.put((self.index, {"type": "lost", "error": str(e) or repr(e)}))
+
+    def close(self):
+        try:
+            # wakes up a reader blocked on the socket
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.rfile.close()
+        self.sock.close()
+
+
+def _connect(addresses):
+    agents = []
+    try:
+        for index, address in enumerate(addresses):
+            try:
+                agents.append(_Agent(index, address))
+            except OSError as e:
+                raise AgentError("Can't reach the agent %s:%d: %s" % (address + (e,)))
+    except BaseException:
+        for agent in agents:
+            agent.close()
+        raise
+    return agents
+
+
+def _prepare(agents, args):
+    errors = []
+    shares = split(args.concurrency, len(agents))
+    for agent, concurrency in zip(agents, shares):
+        if args.rate is not None:
+            rate = args.rate * concurrency / args.concurrency
+        else:
+            rate = None
+        agent.send(
+            {
+                "type": "run",
+                "index": agent.index,
+                "argv": args.argv,
+                "token": args.agent_token,
+                "concurrency": concurrency,
+                "rate": rate,
+            }
+        )
+    for agent in agents:
+        try:
+            answer = agent.receive()
+        except (OSError, ValueError) as e:
+            answer = {"type": "error", "error": str(e)}
+        if answer["type"] != "ready":
+            # the usage printed with an invalid option, or a traceback,
+            # end with the error
+            error = answer["error"].strip().splitlines() or ["no error given"]
+            errors.append("Agent %s failed: %s" % (agent.name, error[-1]))
+    return errors
+
+
+def _stop(agents):
+    for agent in agents:
+        try:
+            agent.send({"type": "stop"})
+        except OSError:
+            # done or lost already
+            pass
+
+
+def run_agents(url, results, args):
+    """Runs the load test on the agents of `args.agents`.
+
+    The concurrency and the arrival rate are split across the agents, each
+    one running its share with the options of the coordinator, which has
+    to be called with the same `url`. Their results are merged into
+    `results` and the merged Molotov counters are returned.
+
+    Raises AgentError when an agent can't be reached or does not accept
+    the load. An agent lost during the run counts with its last
+    checkpoint. With a LiveSeries in `results.live`, the agents send it
+    the intervals they completed with their progress.
+    """
+    # like processes, agents get at least one worker
+    agents = _connect(args.agents[: args.concurrency])
+    queue = _queue.Queue()
+    readers = []
+    molotov_results = []
+    errors = []
+    try:
+        errors = _prepare(agents, args)
+        if errors:
+            raise AgentError("\n".join(errors))
+
+        start = {"type": "start", "at": time.time() + START_DELAY}
+        if results.live is not None:
+            results.live.start(len(agents), start["at"])
+        for agent in agents:
+            agent.send(start)
+            reader = threading.Thread(target=agent.read_run, args=(queue,))
+            reader.daemon = True
+            reader.start()
+            readers.append(reader)
+
+        snapshots = [None] * len(agents)
+        done = [0] * len(agents)
+        pending = len(agents)
+        aborted = False
+        while pending:
+            results.done = sum(done)
+            try:
+                index, message = queue.get(timeout=PROGRESS_INTERVAL)
+            except _queue.Empty:
+                continue
+            kind = message["type"]
+            if kind == "progress":
+                done[index] = message["done"]
+                if "live" in message and results.live is not None:
+                    results.live.add(index, message["live"])
+                progress = message
+            else:
+                progress = message.get("results", {})
+            if not aborted and progress.get("aborted") is not None:
+                aborted = True
+                _stop(agents)
+            if kind == "progress":
+                continue
+            if kind == "checkpoint":
+                snapshots[index] = message["results"]
+                done[index] = snapshots[index]["done"]
+                continue
+            pending -= 1
+            if results.live is not None:
+                results.live.finish(index)
+            name = agents[index].name
+            if kind == "done":
+                snapshots[index] = message["results"]
+                molotov_results.append(message["molotov"])
+            elif kind == "lost" and snapshots[index] is not None:
+                print(
+                    "Lost the agent %s (%s), its results stop at its last "
+                    "checkpoint" % (name, message["error"])
+                )
+            else:
+                errors.append("Agent %s failed:\n%s" % (name, message["error"]))
+                continue
+            results.merge(RunResults.from_snapshot(snapshots[index]))
+            done[index] = snapshots[index]["done"]
+        results.done = sum(done)
+    finally:
+        for agent in agents:
+            agent.close()
+        for reader in readers:
+            reader.join()
+
+    if errors:
+        raise Exception("\n".join(errors))
+
+    return merge_molotov_results(molotov_results)
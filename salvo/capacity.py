@@ -0,0 +1,265 @@
+"""
+Capacity search: finds the highest load a server sustains within a SLO.
+
+The load (concurrency, or rate with ``--rate``) is doubled until a short
+probe breaks the SLO, or up to a ceiling, then the last passing and first
+failing levels are bisected. When the first probe already breaks the
+SLO, the load is halved until a probe passes instead.
+"""
+
+import copy
+import re
+import sys
+from collections import namedtuple
+
+from salvo.histogram import percentile_label
+from salvo.output import RunResults
+
+
+SLO = namedtuple("SLO", ["label", "percentile", "threshold"])
+Probe = namedtuple(
+    "Probe", ["load", "count", "rps", "error_rate", "latencies", "passed"]
+)
+
+_SLO = re.compile(r"^\s*(p\d+(?:\.\d+)?|max)\s*<\s*(\d+(?:\.\d+)?)\s*(us|ms|s)\s*$")
+UNITS = {"us": 0.000001, "ms": 0.001, "s": 1.0}
+
+# bounds the number of probes of a search
+MAX_PROBES = 20
+# default ceilings of the load, --max-concurrency and --max-rate
+MAX_CONCURRENCY = 1024
+MAX_RATE = 100000.0
+# lowest rate probed when halving it, a request per second
+MIN_RATE = 1.0
+# the bisection stops when the bounds are within this ratio
+RESOLUTION = 0.05
+
+
+def parse_slo(spec):
+    """Parses a latency objective such as ``p99<200ms``."""
+    match = _SLO.match(spec)
+    if match is None:
+        raise ValueError("Malformed SLO %r, expected something like p99<200ms" % spec)
+    label, value, unit = match.groups()
+    percentile = 100.0 if label == "max" else float(label[1:])
+    if percentile > 100:
+        raise ValueError("Percentiles go up to 100")
+    return SLO(percentile_label(percentile), percentile, float(value) * UNITS[unit])
+
+
+def parse_error_rate(spec):
+    """Parses an error rate such as ``0.1%`` or ``0.001``."""
+    spec = spec.strip()
+    try:
+        if spec.endswith("%"):
+            rate = float(spec[:-1]) / 100.0
+        else:
+            rate = float(spec)
+    except ValueError:
+        raise ValueError("Malformed error rate %r" % spec)
+    if not 0 <= rate <= 1:
+        raise ValueError("The error rate goes from 0 to 100%")
+    return rate
+
+
+class CapacitySearch(object):
+    """Runs probes at increasing load levels against `url`.
+
+    Each probe lasts `args.probe_duration` seconds and passes when every
+    SLO is met and the error rate stays under `max_error_rate`. Errors
+    are the HTTP errors, the failed requests and the requests dropped by
+    --rate probes. The load never goes above `args.max_concurrency`, or
+    `args.max_rate` by rate.
+    """
+
+    def __init__(self, url, args, slos, max_error_rate, stream=sys.stdout):
+        self.url = url
+        self.args = args
+        self.slos = slos
+        self.max_error_rate = max_error_rate
+        self.stream = stream
+        self.by_rate = args.rate is not None
+        if self.by_rate:
+            self.ceiling = args.max_rate
+        else:
+            self.ceiling = args.max_concurrency
+        self.probes = []
+
+    @property
+    def capacity(self):
+        """The best passing probe, or None."""
+        passed = [probe for probe in self.probes if probe.passed]
+        if not passed:
+            return None
+        return max(passed, key=lambda probe: probe.load)
+
+    def _run(self, load):
+        args = copy.copy(self.args)
+        args.duration = args.probe_duration
+        if self.by_rate:
+            args.rate = load
+        else:
+            args.concurrency = load
+
+        res = RunResults(
+            num=None,
+            quiet=True,
+            significant_figures=args.precision,
+            rate=args.rate,
+            endpoints=[endpoint.name for endpoint in args.endpoints],
+        )
+        if args.processes > 1:
+            from salvo.processes import run_processes as run_test
+        else:
+            from salvo.scenario import run_test
+        molotov_res = run_test(self.url, res, args)
+        return res, molotov_res
+
+    def probe(self, load):
+        res, molotov_res = self._run(load)
+        stats = res._calc_stats()
+        histogram = res._all_histogram()
+        latencies = histogram.percentiles([slo.percentile for slo in self.slos])
+        latencies = {slo.label: latencies[slo.percentile] for slo in self.slos}
+
+        # dropped requests of --rate probes mean the load was not sent
+        failed = molotov_res["FAILED"] + res.dropped
+        total = stats.count + failed
+        if total == 0:
+            error_rate = 1.0
+        else:
+            error_rate = float(sum(res.errors.values()) + failed) / total
+
+        passed = error_rate <= self.max_error_rate and all(
+            latencies[slo.label] < slo.threshold for slo in self.slos
+        )
+        probe = Probe(load, stats.count, stats.rps, error_rate, latencies, passed)
+        self.probes.append(probe)
+        if not self.args.quiet:
+            self.print_probe(probe)
+        return probe
+
+    @property
+    def at_ceiling(self):
+        """Whether the capacity found is the ceiling, or may be higher."""
+        capacity = self.capacity
+        return capacity is not None and capacity.load >= self.ceiling
+
+    def _half(self, load):
+        if self.by_rate:
+            load = load / 2.0
+            return load if load >= MIN_RATE else None
+        return load // 2 or None
+
+    def _middle(self, low, high):
+        if self.by_rate:
+            if high / low <= 1 + RESOLUTION:
+                return None
+            return (low + high) / 2.0
+        middle = (low + high) // 2
+        if middle == low or high - low <= low * RESOLUTION:
+            return None
+        return middle
+
+    def run(self):
+        """Searches the capacity and returns the best passing probe."""
+        load = self.args.rate if self.by_rate else self.args.concurrency
+        low = high = None
+
+        # exponential growth until the SLO breaks or the ceiling
+        while len(self.probes) < MAX_PROBES:
+            if self.probe(load).passed:
+                low = load
+                if load >= self.ceiling:
+                    break
+                load = min(load * 2, self.ceiling)
+            else:
+                high = load
+                break
+
+        # exponential decrease when the first load already breaks it
+        while low is None and high is not None and len(self.probes) < MAX_PROBES:
+            load = self._half(high)
+            if load is None:
+                break
+            if self.probe(load).passed:
+                low = load
+            else:
+                high = load
+
+        # then bisection between the last passing and first failing loads
+        while low is not None and high is not None and len(self.probes) < MAX_PROBES:
+            middle = self._middle(low, high)
+            if middle is None:
+                break
+            if self.probe(middle).passed:
+                low = middle
+            else:
+                high = middle
+
+        return self.capacity
+
+    def _load_label(self, load):
+        if self.by_rate:
+            return "%.2f/s" % load
+        return "%d" % load
+
+    def print_header(self):
+        self.stream.write(
+            "%-12s%10s%10s%10s"
+            % ("Rate" if self.by_rate else "Concurrency", "Requests", "RPS", "Errors")
+        )
+        for slo in self.slos:
+            self.stream.write("%12s" % slo.label)
+        self.stream.write("\n")
+        self.stream.flush()
+
+    def print_probe(self, probe):
+        if len(self.probes) == 1:
+            self.print_header()
+        self.stream.write(
+            "%-12s%10d%10.2f%9.2f%%"
+            % (
+                self._load_label(probe.load),
+                probe.count,
+                probe.rps,
+                probe.error_rate * 100,
+            )
+        )
+        for slo in self.slos:
+            self.stream.write("%10.4f s" % probe.latencies[slo.label])
+        self.stream.write("  %s\n" % ("OK" if probe.passed else "FAIL"))
+        self.stream.flush()
+
+    def print_result(self):
+        stream = self.stream
+        stream.write("\n-------- Capacity --------\n\n")
+        objectives = ["%s < %.4f s" % (slo.label, slo.threshold) for slo in self.slos]
+        objectives.append("errors <= %.2f%%" % (self.max_error_rate * 100))
+        stream.write("Objectives          \t\t%s\n" % ", ".join(objectives))
+        capacity = self.capacity
+        if capacity is None:
+            stream.write("No load level met the objectives\n\n")
+        else:
+            name = "Rate" if self.by_rate else "Concurrency"
+            label = self._load_label(capacity.load)
+            if self.at_ceiling:
+                option = "--max-rate" if self.by_rate else "--max-concurrency"
+                label += " (the %s ceiling, raise it to search higher)" % option
+            stream.write("%-20s\t\t%s\n" % (name, label))
+            stream.write("Requests Per Second \t\t%.2f\n\n" % capacity.rps)
+        stream.flush()
+
+    def get_json(self):
+        capacity = self.capacity
+        return {
+            "by": "rate" if self.by_rate else "concurrency",
+            "capacity": None if capacity is None else capacity.load,
+            "ceiling": self.ceiling,
+            "at_ceiling": self.at_ceiling,
+            "rps": None if capacity is None else capacity.rps,
+            "slos": {slo.label: slo.threshold for slo in self.slos},
+            "max_error_rate": self.max_error_rate,
+            "probes": [probe._asdict() for probe in self.probes],
+            "loop": self.args.loop,
+        }
@@ -0,0 +1,140 @@
+"""
+Connection pool shared by the workers of a process.
+"""
+
+import socket
+import weakref
+from contextvars import ContextVar
+
+from aiohttp import TCPConnector
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import DefaultResolver
+
+
+# kind of the last connection handed to the requests of a worker, for
+# RunResults to move those of the warm-up requests out of the counts
+connection_kind = ContextVar("connection_kind", default=None)
+
+
+def parse_resolve(spec):
+    """Parses a pre-resolved address given as ``HOST:PORT:ADDRESS``."""
+    try:
+        host, port, address = spec.split(":", 2)
+        port = int(port)
+    except ValueError:
+        raise ValueError(
+            "Malformed address %r, expected something like "
+            "example.com:443:10.0.0.1" % spec
+        )
+    if not host or not address:
+        raise ValueError("Malformed address %r" % spec)
+    return (host, port), address.strip("[]")
+
+
+class StaticResolver(AbstractResolver):
+    """Resolves the given ``(host, port)`` pairs to fixed addresses.
+
+    Other hosts go through the default resolver of aiohttp.
+    """
+
+    def __init__(self, addresses):
+        self.addresses = addresses
+        self._resolver = DefaultResolver()
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        address = self.addresses.get((host, port))
+        if address is None:
+            return await self._resolver.resolve(host, port, family)
+        return [
+            {
+                "hostname": host,
+                "host": address,
+                "port": port,
+                "family": socket.AF_INET6 if ":" in address else socket.AF_INET,
+                "proto": 0,
+                "flags": socket.AI_NUMERICHOST,
+            }
+        ]
+
+    async def close(self):
+        await self._resolver.close()
+
+
+def connector_options(args):
+    """Returns the TCPConnector arguments of the salvo options."""
+    options = {
+        "limit": args.pool_limit,
+        "limit_per_host": args.per_host_limit,
+        "force_close": args.force_close,
+    }
+    if args.keepalive_timeout is not None:
+        options["keepalive_timeout"] = args.keepalive_timeout
+    if args.dns_ttl == 0:
+        options["use_dns_cache"] = False
+    elif args.dns_ttl is not None:
+        options["ttl_dns_cache"] = args.dns_ttl
+    return options
+
+
+class CountingConnector(TCPConnector):
+    """A TCPConnector counting the new and reused connections.
+
+    The counts go to `connections`, a dict with "new" and "reused" keys,
+    without tracing the requests: a connection is new the first time its
+    protocol is handed to a request. The kind of the connection is also
+    left in `connection_kind`, for the request that got it.
+    """
+
+    def __init__(self, connections, **options):
+        super().__init__(**options)
+        self.connections = connections
+        self._seen = weakref.WeakSet()
+
+    async def connect(self, req, *args, **kw):
+        connection = await super().connect(req, *args, **kw)
+        protocol = connection.protocol
+        if protocol in self._seen:
+            kind = "reused"
+        else:
+            self._seen.add(protocol)
+            kind = "new"
+        self.connections[kind] += 1
+        connection_kind.set(kind)
+        return connection
+
+
+class SharedConnector(object):
+    """A TCPConnector shared by the sessions of the workers.
+
+    Sharing the pool is what makes its limits apply to the whole run
+    instead of to each worker. The connector is created by the first
+    session, in the event loop of the run, and closed with the last one.
+    `addresses` maps ``(host, port)`` pairs to pre-resolved addresses.
+    With a `connections` dict, the connections are counted in it, see
+    CountingConnector.
+    """
+
+    def __init__(self, options, addresses=None, connections=None):
+        self.options = options
+        self.addresses = addresses or {}
+        self.connections = connections
+        self.connector = None
+        self._sessions = 0
+
+    def acquire(self):
+        if self.connector is None:
+            options = dict(self.options)
+            if self.addresses:
+                options["resolver"] = StaticResolver(self.addresses)
+            if self.connections is not None:
+                self.connector = CountingConnector(self.connections, **options)
+            else:
+                self.connector = TCPConnector(**options)
+        self._sessions += 1
+        return self.connector
+
+    async def release(self):
+        self._sessions -= 1
+        if self._sessions == 0 and self.connector is not None:
+            connector, self.connector = self.connector, None
+            await connector.close()
@@ -0,0 +1,154 @@
+"""
+Weighted endpoints of a scenario file.
+
+A scenario file lists the endpoints hit by a run, eg. in JSON::
+
+    {
+      "base_url": "http://localhost:8080",
+      "endpoints": [
+        {"name": "list", "path": "/items", "weight": 70},
+        {"name": "item", "path": "/items/1", "weight": 20},
+        {"name": "order", "path": "/orders", "method": "POST",
+         "json": {"item": 1}, "weight": 10}
+      ]
+    }
+
+The ``base_url`` is only used without an URL on the command line, which
+takes precedence. Each endpoint has a `path` (or a full `url`) and
+optionally a `name`, a `method`, a `weight`, some `headers` and a body,
+given as `data` or as `json`. The same keys work in YAML files, which
+need PyYAML, and in TOML files, with an ``[[endpoints]]`` table per
+endpoint.
+"""
+
+import bisect
+import json
+import random
+from collections import namedtuple
+from urllib.parse import urljoin
+
+
+Endpoint = namedtuple(
+    "Endpoint", ["name", "method", "url", "weight", "headers", "data"]
+)
+
+_KEYS = {"name", "method", "path", "url", "weight", "headers", "data", "json"}
+
+
+def _load_json(text):
+    return json.loads(text)
+
+
+def _load_yaml(text):
+    try:
+        import yaml
+    except ImportError:
+        raise ValueError("Reading YAML scenario files needs PyYAML")
+    return yaml.safe_load(text)
+
+
+def _load_toml(text):
+    try:
+        import tomllib as toml
+    except ImportError:
+        try:
+            import toml
+        except ImportError:
+            raise ValueError("Reading TOML scenario files needs the toml package")
+    return toml.loads(text)
+
+
+_LOADERS = {
+    ".json": _load_json,
+    ".yaml": _load_yaml,
+    ".yml": _load_yaml,
+    ".toml": _load_toml,
+}
+
+
+def _endpoint(spec, base_url, method):
+    unknown = set(spec) - _KEYS
+    if unknown:
+        raise ValueError("Unknown endpoint keys: %s" % ", ".join(sorted(unknown)))
+    url = spec.get("url")
+    if url is None:
+        if "path" not in spec:
+            raise ValueError("An endpoint needs a path or an url")
+        if base_url is None:
+            raise ValueError("Endpoint paths need a base url")
+        url = urljoin(base_url, spec["path"])
+
+    weight = spec.get("weight", 1)
+    if not isinstance(weight, (int, float)) or weight <= 0:
+        raise ValueError("Endpoint weights must be positive numbers")
+
+    headers = dict(spec.get("headers") or {})
+    if "json" in spec:
+        if "data" in spec:
+            raise ValueError("An endpoint can't have both data and json")
+        data = json.dumps(spec["json"])
+        headers.setdefault("Content-Type", "application/json")
+    else:
+        data = spec.get("data")
+
+    method = spec.get("method", method).upper()
+    name = spec.get("name", "%s %s" % (method, spec.get("path", url)))
+    return Endpoint(name, method, url, weight, headers, data)
+
+
+def load_endpoints(path, base_url=None, method="GET"):
+    """Reads the endpoints of a scenario file.
+
+    The format is guessed from the extension. `base_url`, the URL of the
+    command line, takes precedence over the ``base_url`` of the file, and
+    `method` is the default method of the endpoints. Invalid files raise
+    a ValueError.
+    """
+    for extension, loader in _LOADERS.items():
+        if path.endswith(extension):
+            break
+    else:
+        raise ValueError("Scenario files are .json, .yaml, .yml or .toml files")
+
+    with open(path) as f:
+        text = f.read()
+    try:
+        spec = loader(text)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError("Can't read %s: %s" % (path, e))
+
+    if not isinstance(spec, dict) or not spec.get("endpoints"):
+        raise ValueError("A scenario file needs a list of endpoints")
+    if base_url is None:
+        base_url = spec.get("base_url")
+    endpoints = [_endpoint(item, base_url, method) for item in spec["endpoints"]]
+
+    names = [endpoint.name for endpoint in endpoints]
+    if len(set(names)) != len(names):
+        raise ValueError("Endpoint names must be unique")
+    return endpoints
+
+
+class EndpointPicker(object):
+    """Picks endpoints at random according to their weights.
+
+    The cumulative weights are computed once, so that a pick is a single
+    random number and a binary search.
+    """
+
+    def __init__(self, endpoints, seed=None):
+        self.endpoints = endpoints
+        self._cumulative = []
+        total = 0
+        for endpoint in endpoints:
+            total += endpoint.weight
+            self._cumulative.append(total)
+        self._total = total
+        self._random = random.Random(seed).random
+
+    def pick(self):
+        index = bisect.bisect_right(self._cumulative, self._random() * self._total)
+        # random() < 1, but the product can round up to the total
+        return self.endpoints[min(index, len(self.endpoints) - 1)]
@@ -0,0 +1,326 @@
+"""
+Live metrics, published while a long run goes.
+
+The requests are already aggregated per interval by the time series of
+the run (see salvo.timeseries), so the exporter only reads an interval
+once it is over: nothing is sent per request. Each interval is sent to
+a StatsD server with ``--statsd``, and kept for the Prometheus endpoint
+of ``--prometheus-port``.
+
+With ``--processes`` or ``--agents``, the processes and the agents send
+the intervals they completed to the process running the exporter, which
+merges them in a LiveSeries.
+"""
+
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from salvo.histogram import percentile_label
+from salvo.timeseries import PERCENTILES, TimeSeries
+
+
+PREFIX = "salvo"
+# seconds between two checks for a completed interval
+POLL_INTERVAL = 0.1
+# seconds an interval is left to settle once over, for the requests
+# completed at its very end to be recorded
+SETTLE_DELAY = 0.05
+_LABELS = [percentile_label(p) for p in PERCENTILES]
+
+
+def parse_statsd(spec):
+    """Parses ``host:port`` into a (host, port) tuple."""
+    host, sep, port = spec.strip().rpartition(":")
+    if not sep or not host or not port.isdigit():
+        raise ValueError("The StatsD server must be of the form host:port")
+    # [::1]:8125
+    return host.strip("[]"), int(port)
+
+
+def statsd_lines(row, prefix=PREFIX):
+    """Returns the StatsD lines of a time series row, latencies in ms."""
+    lines = [
+        "%s.requests:%d|c" % (prefix, row["count"]),
+        "%s.errors:%d|c" % (prefix, row["errors"]),
+        "%s.rps:%g|g" % (prefix, row["rps"]),
+    ]
+    # no request, no latency
+    if row["count"]:
+        lines.append("%s.latency.avg:%.3f|g" % (prefix, row["avg"] * 1000))
+        for label in _LABELS:
+            value = row["percentiles"][label] * 1000
+            lines.append("%s.latency.%s:%.3f|g" % (prefix, label, value))
+    return lines
+
+
+def completed_intervals(series, start, now, clock_offset=0.0, final=False):
+    """Returns the intervals of `series` completed at `now`, from `start`.
+
+    Returns a dict of JSON types, for LiveSeries.add(), and the first
+    interval of the next call. `now` is a perf_counter() value, moved to
+    another clock by `clock_offset`. With `final`, the intervals left are
+    all completed, and the source done.
+    """
+    if final:
+        end = len(series.buckets)
+    else:
+        now -= SETTLE_DELAY
+        end = series.completed(now)
+    if end > start:
+        intervals = series.snapshot(clock_offset, start, end)
+    else:
+        intervals = None
+    origin = series.origin
+    return {
+        "origin": None if origin is None else origin + clock_offset,
+        "end": end,
+        "until": None if final else now + clock_offset,
+        "intervals": intervals,
+    }, max(start, end)
+
+
+class LiveSeries(object):
+    """The time series of the processes or agents of a run, merged live.
+
+    Each source sends the intervals it completed with add(), see
+    completed_intervals(). An interval of the merged `timeseries` is
+    complete once all the sources sent theirs, at the time given by
+    clock().
+    """
+
+    def __init__(self, interval=1.0):
+        self.timeseries = TimeSeries(interval)
+        self._until = []
+        # the latest time of the sources, once they are all done
+        self._latest = None
+        self._lock = threading.Lock()
+
+    def start(self, sources, origin):
+        """Starts the series of `sources` at `origin`, on their clock."""
+        with self._lock:
+            self._until = [origin] * sources
+            self._latest = origin
+            self.timeseries.origin = origin
+
+    def add(self, source, data):
+        series = self.timeseries
+        with self._lock:
+            if data["origin"] is not None:
+                # a source can't start before the series, unless its clock
+                # is a bit off, which would move the intervals published
+                origin = max(data["origin"], series.origin)
+            if data["intervals"] is not None:
+                intervals = TimeSeries.from_snapshot(data["intervals"])
+                intervals.origin = origin
+                series.merge(intervals)
+            if data["until"] is None:
+                until = float("inf")
+            elif data["origin"] is None:
+                until = data["until"]
+            else:
+                # the last interval of the source is complete in the
+                # merged one it is aligned on
+                shift = round((origin - series.origin) / series.interval)
+                until = series.origin + (data["end"] + shift) * series.interval
+            self._until[source] = max(self._until[source], until)
+            if until != float("inf"):
+                self._latest = max(self._latest, until)
+
+    def finish(self, source):
+        """Marks `source` as done, e.g. when it is lost."""
+        with self._lock:
+            self._until[source] = float("inf")
+
+    def clock(self):
+        with self._lock:
+            until = min(self._until)
+            return self._latest if until == float("inf") else until
+
+
+def _settled_clock():
+    return time.perf_counter() - SETTLE_DELAY
+
+
+def _number(value):
+    # Prometheus spells missing values NaN
+    return "NaN" if value is None else repr(value)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.exporter.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # scrapes would mix with the progress bar
+        pass
+
+
+class _MetricsServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class MetricsExporter(object):
+    """Publishes the time series of `results` an interval at a time.
+
+    Completed intervals are sent to the StatsD server at the (host, port)
+    `statsd` address, over UDP, as counters of requests and errors and
+    gauges of the requests per second and latencies. Prometheus scrapes
+    ``/metrics`` on `prometheus_port`, with the totals of the intervals
+    published so far and the latencies of the last one.
+
+    The last interval, cut short by the end of the run, is published by
+    stop(). `clock` gives the time up to which the intervals are
+    complete, on the perf_counter() clock by default. `results` can be a
+    LiveSeries, given with its clock.
+    """
+
+    def __init__(
+        self,
+        results,
+        statsd=None,
+        prometheus_port=None,
+        host="",
+        prefix=PREFIX,
+        clock=_settled_clock,
+    ):
+        self.results = results
+        self.prefix = prefix
+        self.clock = clock
+        # next interval to publish
+        self.index = 0
+        self.requests = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.last = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        if statsd is not None:
+            # resolved once, not for every interval
+            family, _, _, _, self._statsd = socket.getaddrinfo(
+                statsd[0], statsd[1], type=socket.SOCK_DGRAM
+            )[0]
+            self._sock = socket.socket(family, socket.SOCK_DGRAM)
+        else:
+            self._sock = None
+        if prometheus_port is not None:
+            self._server = _MetricsServer((host, prometheus_port), _MetricsHandler)
+            self._server.exporter = self
+        else:
+            self._server = None
+
+    @property
+    def prometheus_address(self):
+        return self._server.server_address[:2]
+
+    def start(self):
+        if self._server is not None:
+            thread = threading.Thread(target=self._server.serve_forever)
+            thread.daemon = True
+            thread.start()
+        self._thread = threading.Thread(target=self._poll)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Publishes the intervals left and stops the exporter."""
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+        self.publish(final=True)
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._sock is not None:
+            self._sock.close()
+
+    def _poll(self):
+        while not self._stopped.wait(POLL_INTERVAL):
+            self.publish()
+
+    def publish(self, now=None, final=False):
+        """Publishes the intervals completed at `now`, a value of the clock.
+
+        With `final`, all the intervals recorded are published.
+        """
+        series = self.results.timeseries
+        if series.origin is None:
+            return []
+        if final:
+            end = len(series.buckets)
+        else:
+            if now is None:
+                now = self.clock()
+            end = int((now - series.origin) / series.interval)
+        rows = [series.row(index) for index in range(self.index, end)]
+        if not rows:
+            return rows
+        self.index = end
+
+        with self._lock:
+            for row in rows:
+                self.requests += row["count"]
+                self.errors += row["errors"]
+                self.total_time += row["avg"] * row["count"]
+            self.last = rows[-1]
+        if self._sock is not None:
+            for row in rows:
+                datagram = "\n".join(statsd_lines(row, self.prefix)).encode()
+                try:
+                    self._sock.sendto(datagram, self._statsd)
+                except OSError:
+                    # nobody listening, UDP metrics are best effort
+                    pass
+        return rows
+
+    def prometheus_text(self):
+        """Returns the metrics in the Prometheus text format."""
+        prefix = self.prefix
+        with self._lock:
+            last = self.last
+            lines = [
+                "# HELP %s_requests_total Requests completed." % prefix,
+                "# TYPE %s_requests_total counter" % prefix,
+                "%s_requests_total %d" % (prefix, self.requests),
+                "# HELP %s_errors_total Requests answered with an HTTP error." % prefix,
+                "# TYPE %s_errors_total counter" % prefix,
+                "%s_errors_total %d" % (prefix, self.errors),
+                "# HELP %s_requests_per_second Requests per second of the last "
+                "interval." % prefix,
+                "# TYPE %s_requests_per_second gauge" % prefix,
+                "%s_requests_per_second %s"
+                % (prefix, _number(None if last is None else last["rps"])),
+                "# HELP %s_request_duration_seconds Request durations, quantiles "
+                "of the last interval." % prefix,
+                "# TYPE %s_request_duration_seconds summary" % prefix,
+            ]
+            for percentile, label in zip(PERCENTILES, _LABELS):
+                if last is None or not last["count"]:
+                    value = None
+                else:
+                    value = last["percentiles"][label]
+                lines.append(
+                    '%s_request_duration_seconds{quantile="%g"} %s'
+                    % (prefix, percentile / 100.0, _number(value))
+                )
+            lines.append(
+                "%s_request_duration_seconds_sum %r" % (prefix, self.total_time)
+            )
+            lines.append(
+                "%s_request_duration_seconds_count %d" % (prefix, self.requests)
+            )
+        return "\n".join(lines) + "\n"
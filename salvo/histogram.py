@@ -0,0 +1,234 @@
+"""
+Log-bucketed latency histogram, in the spirit of HdrHistogram.
+
+Durations are recorded into a bounded set of counters, so the memory used
+does not depend on how many requests a run performs.
+"""
+
+import math
+from collections import defaultdict
+
+
+# durations are given in seconds and recorded in microseconds
+_UNIT = 1000000
+
+
+def percentile_label(percentile):
+    if percentile == 100:
+        return "max"
+    return "p%g" % percentile
+
+
+class Histogram(object):
+    """Bounded, log-linear histogram of durations.
+
+    Values are seconds, recorded with a one microsecond resolution and
+    ``significant_figures`` decimal digits of precision up to ``max_value``
+    seconds. Larger values are clamped into the last bucket but still count
+    for the exact min, max, average and standard deviation, which are
+    tracked on the side.
+
+    Recording a value is O(1) and two histograms with the same settings
+    can be merged together. Only the non-zero counters are stored, by
+    index, so that the memory, merges and percentiles only cost what the
+    recorded values spread over, not the millions of counters of five
+    significant figures.
+    """
+
+    def __init__(self, significant_figures=3, max_value=3600):
+        if not 1 <= significant_figures <= 5:
+            raise ValueError("significant_figures must be between 1 and 5")
+        self.significant_figures = significant_figures
+        self.max_value = max_value
+
+        largest_single_unit = 2 * 10**significant_figures
+        magnitude = int(math.ceil(math.log2(largest_single_unit)))
+        self._sub_bucket_count = 1 << magnitude
+        self._sub_bucket_half_count = self._sub_bucket_count // 2
+        self._sub_bucket_half_count_magnitude = magnitude - 1
+        self._sub_bucket_mask = self._sub_bucket_count - 1
+        self._highest = int(max_value * _UNIT)
+
+        smallest_untrackable = self._sub_bucket_count
+        bucket_count = 1
+        while smallest_untrackable <= self._highest:
+            smallest_untrackable <<= 1
+            bucket_count += 1
+
+        # the number of counters, an upper bound of len(counts)
+        self.size = (bucket_count + 1) * self._sub_bucket_half_count
+        self.reset()
+
+    def reset(self):
+        """Forgets every recorded value."""
+        self.counts = defaultdict(int)
+        # (count, sorted counters) of the last _sorted_counts() call
+        self._sorted = None
+        self.count = 0
+        self.total = 0.0
+        self.sum_squares = 0.0
+        self.min = 0.0
+        self.max = 0.0
+        return self
+
+    def __len__(self):
+        return self.count
+
+    def _index(self, value):
+        magnitude = self._sub_bucket_half_count_magnitude
+        bucket = (value | self._sub_bucket_mask).bit_length() - magnitude - 1
+        offset = (bucket + 1) << magnitude
+        return offset + (value >> bucket) - self._sub_bucket_half_count
+
+    def _highest_value_at(self, index):
+        magnitude = self._sub_bucket_half_count_magnitude
+        half_count = self._sub_bucket_half_count
+        bucket = (index >> magnitude) - 1
+        sub_bucket = (index & (half_count - 1)) + half_count
+        if bucket < 0:
+            sub_bucket -= half_count
+            bucket = 0
+        return (sub_bucket << bucket) + (1 << bucket) - 1
+
+    def record(self, value):
+        """Records a duration, in seconds."""
+        # the counter first, count tells _sorted_counts() it changed
+        index = int(value * _UNIT)
+        if index < 0:
+            index = 0
+        elif index > self._highest:
+            index = self._highest
+        self.counts[self._index(index)] += 1
+
+        if self.count == 0:
+            self.min = self.max = value
+        elif value < self.min:
+            self.min = value
+        elif value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+        self.sum_squares += value * value
+
+    def compatible(self, other):
+        same_precision = self.significant_figures == other.significant_figures
+        return same_precision and self.max_value == other.max_value
+
+    def merge(self, other):
+        """Adds all the values recorded by `other` to this histogram."""
+        if not self.compatible(other):
+            raise ValueError("Can't merge histograms with different settings")
+        if other.count == 0:
+            return self
+        counts = self.counts
+        # a copy, the counters may be recorded into by another thread
+        for index, count in list(other.counts.items()):
+            counts[index] += count
+        if self.count == 0:
+            self.min, self.max = other.min, other.max
+        else:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+        self.sum_squares += other.sum_squares
+        return self
+
+    def _sorted_counts(self):
+        # the (index, count) pairs by index, sorted again once more values
+        # are recorded
+        count = self.count
+        if self._sorted is None or self._sorted[0] != count:
+            self._sorted = count, sorted(list(self.counts.items()))
+        return self._sorted[1]
+
+    def buckets(self):
+        """Yields the ``(value, count)`` pairs of the non-empty buckets.
+
+        Values are the highest duration of their bucket, in increasing
+        order.
+        """
+        for index, count in self._sorted_counts():
+            yield float(self._highest_value_at(index)) / _UNIT, count
+
+    def snapshot(self):
+        """Returns the histogram as a dict of JSON types.
+
+        Only the non-zero counters are kept, as ``[index, count]`` pairs.
+        """
+        counts = self._sorted_counts()
+        return {
+            "significant_figures": self.significant_figures,
+            "max_value": self.max_value,
+            "count": self.count,
+            "total": self.total,
+            "sum_squares": self.sum_squares,
+            "min": self.min,
+            "max": self.max,
+            "counts": [[index, count] for index, count in counts],
+        }
+
+    @classmethod
+    def from_snapshot(cls, data):
+        """Rebuilds a histogram from the dict returned by snapshot()."""
+        histogram = cls(data["significant_figures"], data["max_value"])
+        for index, count in data["counts"]:
+            histogram.counts[index] = count
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.sum_squares = data["sum_squares"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+    @property
+    def mean(self):
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+    @property
+    def stdev(self):
+        if self.count == 0:
+            return 0.0
+        mean = self.mean
+        return math.sqrt(max(self.sum_squares / self.count - mean * mean, 0.0))
+
+    def percentiles(self, percentiles):
+        """Returns a dict of percentile to duration, in seconds.
+
+        The non-zero counters are walked once for all the requested
+        percentiles, whatever the number of values recorded. Each value
+        is the highest duration equivalent to its bucket, bounded by the
+        exact min and max.
+        """
+        res = {}
+        if self.count == 0:
+            for percentile in percentiles:
+                res[percentile] = 0.0
+            return res
+
+        # number of values at or below each percentile, rounded to absorb
+        # float noise such as 1000 * 99.9 / 100 == 999.0000000000001
+        pending = [
+            (max(math.ceil(round(self.count * percentile / 100.0, 6)), 1), percentile)
+            for percentile in sorted(percentiles)
+        ]
+        seen = 0
+        for index, count in self._sorted_counts():
+            seen += count
+            if seen == self.count:
+                break
+            while pending and seen >= pending[0][0]:
+                value = float(self._highest_value_at(index)) / _UNIT
+                res[pending.pop(0)[1]] = min(max(value, self.min), self.max)
+            if not pending:
+                break
+
+        # the last bucket holds the max, which is tracked exactly
+        for _, percentile in pending:
+            res[percentile] = self.max
+        return res
+
+    def value_at_percentile(self, percentile):
+        return self.percentiles([percentile])[percentile]
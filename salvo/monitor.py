@@ -0,0 +1,67 @@
+"""
+Detection of a client short of CPU.
+
+When salvo itself is CPU bound, its requests wait for the event loop
+before being sent and their responses wait for it before being timed,
+which inflates the latencies it reports. LoopMonitor measures how late
+the event loop wakes up a probe sleeping at a fixed interval, and the
+CPU time used by the process over the run.
+"""
+
+import asyncio
+import time
+
+
+# seconds between two wake-ups of the probe
+PROBE_INTERVAL = 0.01
+# p99 of the loop lag, in seconds, above which the client is saturated
+LAG_THRESHOLD = 0.02
+# CPU usage, in percent of a core, above which the client is saturated
+CPU_THRESHOLD = 90.0
+
+
+class LoopMonitor(object):
+    """Probes the event loop lag while the workers of a run are active.
+
+    Like salvo.connector.SharedConnector, the probe is started with the
+    first worker session and stopped with the last one. The lags go into
+    the ``loop_lag`` histogram of `results`, and the CPU time and usage of
+    the process into its ``cpu``.
+    """
+
+    def __init__(self, results, interval=PROBE_INTERVAL):
+        self.results = results
+        self.interval = interval
+        self._task = None
+        self._sessions = 0
+        self._cpu_start = self._wall_start = None
+
+    def acquire(self):
+        if self._task is None:
+            self._cpu_start = time.process_time()
+            self._wall_start = time.perf_counter()
+            self._task = asyncio.ensure_future(self._probe())
+        self._sessions += 1
+
+    async def release(self):
+        self._sessions -= 1
+        if self._sessions == 0 and self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            self.results.record_cpu(
+                time.process_time() - self._cpu_start,
+                time.perf_counter() - self._wall_start,
+            )
+
+    async def _probe(self):
+        record = self.results.loop_lag.record
+        interval = self.interval
+        perf_counter = time.perf_counter
+        while True:
+            expected = perf_counter() + interval
+            await asyncio.sleep(interval)
+            record(max(perf_counter() - expected, 0.0))
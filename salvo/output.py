@@ -1,18 +1,45 @@
+import bisect
 import time
 import sys
-import math
 import json
 import threading
 from collections import defaultdict, namedtuple
 
+from salvo.histogram import Histogram, percentile_label
+from salvo.connector import connection_kind
+from salvo.timeseries import TimeSeries
+from salvo.phases import PHASES
+from salvo.profile import LoadProfile
+from salvo.monitor import LAG_THRESHOLD, CPU_THRESHOLD
 from salvo.pgbar import AnimatedProgressBar
 
 
 RunStats = namedtuple(
     "RunStats",
-    ["count", "total_time", "rps", "avg", "min", "max", "amp", "stdev", "rpm"],
+    [
+        "count",
+        "total_time",
+        "rps",
+        "avg",
+        "min",
+        "max",
+        "amp",
+        "stdev",
+        "rpm",
+        "cumulative_latency",
+    ],
 )
 
+_MB = 1000000.0
+# bumped when the fields of RunResults.snapshot() change
+SNAPSHOT_VERSION = 1
+
+PERCENTILES = (50, 90, 95, 99, 99.9, 100)
+# redraws per second of the progress bar on a terminal
+REFRESH_RATE = 10
+# seconds between two status lines when the output is not a terminal
+STATUS_INTERVAL = 5
+
 
 def print_errors(errors, stream=sys.stdout):
     if len(errors) == 0:
@@ -27,88 +54,508 @@ def print_errors(errors, stream=sys.stdout):
 class RunResults(object):
     """Encapsulates the results of a single Boom run.
 
-    Contains a dictionary of status codes to lists of request durations,
-    a list of exception instances raised during the run, the total time
-    of the run and an animated progress bar.
+    Contains a dictionary of status codes to histograms of request
+    durations, the errors counted by status code with the description of
+    the first one of each code, the wall clock time of the run and an
+    animated progress bar.
+
+    Recording a request only bumps the `done` counter used by the progress
+    bar, which is drawn by a thread between start_progress() and
+    stop_progress().
+
+    The wall clock time goes from the start of the first request to the
+    end of the last one, and is what the throughput is measured against.
+
+    When `phases` is True, the connection phases of the requests (see
+    salvo.phases) get their own histograms. The new and reused connections
+    are counted in `connections`.
+
+    `endpoints` are the names of the endpoints of a scenario file, see
+    salvo.endpoints, whose requests and errors are also counted apart.
+
+    Access log replays (see salvo.replay) set `replay` and their
+    `speedup`, None when replaying as fast as possible.
+
+    The lag of the event loop and the CPU usage of the client, see
+    salvo.monitor, tell whether salvo itself was the bottleneck. `loop`
+    is the kind of event loop of the run, see salvo.util.use_loop.
+
+    The requests of the warm-up, those started in the first `warmup`
+    seconds or the first `warmup_requests` completed, are only counted
+    in `warmup_counter` and `warmup_errors`. They are left out of all the
+    other statistics, with the connections they got from the pool.
+
+    `aborted` is the reason why a rule of salvo.abort stopped the run.
+
+    The processes or agents of a run exporting live metrics send their
+    completed intervals to `live`, a salvo.export.LiveSeries.
     """
 
-    def __init__(self, server_info=None, num=1, quiet=False, duration=None):
-        self.status_code_counter = defaultdict(list)
+    def __init__(
+        self,
+        server_info=None,
+        num=1,
+        quiet=False,
+        duration=None,
+        significant_figures=3,
+        rate=None,
+        profile=None,
+        interval=1.0,
+        phases=False,
+        endpoints=None,
+        replay=False,
+        speedup=None,
+        loop="asyncio",
+        warmup=None,
+        warmup_requests=None,
+    ):
+        self.significant_figures = significant_figures
+        # completed requests, for the progress display
+        self.done = 0
+        self.status_code_counter = defaultdict(self._new_histogram)
         self.errors = defaultdict(int)
         self.errors_desc = {}
-        self.total_time = 0
+        # (counts by status code, histogram) of the last _all_histogram()
+        self._all = None
+        # perf_counter() values bounding the requests
+        self.first_start = None
+        self.last_end = None
+        # bytes of the request and response bodies
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        # target rate of open-loop runs, see salvo.rate.ArrivalSchedule
+        self.rate = rate
+        self.late = 0
+        self.dropped = 0
+        self.timeseries = TimeSeries(interval)
+        self.live = None
+        # per stage durations of runs following a salvo.profile.LoadProfile
+        self.profile = profile
+        if profile is not None:
+            self.stage_counter = [self._new_histogram() for _ in profile.stages]
+            self._stage_starts = [start for _, start, _ in profile.stages]
+            self._stages_end = profile.stages[-1][-1]
+        else:
+            self.stage_counter = []
+            self._stage_starts = None
+        self.phases = phases
+        if phases:
+            self.phase_counter = {name: self._new_histogram() for name in PHASES}
+        else:
+            self.phase_counter = {}
+        self.connections = {"new": 0, "reused": 0}
+        self.endpoint_counter = {
+            name: self._new_histogram() for name in endpoints or ()
+        }
+        self.endpoint_errors = dict.fromkeys(self.endpoint_counter, 0)
+        if replay:
+            self.replay = {"speedup": speedup, "skipped": 0}
+        else:
+            self.replay = None
+        if warmup is not None or warmup_requests is not None:
+            self.warmup = {
+                "seconds": warmup,
+                "requests": warmup_requests,
+                "connections": {"new": 0, "reused": 0},
+            }
+        else:
+            self.warmup = None
+        self.warmup_counter = self._new_histogram()
+        self.warmup_errors = 0
+        # start of the first measured request with `warmup`, requests
+        # left with `warmup_requests`
+        self._warmup_end = None
+        self._warmup_left = warmup_requests
+        # client saturation, see salvo.monitor.LoopMonitor
+        self.loop_lag = self._new_histogram()
+        # CPU seconds and highest usage of a process, in percent of a core
+        self.cpu = {"time": 0.0, "percent": 0.0}
+        self.loop = loop
+        self.aborted = None
         self.server_info = server_info
         self.duration = duration
         self.timer = None
+        self._stop_timer = None
         self.start_time = time.time()
         if num is not None:
             self._progress_bar = AnimatedProgressBar(end=num, width=65)
         elif duration is not None:
             self._progress_bar = AnimatedProgressBar(end=int(duration), width=65)
-            self.timer = threading.Thread(target=self.periodic)
-            self.timer.daemon = True
-            self.timer.start()
         else:
             self._progress_bar = None
         self.quiet = quiet
 
-    def periodic(self):
-        if self.duration is None:
+    def _new_histogram(self):
+        return Histogram(significant_figures=self.significant_figures)
+
+    def __getstate__(self):
+        # the progress bar and its timer stay in the process displaying them
+        state = dict(self.__dict__)
+        state["status_code_counter"] = dict(self.status_code_counter)
+        state["errors"] = dict(self.errors)
+        state["timer"] = state["_stop_timer"] = state["_progress_bar"] = None
+        state["_all"] = state["live"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.status_code_counter = defaultdict(
+            self._new_histogram, state["status_code_counter"]
+        )
+        self.errors = defaultdict(int, state["errors"])
+
+    def merge(self, other):
+        """Adds the results of another run, e.g. from another process."""
+        for status, histogram in other.status_code_counter.items():
+            self.status_code_counter[status].merge(histogram)
+        for code, count in other.errors.items():
+            self.errors[code] += count
+        for code, desc in other.errors_desc.items():
+            self.errors_desc.setdefault(code, desc)
+        self.bytes_sent += other.bytes_sent
+        self.bytes_received += other.bytes_received
+        self.late += other.late
+        if other.replay is not None:
+            self.replay["skipped"] += other.replay["skipped"]
+        self.dropped += other.dropped
+        self.timeseries.merge(other.timeseries)
+        for index, histogram in enumerate(other.stage_counter):
+            self.stage_counter[index].merge(histogram)
+        for name, histogram in other.phase_counter.items():
+            self.phase_counter[name].merge(histogram)
+        for kind, count in other.connections.items():
+            self.connections[kind] += count
+        for name, histogram in other.endpoint_counter.items():
+            self.endpoint_counter[name].merge(histogram)
+            self.endpoint_errors[name] += other.endpoint_errors[name]
+        self.warmup_counter.merge(other.warmup_counter)
+        self.warmup_errors += other.warmup_errors
+        if other.warmup is not None and other.warmup["connections"] is not None:
+            connections = self.warmup["connections"] or {"new": 0, "reused": 0}
+            for kind, count in other.warmup["connections"].items():
+                connections[kind] += count
+            self.warmup["connections"] = connections
+        if self.aborted is None:
+            self.aborted = other.aborted
+        self.loop_lag.merge(other.loop_lag)
+        self.cpu["time"] += other.cpu["time"]
+        self.cpu["percent"] = max(self.cpu["percent"], other.cpu["percent"])
+        if other.first_start is not None:
+            if self.first_start is None or other.first_start < self.first_start:
+                self.first_start = other.first_start
+            if self.last_end is None or other.last_end > self.last_end:
+                self.last_end = other.last_end
+        return self
+
+    def snapshot(self, clock_offset=0.0):
+        """Returns the results as a dict of JSON types.
+
+        The requests are recorded with perf_counter() values, which only
+        make sense in the process that measured them. `clock_offset` is
+        added to them, ``time.time() - time.perf_counter()`` moves them to
+        the wall clock shared by several machines.
+        """
+
+        def _histograms(counter):
+            return {str(name): h.snapshot() for name, h in list(counter.items())}
+
+        def _shift(value):
+            return None if value is None else value + clock_offset
+
+        if self.profile is not None:
+            profile = {"points": self.profile.points, "stages": self.profile.stages}
+        else:
+            profile = None
+        return {
+            "version": SNAPSHOT_VERSION,
+            "significant_figures": self.significant_figures,
+            "done": self.done,
+            "status_codes": _histograms(self.status_code_counter),
+            "errors": {str(code): count for code, count in list(self.errors.items())},
+            "errors_desc": {
+                str(code): desc for code, desc in list(self.errors_desc.items())
+            },
+            "first_start": _shift(self.first_start),
+            "last_end": _shift(self.last_end),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "rate": self.rate,
+            "late": self.late,
+            "dropped": self.dropped,
+            "timeseries": self.timeseries.snapshot(clock_offset),
+            "profile": profile,
+            "stages": [h.snapshot() for h in self.stage_counter],
+            "phases": _histograms(self.phase_counter),
+            "connections": dict(self.connections),
+            "endpoints": _histograms(self.endpoint_counter),
+            "endpoint_errors": dict(self.endpoint_errors),
+            "replay": None if self.replay is None else dict(self.replay),
+            "warmup": None if self.warmup is None else dict(self.warmup),
+            "warmup_counter": self.warmup_counter.snapshot(),
+            "warmup_errors": self.warmup_errors,
+            "loop_lag": self.loop_lag.snapshot(),
+            "cpu": dict(self.cpu),
+            "loop": self.loop,
+            "aborted": self.aborted,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data, **options):
+        """Rebuilds the results from the dict returned by snapshot().
+
+        `options` are passed to the constructor, e.g. the `server_info`.
+        """
+        if data.get("version") != SNAPSHOT_VERSION:
+            raise ValueError("Unsupported results version %r" % data.get("version"))
+        profile = data["profile"]
+        if profile is not None:
+            profile = LoadProfile(
+                [tuple(point) for point in profile["points"]],
+                [tuple(stage) for stage in profile["stages"]],
+            )
+        replay = data["replay"]
+        warmup = data["warmup"] or {"seconds": None, "requests": None}
+        options.setdefault("num", None)
+        options.setdefault("quiet", True)
+        res = cls(
+            significant_figures=data["significant_figures"],
+            rate=data["rate"],
+            profile=profile,
+            interval=data["timeseries"]["interval"],
+            phases=bool(data["phases"]),
+            endpoints=list(data["endpoints"]),
+            replay=replay is not None,
+            speedup=None if replay is None else replay["speedup"],
+            loop=data["loop"],
+            warmup=warmup["seconds"],
+            warmup_requests=warmup["requests"],
+            **options
+        )
+        res.done = data["done"]
+        for code, histogram in data["status_codes"].items():
+            res.status_code_counter[int(code)] = Histogram.from_snapshot(histogram)
+        for code, count in data["errors"].items():
+            res.errors[int(code)] = count
+        for code, desc in data["errors_desc"].items():
+            res.errors_desc[int(code)] = desc
+        res.first_start = data["first_start"]
+        res.last_end = data["last_end"]
+        res.bytes_sent = data["bytes_sent"]
+        res.bytes_received = data["bytes_received"]
+        res.late = data["late"]
+        res.dropped = data["dropped"]
+        res.timeseries = TimeSeries.from_snapshot(data["timeseries"])
+        res.stage_counter = [Histogram.from_snapshot(h) for h in data["stages"]]
+        for name, histogram in data["phases"].items():
+            res.phase_counter[name] = Histogram.from_snapshot(histogram)
+        res.connections.update(data["connections"])
+        for name, histogram in data["endpoints"].items():
+            res.endpoint_counter[name] = Histogram.from_snapshot(histogram)
+        res.endpoint_errors.update(data["endpoint_errors"])
+        if replay is not None:
+            res.replay.update(replay)
+        if res.warmup is not None:
+            res.warmup["connections"] = warmup["connections"]
+        res.warmup_counter = Histogram.from_snapshot(data["warmup_counter"])
+        res.warmup_errors = data["warmup_errors"]
+        res.loop_lag = Histogram.from_snapshot(data["loop_lag"])
+        res.cpu.update(data["cpu"])
+        res.aborted = data["aborted"]
+        return res
+
+    def start_progress(self):
+        """Starts drawing the progress bar in a thread."""
+        if self.quiet or self._progress_bar is None or self.timer is not None:
             return
-        while True:
-            self._progress_bar + 1
-            self._progress_bar.show_progress()
-            time.sleep(1)
-
-    def incr(self, status=200, duration=0):
-        self.total_time += duration
-        self.status_code_counter[status].append(duration)
-        if self.timer is not None or self.quiet:
+        self._started = time.perf_counter()
+        self._stop_timer = threading.Event()
+        self.timer = threading.Thread(target=self.periodic)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def stop_progress(self):
+        """Stops the progress thread once it has drawn the final state."""
+        if self.timer is None:
             return
-        if self._progress_bar is not None:
-            self._progress_bar + 1
-            self._progress_bar.show_progress()
+        self._stop_timer.set()
+        self.timer.join()
+        self.timer = None
+
+    def periodic(self):
+        stdout = self._progress_bar.stdout
+        tty = hasattr(stdout, "isatty") and stdout.isatty()
+        interval = 1.0 / REFRESH_RATE if tty else STATUS_INTERVAL
+        while not self._stop_timer.wait(interval):
+            self._show_progress(tty)
+        self._show_progress(tty)
+
+    def _show_progress(self, tty):
+        bar = self._progress_bar
+        if self.duration is None:
+            bar.update(self.done)
         else:
-            sys.stdout.write(".")
-            sys.stdout.flush()
+            elapsed = time.perf_counter() - self._started
+            if self.warmup is not None and self.warmup["seconds"] is not None:
+                # the bar only covers the measured part of the run
+                elapsed = max(elapsed - self.warmup["seconds"], 0)
+            bar.update(elapsed)
+        if tty:
+            bar.show_progress()
+        else:
+            # a compact line, instead of a bar per line
+            bar.stdout.write("%3d%% - %d requests\n" % (bar.progress, self.done))
+            bar.stdout.flush()
+
+    @property
+    def total_time(self):
+        """Wall clock time of the run, in seconds."""
+        if self.first_start is None:
+            return 0.0
+        return self.last_end - self.first_start
+
+    def incr(
+        self, status=200, duration=0, start=None, received=0, sent=0, endpoint=None
+    ):
+        """Records a request, returns False for the requests of the warm-up."""
+        if start is None:
+            start = time.perf_counter() - duration
+        if self.warmup is not None and self._in_warmup(start):
+            self._warmup_connection()
+            self.warmup_counter.record(duration)
+            if status >= 400:
+                self.warmup_errors += 1
+            return False
+        self.done += 1
+        self.bytes_received += received
+        self.bytes_sent += sent
+        end = start + duration
+        if self.first_start is None or start < self.first_start:
+            self.first_start = start
+        if self.last_end is None or end > self.last_end:
+            self.last_end = end
+        self.status_code_counter[status].record(duration)
+        self.timeseries.record(end, duration, status >= 400)
+        if endpoint is not None:
+            self.endpoint_counter[endpoint].record(duration)
+            if status >= 400:
+                self.endpoint_errors[endpoint] += 1
+        if self._stage_starts is not None and self.profile.origin is not None:
+            elapsed = start - self.profile.origin
+            index = bisect.bisect_right(self._stage_starts, elapsed) - 1
+            if index >= 0 and elapsed < self._stages_end:
+                self.stage_counter[index].record(duration)
+        return True
+
+    def _in_warmup(self, start):
+        warmup = self.warmup
+        if warmup["requests"] is not None:
+            if self._warmup_left > 0:
+                self._warmup_left -= 1
+                return True
+        else:
+            if self._warmup_end is None:
+                # the run starts with its first request
+                self._warmup_end = start + warmup["seconds"]
+            if start < self._warmup_end:
+                return True
+        return False
+
+    def _warmup_connection(self):
+        # the pool counted the connection of the request with the others,
+        # see salvo.connector.CountingConnector. A worker sends its warm-up
+        # requests first, so the kind left is not one of a measured request
+        kind = connection_kind.get()
+        if kind is not None:
+            connection_kind.set(None)
+            self.connections[kind] -= 1
+            self.warmup["connections"][kind] += 1
+
+    def record_failure(self):
+        """Records a request that failed without a response, e.g. refused."""
+        end = time.perf_counter()
+        if self.warmup is not None and self._in_warmup(end):
+            self._warmup_connection()
+            return
+        self.timeseries.record_failure(end)
+
+    def record_phases(self, timer, end):
+        """Records the phases of a salvo.phases.PhaseTimer."""
+        for name, duration in timer.durations(end).items():
+            if duration is not None:
+                self.phase_counter[name].record(duration)
+
+    def record_cpu(self, cpu_time, wall_time):
+        """Records the CPU seconds used by a process over `wall_time`."""
+        self.cpu["time"] += cpu_time
+        if wall_time > 0:
+            percent = cpu_time / wall_time * 100
+            self.cpu["percent"] = max(self.cpu["percent"], percent)
+
+    def _all_histogram(self):
+        # merged again once more requests are recorded, not for every
+        # statistic of the same results
+        histograms = list(self.status_code_counter.items())
+        key = [(code, histogram.count) for code, histogram in histograms]
+        if self._all is None or self._all[0] != key:
+            all_res = self._new_histogram()
+            for _, histogram in histograms:
+                all_res.merge(histogram)
+            self._all = key, all_res
+        return self._all[1]
+
+    def _calc_percentiles(self, histogram=None):
+        """Returns the PERCENTILES of a histogram, keyed by their label.
+
+        Defaults to all the requests of the run.
+        """
+        if histogram is None:
+            histogram = self._all_histogram()
+        values = histogram.percentiles(PERCENTILES)
+        return {percentile_label(p): values[p] for p in PERCENTILES}
 
     def _calc_stats(self):
         """Calculate stats (min, max, avg) from the given RunResults.
 
+        ``total_time`` is the wall clock time of the run while
+        ``cumulative_latency`` is the sum of all request durations.
+
         The statistics are returned as a RunStats object.
         """
-        all_res = []
-        count = 0
-        for values in self.status_code_counter.values():
-            all_res += values
-            count += len(values)
+        all_res = self._all_histogram()
+        count = all_res.count
+        cum_time = all_res.total
+        total_time = self.total_time
 
-        cum_time = sum(all_res)
-
-        if cum_time == 0 or len(all_res) == 0:
+        if cum_time == 0 or count == 0:
             rps = avg = min_ = max_ = amp = stdev = 0
             rpm = 0
         else:
-            if self.total_time == 0:
+            if total_time == 0:
                 rps = 0
                 rpm = 0
             else:
-                rps = float(len(all_res)) / float(self.total_time)
+                rps = float(count) / float(total_time)
                 rpm = rps * 60
-            avg = sum(all_res) / len(all_res)
-            max_ = max(all_res)
-            min_ = min(all_res)
-            amp = max(all_res) - min(all_res)
-            stdev = math.sqrt(sum((x - avg) ** 2 for x in all_res) / count)
+            avg = all_res.mean
+            max_ = all_res.max
+            min_ = all_res.min
+            amp = max_ - min_
+            stdev = all_res.stdev
 
-        return RunStats(count, self.total_time, rps, avg, min_, max_, amp, stdev, rpm)
+        return RunStats(
+            count, total_time, rps, avg, min_, max_, amp, stdev, rpm, cum_time
+        )
 
     def print_stats(self, stream=sys.stdout):
         stats = self._calc_stats()
         rps = stats.rps
+        if self.aborted is not None:
+            stream.write("\n-------- Aborted --------\n\n")
+            stream.write("%s\n" % self.aborted)
         stream.write("\n-------- Results --------\n\n")
         stream.write("Successful calls    \t\t%r\n" % stats.count)
-        stream.write("Total time          \t\t%.4f s\n" % stats.total_time)
+        stream.write("Wall time           \t\t%.4f s\n" % stats.total_time)
+        stream.write("Cumulative latency  \t\t%.4f s\n" % stats.cumulative_latency)
         stream.write("Average             \t\t%.4f s\n" % stats.avg)
         stream.write("Fastest             \t\t%.4f s\n" % stats.min)
         stream.write("Slowest             \t\t%.4f s\n" % stats.max)
@@ -116,18 +563,315 @@ class RunResults(object):
         stream.write("Standard deviation  \t\t%.6f\n" % stats.stdev)
         stream.write("Requests Per Second \t\t%.2f\n" % rps)
         stream.write("Requests Per Minute \t\t%.2f\n\n" % stats.rpm)
+        if self.rate is not None:
+            stream.write("-------- Arrival rate --------\n")
+            stream.write("Target rate         \t\t%.2f\n" % self.rate)
+            stream.write("Late requests       \t\t%d\n" % self.late)
+            stream.write("Dropped requests    \t\t%d\n\n" % self.dropped)
+        if self.replay is not None:
+            stream.write("-------- Replay --------\n")
+            if self.replay["speedup"] is None:
+                stream.write("Speedup             \t\tas fast as possible\n")
+            else:
+                stream.write("Speedup             \t\t%g\n" % self.replay["speedup"])
+                stream.write("Late requests       \t\t%d\n" % self.late)
+            stream.write("Skipped lines       \t\t%d\n\n" % self.replay["skipped"])
+        if self.bytes_received or self.bytes_sent:
+            self.print_transfer(stream)
+        if self.connections["new"] or self.connections["reused"]:
+            self.print_connections(stream)
         stream.write("-------- Status codes --------\n")
         for code, items in self.status_code_counter.items():
             stream.write("Code %d          \t\t%d times.\n" % (code, len(items)))
         stream.write("\n")
+        self.print_percentiles(stream)
+        if self.endpoint_counter:
+            self.print_endpoints(stream)
+        if self.profile is not None:
+            self.print_stages(stream)
+        if self.phases:
+            self.print_phases(stream)
+        if self.warmup is not None:
+            self.print_warmup(stream)
+        if self.saturated():
+            self.print_saturation(stream)
         stream.flush()
 
+    def _calc_transfer(self):
+        count = sum(len(h) for h in self.status_code_counter.values()) or 1
+        total_time = self.total_time or 1
+        return {
+            "received": self.bytes_received,
+            "sent": self.bytes_sent,
+            "received_per_request": self.bytes_received / count,
+            "sent_per_request": self.bytes_sent / count,
+            "received_per_second": self.bytes_received / total_time,
+            "sent_per_second": self.bytes_sent / total_time,
+        }
+
+    def print_transfer(self, stream=sys.stdout):
+        transfer = self._calc_transfer()
+        stream.write("-------- Transfer --------\n")
+        stream.write("Received            \t\t%.2f MB\n" % (transfer["received"] / _MB))
+        stream.write("Sent                \t\t%.2f MB\n" % (transfer["sent"] / _MB))
+        stream.write(
+            "Received per second \t\t%.2f MB/s\n"
+            % (transfer["received_per_second"] / _MB)
+        )
+        stream.write(
+            "Sent per second     \t\t%.2f MB/s\n" % (transfer["sent_per_second"] / _MB)
+        )
+        stream.write(
+            "Received per request\t\t%d bytes\n" % transfer["received_per_request"]
+        )
+        stream.write(
+            "Sent per request    \t\t%d bytes\n\n" % transfer["sent_per_request"]
+        )
+
+    def print_percentiles(self, stream=sys.stdout):
+        columns = [("All", self._calc_percentiles())]
+        for code, histogram in sorted(self.status_code_counter.items()):
+            columns.append(("Code %d" % code, self._calc_percentiles(histogram)))
+
+        stream.write("-------- Latency percentiles --------\n\n")
+        stream.write("%-20s" % "" + "".join("%12s" % name for name, _ in columns))
+        stream.write("\n")
+        for percentile in PERCENTILES:
+            label = percentile_label(percentile)
+            stream.write("%-20s" % label)
+            for _, values in columns:
+                stream.write("%10.4f s" % values[label])
+            stream.write("\n")
+        stream.write("\n")
+
+    def _calc_stages(self):
+        stages = []
+        for (name, start, end), histogram in zip(
+            self.profile.stages, self.stage_counter
+        ):
+            stages.append(
+                {
+                    "name": name,
+                    "start": start,
+                    "end": end,
+                    "count": histogram.count,
+                    "rps": histogram.count / (end - start),
+                    "avg": histogram.mean,
+                    "percentiles": self._calc_percentiles(histogram),
+                }
+            )
+        return stages
+
+    def _calc_endpoints(self):
+        endpoints = {}
+        total_time = self.total_time or 1
+        for name, histogram in self.endpoint_counter.items():
+            endpoints[name] = {
+                "count": histogram.count,
+                "errors": self.endpoint_errors[name],
+                "rps": histogram.count / total_time,
+                "avg": histogram.mean,
+                "percentiles": self._calc_percentiles(histogram),
+            }
+        return endpoints
+
+    def print_endpoints(self, stream=sys.stdout):
+        stream.write("-------- Endpoints --------\n\n")
+        stream.write(
+            "%-20s%10s%10s%10s%12s%12s%12s\n"
+            % ("", "Requests", "Errors", "RPS", "Average", "p50", "p99")
+        )
+        for name, endpoint in self._calc_endpoints().items():
+            percentiles = endpoint["percentiles"]
+            stream.write(
+                "%-20s%10d%10d%10.2f%10.4f s%10.4f s%10.4f s\n"
+                % (
+                    name,
+                    endpoint["count"],
+                    endpoint["errors"],
+                    endpoint["rps"],
+                    endpoint["avg"],
+                    percentiles["p50"],
+                    percentiles["p99"],
+                )
+            )
+        stream.write("\n")
+
+    def print_stages(self, stream=sys.stdout):
+        stream.write("-------- Stages --------\n\n")
+        stream.write(
+            "%-20s%10s%10s%12s%12s%12s\n"
+            % ("", "Requests", "RPS", "Average", "p50", "p99")
+        )
+        for stage in self._calc_stages():
+            percentiles = stage["percentiles"]
+            stream.write(
+                "%-20s%10d%10.2f%10.4f s%10.4f s%10.4f s\n"
+                % (
+                    stage["name"],
+                    stage["count"],
+                    stage["rps"],
+                    stage["avg"],
+                    percentiles["p50"],
+                    percentiles["p99"],
+                )
+            )
+        stream.write("\n")
+
+    def _calc_phases(self):
+        phases = {}
+        for name in PHASES:
+            histogram = self.phase_counter[name]
+            phases[name] = {
+                "count": histogram.count,
+                "avg": histogram.mean,
+                "percentiles": self._calc_percentiles(histogram),
+            }
+        return phases
+
+    def print_phases(self, stream=sys.stdout):
+        stream.write("-------- Connection phases --------\n\n")
+        stream.write(
+            "%-20s%10s%12s%12s%12s%12s\n"
+            % ("", "Requests", "Average", "p50", "p99", "max")
+        )
+        for name, phase in self._calc_phases().items():
+            percentiles = phase["percentiles"]
+            stream.write(
+                "%-20s%10d%10.4f s%10.4f s%10.4f s%10.4f s\n"
+                % (
+                    name,
+                    phase["count"],
+                    phase["avg"],
+                    percentiles["p50"],
+                    percentiles["p99"],
+                    percentiles["max"],
+                )
+            )
+        stream.write("\n")
+
+    def _calc_connections(self):
+        new = self.connections["new"]
+        count = sum(len(h) for h in self.status_code_counter.values())
+        total_time = self.total_time or 1
+        return {
+            "new": new,
+            "reused": self.connections["reused"],
+            "new_per_second": new / total_time,
+            "requests_per_connection": count / new if new else 0,
+        }
+
+    def print_connections(self, stream=sys.stdout):
+        connections = self._calc_connections()
+        stream.write("-------- Connections --------\n")
+        stream.write("New connections     \t\t%d\n" % connections["new"])
+        stream.write("Reused connections  \t\t%d\n" % connections["reused"])
+        stream.write("New per second      \t\t%.2f\n" % connections["new_per_second"])
+        stream.write(
+            "Requests/connection \t\t%.2f\n\n" % connections["requests_per_connection"]
+        )
+
+    def _calc_warmup(self):
+        histogram = self.warmup_counter
+        return {
+            "seconds": self.warmup["seconds"],
+            "requests": self.warmup["requests"],
+            "count": histogram.count,
+            "errors": self.warmup_errors,
+            "avg": histogram.mean,
+            "percentiles": self._calc_percentiles(histogram),
+            # None when the run ended during the warm-up
+            "connections": self.warmup["connections"],
+        }
+
+    def print_warmup(self, stream=sys.stdout):
+        warmup = self._calc_warmup()
+        stream.write("-------- Warm-up (not in the results) --------\n")
+        if warmup["seconds"] is not None:
+            stream.write("Duration            \t\t%g s\n" % warmup["seconds"])
+        stream.write("Requests            \t\t%d\n" % warmup["count"])
+        stream.write("Errors              \t\t%d\n" % warmup["errors"])
+        stream.write("Average             \t\t%.4f s\n" % warmup["avg"])
+        for label in ("p50", "p99", "max"):
+            stream.write("%-20s\t\t%.4f s\n" % (label, warmup["percentiles"][label]))
+        if warmup["connections"] is not None:
+            stream.write("New connections     \t\t%d\n" % warmup["connections"]["new"])
+        stream.write("\n")
+
+    def _calc_client(self):
+        return {
+            "cpu_time": self.cpu["time"],
+            "cpu_percent": self.cpu["percent"],
+            "loop_lag": {
+                "count": self.loop_lag.count,
+                "avg": self.loop_lag.mean,
+                "percentiles": self._calc_percentiles(self.loop_lag),
+            },
+            "saturated": self.saturated(),
+        }
+
+    def saturated(self):
+        """Tells whether the client was short of CPU during the run."""
+        if self.cpu["percent"] >= CPU_THRESHOLD:
+            return True
+        return self.loop_lag.value_at_percentile(99) > LAG_THRESHOLD
+
+    def print_saturation(self, stream=sys.stdout):
+        lag = self.loop_lag.value_at_percentile(99)
+        stream.write("-------- Warning --------\n")
+        stream.write(
+            "The client was the bottleneck of this run: the p99 of its event\n"
+            "loop lag was %.4f s and a process used %.0f%% of a CPU core.\n"
+            "Latencies include this delay, run with more processes (-p) or\n"
+            "a lower concurrency to measure the server.\n\n"
+            % (lag, self.cpu["percent"])
+        )
+
     def get_json(self):
         res = self._calc_stats()._asdict()
+        res["percentiles"] = self._calc_percentiles()
+        res["status_codes"] = {
+            str(code): {
+                "count": histogram.count,
+                "percentiles": self._calc_percentiles(histogram),
+            }
+            for code, histogram in self.status_code_counter.items()
+        }
+        if self.rate is not None:
+            res["rate"] = {
+                "target": self.rate,
+                "late": self.late,
+                "dropped": self.dropped,
+            }
+        if self.replay is not None:
+            res["replay"] = dict(self.replay, late=self.late)
+        if self.bytes_received or self.bytes_sent:
+            res["transfer"] = self._calc_transfer()
+        res["connections"] = self._calc_connections()
+        res["loop"] = self.loop
+        if self.aborted is not None:
+            res["aborted"] = self.aborted
+        res["client"] = self._calc_client()
+        res["timeseries"] = self.timeseries.rows()
+        if self.endpoint_counter:
+            res["endpoints"] = self._calc_endpoints()
+        if self.profile is not None:
+            res["stages"] = self._calc_stages()
+        if self.phases:
+            res["phases"] = self._calc_phases()
+        if self.warmup is not None:
+            res["warmup"] = self._calc_warmup()
         if self.server_info is not None:
             res["server"] = self.server_info
         return res
 
+    def describe_errors(self):
+        """Returns a line per error status code, with its count."""
+        return [
+            "%s (%d occurences)" % (desc, self.errors[code])
+            for code, desc in sorted(self.errors_desc.items())
+        ]
+
     def print_json(self, stream=sys.stdout):
         stream.write(json.dumps(self.get_json()) + "\n")
         stream.flush()
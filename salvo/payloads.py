@@ -0,0 +1,131 @@
+"""
+Pool of request bodies generated before the run.
+"""
+
+import mmap
+import os
+import random
+
+
+# files larger than this are memory-mapped instead of read
+MMAP_THRESHOLD = 1024 * 1024
+ORDERS = ("cycle", "random")
+
+
+def _encode(payload):
+    if isinstance(payload, str):
+        return payload.encode("utf-8")
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        return payload
+    raise ValueError("Pooled payloads must be bytes or str, not %r" % type(payload))
+
+
+def _map(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            return f.read()
+        # the map stays valid once the file is closed
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def from_callable(func, count, method, url):
+    """Calls the data callable `count` times."""
+    return [_encode(func(method, url, {})) for _ in range(count)]
+
+
+class MappedFile(object):
+    """A large payload file, mapped each time it is handed out.
+
+    A map of each file kept for the whole run would hold a file
+    descriptor per file, which a large corpus could run out of. The map
+    of a request is released with the request, and the pages stay in
+    the page cache from one request to the next.
+    """
+
+    __slots__ = ("path",)
+
+    def __init__(self, path):
+        self.path = path
+
+    def map(self):
+        return _map(self.path)
+
+
+def from_directory(path):
+    """One payload per file of the directory, in name order.
+
+    The files of MMAP_THRESHOLD bytes or more are given as MappedFile.
+    """
+    paths = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+    payloads = []
+    for path in paths:
+        if not os.path.isfile(path):
+            continue
+        if os.path.getsize(path) >= MMAP_THRESHOLD:
+            payloads.append(MappedFile(path))
+        else:
+            with open(path, "rb") as f:
+                payloads.append(f.read())
+    return payloads
+
+
+def from_ndjson(path):
+    """One payload per non-empty line of the file."""
+    content = _map(path)
+    if isinstance(content, memoryview):
+        # slices of the map, nothing is copied
+        payloads = []
+        data = content.obj
+        start = 0
+        size = len(content)
+        while start < size:
+            end = data.find(b"\n", start)
+            if end == -1:
+                end = size
+            line = content[start:end]
+            if line.tobytes().strip():
+                payloads.append(line)
+            start = end + 1
+        return payloads
+    return [line for line in content.split(b"\n") if line.strip()]
+
+
+def load_payloads(path):
+    """Reads the payloads of a directory or of an NDJSON file."""
+    if os.path.isdir(path):
+        return from_directory(path)
+    return from_ndjson(path)
+
+
+class PayloadPool(object):
+    """Hands out payloads prepared before the run.
+
+    Payloads are bytes, or memoryviews of memory-mapped files, given as
+    they are to aiohttp. MappedFile payloads are mapped when handed out.
+    They are cycled through in order, or sampled at random when `order`
+    is ``"random"``.
+    """
+
+    def __init__(self, payloads, order="cycle", seed=None):
+        if not payloads:
+            raise ValueError("The payload pool is empty")
+        if order not in ORDERS:
+            raise ValueError("Unknown order %r" % order)
+        self.payloads = payloads
+        self.order = order
+        self._size = len(payloads)
+        self._index = -1
+        self._random = random.Random(seed).random
+
+    def __len__(self):
+        return self._size
+
+    def next(self):
+        if self.order == "random":
+            payload = self.payloads[int(self._random() * self._size)]
+        else:
+            self._index = (self._index + 1) % self._size
+            payload = self.payloads[self._index]
+        if type(payload) is MappedFile:
+            return payload.map()
+        return payload
@@ -62,6 +62,11 @@ class ProgressBar(object):
     def _get_progress(self, increment):
         return float(increment * 100) / self.end
 
+    def update(self, state):
+        """Sets the progress to the given state, between start and end"""
+        self.progress = min(self._get_progress(state), 100)
+        return self
+
     def reset(self):
         """Resets the current progress to the start point"""
         self.progress = self._get_progress(self.start)
@@ -0,0 +1,99 @@
+"""
+Per request connection phases, timed with aiohttp's request tracing.
+"""
+
+import time
+
+from aiohttp import ClientResponseError, TraceConfig
+
+
+# aiohttp opens the TCP connection and does the TLS handshake in a single
+# call, so "connect" covers both
+PHASES = ("dns", "connect", "ttfb", "body")
+
+
+class PhaseTimer(object):
+    """Timings of the phases of one request.
+
+    `start`, `sent` and `headers` are perf_counter() values, `dns` and
+    `connect` are durations, left to None when the request reused a
+    connection.
+
+    An instance is passed to the request as its ``trace_request_ctx`` and
+    filled by the hooks of phase_trace_config().
+    """
+
+    __slots__ = (
+        "start",
+        "dns_start",
+        "dns",
+        "connect_start",
+        "connect",
+        "sent",
+        "headers",
+    )
+
+    def __init__(self):
+        self.start = self.sent = self.headers = None
+        self.dns_start = self.dns = None
+        self.connect_start = self.connect = None
+
+    def durations(self, end):
+        """Returns the duration of each phase, None for phases not seen.
+
+        `end` is when the response was processed.
+        """
+        durations = dict.fromkeys(PHASES)
+        durations["dns"] = self.dns
+        if self.connect is not None:
+            durations["connect"] = self.connect - (self.dns or 0)
+        if self.headers is not None:
+            sent = self.sent or self.start
+            durations["ttfb"] = self.headers - sent
+            durations["body"] = end - self.headers
+        return durations
+
+
+def _hook(name):
+    async def hook(session, context, params):
+        timer = context.trace_request_ctx
+        if isinstance(timer, PhaseTimer):
+            setattr(timer, name, time.perf_counter())
+
+    return hook
+
+
+async def _dns_end(session, context, params):
+    timer = context.trace_request_ctx
+    if isinstance(timer, PhaseTimer) and timer.dns_start is not None:
+        timer.dns = time.perf_counter() - timer.dns_start
+
+
+async def _connect_end(session, context, params):
+    timer = context.trace_request_ctx
+    if isinstance(timer, PhaseTimer) and timer.connect_start is not None:
+        timer.connect = time.perf_counter() - timer.connect_start
+
+
+async def _response_error(session, context, params):
+    # raise_for_status fails the request before on_request_end is sent
+    timer = context.trace_request_ctx
+    if isinstance(timer, PhaseTimer) and isinstance(
+        params.exception, ClientResponseError
+    ):
+        timer.headers = time.perf_counter()
+
+
+def phase_trace_config():
+    """Returns a TraceConfig filling the PhaseTimer of each request."""
+    config = TraceConfig()
+    config.on_request_start.append(_hook("start"))
+    config.on_dns_resolvehost_start.append(_hook("dns_start"))
+    config.on_dns_resolvehost_end.append(_dns_end)
+    config.on_connection_create_start.append(_hook("connect_start"))
+    config.on_connection_create_end.append(_connect_end)
+    config.on_request_headers_sent.append(_hook("sent"))
+    # sent once the status line and headers of the response are read
+    config.on_request_end.append(_hook("headers"))
+    config.on_request_exception.append(_response_error)
+    return config
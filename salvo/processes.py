@@ -0,0 +1,187 @@
+import copy
+import multiprocessing
+import queue as _queue
+import threading
+import time
+import traceback
+
+from molotov import util
+
+from salvo.export import completed_intervals
+from salvo.output import RunResults
+from salvo.trace import process_path
+from salvo.util import warmup_requests
+
+
+# Molotov counters that are not summed up across processes
+_MAX_COUNTERS = ("REACHED", "RATIO")
+# seconds between two updates of the progress of the processes
+PROGRESS_INTERVAL = 0.1
+# seconds for the processes to start before the first request of a
+# replay is due
+REPLAY_DELAY = 0.5
+
+
+def split(total, parts):
+    """Splits `total` into `parts` integers that differ by at most one."""
+    base, extra = divmod(total, parts)
+    return [base + 1 if i < extra else base for i in range(parts)]
+
+
+def merge_molotov_results(results):
+    merged = {}
+    for res in results:
+        for key, value in res.items():
+            if key not in merged:
+                merged[key] = value
+            elif key in _MAX_COUNTERS:
+                merged[key] = max(merged[key], value)
+            else:
+                merged[key] += value
+    return merged
+
+
+def _report_progress(res, done, index, stopped, aborted, queue=None):
+    # with a queue, the intervals completed go to the live metrics
+    start = 0
+    while not stopped.wait(PROGRESS_INTERVAL):
+        done[index] = res.done
+        # a broken --abort-on rule stops all the processes
+        if res.aborted is not None:
+            aborted.set()
+        elif aborted.is_set():
+            util.stop()
+        if queue is not None:
+            intervals, start = completed_intervals(
+                res.timeseries, start, time.perf_counter()
+            )
+            if intervals["intervals"] is not None or intervals["origin"] is None:
+                queue.put((index, "live", intervals))
+    if queue is not None:
+        intervals, start = completed_intervals(res.timeseries, start, None, final=True)
+        queue.put((index, "live", intervals))
+
+
+def _process(index, url, args, queue, origin, done, aborted):
+    # run_test sets a new event loop, the parent one can't be shared
+    # with a forked process
+    from salvo.scenario import run_test
+
+    res = RunResults(
+        num=None,
+        quiet=True,
+        significant_figures=args.precision,
+        rate=args.rate,
+        profile=args.profile,
+        interval=args.interval,
+        phases=args.phases,
+        endpoints=[endpoint.name for endpoint in args.endpoints],
+        replay=args.replay is not None,
+        speedup=args.speedup,
+        warmup=args.warmup,
+        warmup_requests=warmup_requests(args),
+    )
+
+    # the progress is shared by a thread, not by the request hot path
+    stopped = threading.Event()
+    exporting = args.statsd is not None or args.prometheus_port is not None
+    reporter = threading.Thread(
+        target=_report_progress,
+        args=(res, done, index, stopped, aborted, queue if exporting else None),
+    )
+    reporter.daemon = True
+    reporter.start()
+    try:
+        molotov_res = run_test(url, res, args, trace_origin=origin)
+    except BaseException:
+        message = (index, "error", traceback.format_exc())
+    else:
+        message = (index, "done", (res, molotov_res))
+    # the last intervals go before the results
+    stopped.set()
+    reporter.join()
+    queue.put(message)
+
+
+def _next_result(queue, jobs, results, done):
+    while True:
+        results.done = sum(done)
+        try:
+            index, kind, payload = queue.get(timeout=PROGRESS_INTERVAL)
+        except _queue.Empty:
+            # a process killed before it could send anything
+            if all(job.exitcode is not None for job in jobs) and queue.empty():
+                raise Exception("A process exited without sending its results")
+            continue
+        if kind == "live":
+            results.live.add(index, payload)
+        else:
+            return index, kind, payload
+
+
+def run_processes(url, results, args):
+    """Runs the load test in `args.processes` processes.
+
+    The concurrency and the arrival rate are split across the processes,
+    each one running its share of workers for the same number of requests
+    or duration. Access log replays are split line by line and replayed
+    on a common clock. Their results are merged into `results` and the
+    merged Molotov counters are returned. Each process writes its own
+    trace file, suffixed with its index. A process breaking an --abort-on
+    rule stops them all. With a LiveSeries in `results.live`, the
+    processes send it the intervals they completed as they go.
+    """
+    processes = min(args.processes, args.concurrency)
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    jobs = []
+    # trace files of all processes share the same time origin
+    origin = time.perf_counter()
+    # requests done by each process
+    done = ctx.RawArray("Q", processes)
+    aborted = ctx.Event()
+    if results.live is not None:
+        results.live.start(processes, origin)
+
+    for index, concurrency in enumerate(split(args.concurrency, processes)):
+        process_args = copy.copy(args)
+        process_args.concurrency = concurrency
+        if args.rate is not None:
+            process_args.rate = args.rate * concurrency / args.concurrency
+        if args.replay is not None:
+            process_args.replay_shard = (index, processes)
+            process_args.replay_origin = origin + REPLAY_DELAY
+        if args.trace_file is not None:
+            process_args.trace_file = process_path(args.trace_file, index)
+        job = ctx.Process(
+            target=_process,
+            args=(index, url, process_args, queue, origin, done, aborted),
+        )
+        job.start()
+        jobs.append(job)
+
+    molotov_results = []
+    errors = []
+    try:
+        # results are read before joining, a process can't exit
+        # until its queued data has been consumed
+        for _ in jobs:
+            index, kind, payload = _next_result(queue, jobs, results, done)
+            if results.live is not None:
+                results.live.finish(index)
+            if kind == "error":
+                errors.append("Process %d failed:\n%s" % (index, payload))
+                continue
+            res, molotov_res = payload
+            results.merge(res)
+            done[index] = res.done
+            molotov_results.append(molotov_res)
+    finally:
+        results.done = sum(done)
+        for job in jobs:
+            job.join()
+
+    if errors:
+        raise Exception("\n".join(errors))
+
+    return merge_molotov_results(molotov_results)
@@ -0,0 +1,161 @@
+"""
+Load profiles, describing the load of a run over time.
+
+A profile is a piecewise linear level, from 0 to 1, applied to the
+concurrency of the run or to its rate when ``--rate`` is used. It is
+split into stages that get their own statistics.
+"""
+
+import asyncio
+import bisect
+import math
+import time
+
+
+# granularity of the workers waiting for the concurrency to grow
+_POLL = 0.05
+
+
+class LoadProfile(object):
+    """Level of load over time.
+
+    `points` is a list of ``(seconds, level)`` tuples sorted by time and
+    starting at zero, linearly interpolated. Two points at the same time
+    make a step. The last level is kept until the end of the run.
+
+    `stages` is a list of ``(name, start, end)`` tuples.
+    """
+
+    def __init__(self, points, stages):
+        if points[0][0] != 0:
+            raise ValueError("A profile starts at 0")
+        if points[-1][1] <= 0:
+            raise ValueError("A profile can't end with no load")
+        self.points = points
+        self.stages = stages
+        self._times = [t for t, _ in points]
+        self.origin = None
+
+    def start(self, now=None):
+        if now is None:
+            now = time.perf_counter()
+        self.origin = now
+
+    def level(self, elapsed):
+        """Returns the level after `elapsed` seconds."""
+        i = bisect.bisect_right(self._times, elapsed) - 1
+        if i < 0:
+            return self.points[0][1]
+        if i == len(self.points) - 1:
+            return self.points[-1][1]
+        (t0, l0), (t1, l1) = self.points[i], self.points[i + 1]
+        return l0 + (l1 - l0) * (elapsed - t0) / (t1 - t0)
+
+    def elapsed_at(self, area):
+        """Returns the time at which the integral of the level is `area`.
+
+        For a rate profile, ``elapsed_at(n / rate)`` is when the n-th
+        request is due.
+        """
+        seen = 0.0
+        for (t0, l0), (t1, l1) in zip(self.points, self.points[1:]):
+            length = t1 - t0
+            segment = (l0 + l1) * length / 2.0
+            if length == 0 or seen + segment < area:
+                seen += segment
+                continue
+            rest = area - seen
+            if l0 == l1:
+                return t0 + rest / l0
+            slope = (l1 - l0) / length
+            return t0 + (math.sqrt(l0 * l0 + 2 * slope * rest) - l0) / slope
+        last_time, last_level = self.points[-1]
+        return last_time + (area - seen) / last_level
+
+    async def wait_active(self, worker_id, concurrency):
+        """Waits until the worker is part of the current concurrency."""
+        if self.origin is None:
+            self.start()
+        while True:
+            level = self.level(time.perf_counter() - self.origin)
+            # rounding noise, 0.3 * 10 == 3.0000000000000004
+            if worker_id < math.ceil(round(level * concurrency, 6)):
+                return
+            await asyncio.sleep(_POLL)
+
+
+def _percent(level):
+    return "%d%%" % round(level * 100)
+
+
+def _ramp(duration, seconds, stages=5):
+    if seconds <= 0:
+        raise ValueError("The ramp needs a positive duration")
+    points = [(0, 0.0), (seconds, 1.0)]
+    bounds = [seconds * i / stages for i in range(stages + 1)]
+    named = [
+        ("ramp %s-%s" % (_percent(i / stages), _percent((i + 1) / stages)), s, e)
+        for i, (s, e) in enumerate(zip(bounds, bounds[1:]))
+    ]
+    named.append(("hold 100%", seconds, duration))
+    return points, named
+
+
+def _steps(duration, count, seconds):
+    if count != int(count) or count < 1 or seconds <= 0:
+        raise ValueError("Steps need a positive count and duration")
+    count = int(count)
+    points = []
+    named = []
+    for i in range(count):
+        level = (i + 1) / count
+        start = i * seconds
+        points += [(start, level), (start + seconds, level)]
+        end = duration if i == count - 1 else start + seconds
+        named.append(("step %d %s" % (i + 1, _percent(level)), start, end))
+    return points, named
+
+
+def _spike(duration, start, seconds, base=0.1):
+    if start < 0 or seconds <= 0:
+        raise ValueError("The spike needs a start time and a positive duration")
+    if not 0 < base <= 1:
+        raise ValueError("The base level of a spike is in ]0, 1]")
+    end = start + seconds
+    points = [(0, base), (start, base), (start, 1.0), (end, 1.0), (end, base)]
+    named = [
+        ("before spike", 0, start),
+        ("spike", start, end),
+        ("after spike", end, duration),
+    ]
+    return points, named
+
+
+_PROFILES = {"ramp": _ramp, "steps": _steps, "spike": _spike}
+
+
+def parse_profile(spec, duration):
+    """Builds a LoadProfile out of a ``--profile`` option.
+
+    Options are ``ramp:SECONDS``, ``steps:COUNT:SECONDS`` and
+    ``spike:START:SECONDS[:BASE]``, for a run of `duration` seconds.
+    Stages starting after the end of the run are left out.
+    """
+    name, *options = spec.split(":")
+    if name not in _PROFILES:
+        raise ValueError("Unknown profile %r" % name)
+    try:
+        options = [float(option) for option in options]
+    except ValueError:
+        raise ValueError("Malformed profile %r" % spec)
+    try:
+        points, stages = _PROFILES[name](duration, *options)
+    except TypeError:
+        raise ValueError("Malformed profile %r" % spec)
+
+    stages = [
+        (stage, start, min(end, duration))
+        for stage, start, end in stages
+        if start < duration and end > start
+    ]
+    return LoadProfile(points, stages)
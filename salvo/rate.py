@@ -0,0 +1,85 @@
+import asyncio
+import random
+import time
+
+
+# sending a request later than this after its slot makes it late
+LATE_AFTER = 0.001
+
+
+class ArrivalSchedule(object):
+    """Open-loop schedule of request send times.
+
+    Slots are spaced by ``1 / rate`` seconds, or drawn from a Poisson
+    process when `poisson` is True, regardless of how fast the server
+    answers. Each worker of the run is an in-flight slot: it waits for
+    the next send time, and when every worker was busy at that time the
+    request is sent late. Its latency is still measured from the intended
+    send time, which corrects the coordinated omission of closed-loop
+    runs.
+
+    When `max_lag` is set, slots more than `max_lag` seconds in the past
+    are dropped instead of being sent. Late and dropped requests are
+    counted in the `late` and `dropped` attributes of `results`.
+
+    When a `profile` is given (see salvo.profile.LoadProfile), the rate
+    follows its level over time.
+    """
+
+    def __init__(
+        self, rate, results, poisson=False, max_lag=None, seed=None, profile=None
+    ):
+        if rate <= 0:
+            raise ValueError("The rate must be positive")
+        self.rate = rate
+        self.results = results
+        self.poisson = poisson
+        self.max_lag = max_lag
+        self.profile = profile
+        self._random = random.Random(seed)
+        self._start = None
+        self._next = None
+        # number of requests due so far at the full rate
+        self._area = 0
+
+    def start(self, now=None):
+        if now is None:
+            now = time.perf_counter()
+        if self.profile is not None:
+            self.profile.start(now)
+        self._start = self._next = now
+        self._area = 0
+
+    def _advance(self):
+        intended = self._next
+        if self.poisson:
+            self._area += self._random.expovariate(1.0)
+        else:
+            self._area += 1
+        # computed from the start to avoid accumulating float errors
+        if self.profile is None:
+            self._next = self._start + self._area / self.rate
+        else:
+            self._next = self._start + self.profile.elapsed_at(self._area / self.rate)
+        return intended
+
+    async def next_slot(self):
+        """Waits for the next send time and returns it.
+
+        The returned value is a time.perf_counter() value.
+        """
+        now = time.perf_counter()
+        if self._start is None:
+            self.start(now)
+
+        intended = self._advance()
+        if self.max_lag is not None:
+            while now - intended > self.max_lag:
+                self.results.dropped += 1
+                intended = self._advance()
+
+        if intended > now:
+            await asyncio.sleep(intended - now)
+        elif now - intended > LATE_AFTER:
+            self.results.late += 1
+        return intended
@@ -0,0 +1,182 @@
+"""
+Replay of the requests of an access log.
+"""
+
+import asyncio
+import gzip
+import re
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+from salvo.rate import LATE_AFTER
+
+
+# the "[time] "request"" part of the common and combined log formats
+_LINE = re.compile(r'\[([^\]]+)\]\s+"([A-Z]+) (\S+)')
+_TIME_FORMAT = "%d/%b/%Y:%H:%M:%S %z"
+_METHODS = frozenset(("GET", "POST", "PUT", "DELETE", "HEAD", "OPTIONS", "PATCH"))
+# requests read ahead at once, out of the event loop
+READ_AHEAD = 1000
+
+
+def parse_line(line):
+    """Returns the (timestamp, method, path) of a log line, or None.
+
+    Lines are in the common or combined log format of nginx and Apache,
+    eg. ``1.2.3.4 - - [10/Oct/2020:13:55:36 +0000] "GET /a HTTP/1.1" 200 2``
+    """
+    return _parse(_LINE.search(line))
+
+
+def _parse(match):
+    if match is None:
+        return None
+    when, method, path = match.groups()
+    if method not in _METHODS or not path.startswith("/"):
+        return None
+    try:
+        timestamp = datetime.strptime(when, _TIME_FORMAT).timestamp()
+    except ValueError:
+        return None
+    return timestamp, method, path
+
+
+def _open(path):
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", errors="replace")
+    return open(path, errors="replace")
+
+
+class LogReplay(object):
+    """Streams the requests of an access log, in order.
+
+    The log is read lazily, READ_AHEAD lines at a time in a thread of the
+    executor of the loop, so its size does not matter and reading it does
+    not block the requests. With a `speedup`, requests are sent at their
+    original times scaled down by this factor and their latencies are
+    measured from these times, like the --rate ones. Requests sent late
+    are counted in the `late` attribute of `results`. Without a speedup,
+    requests are sent as fast as the workers go.
+
+    Log timestamps are in seconds, so the requests of a same second are
+    spread evenly across it, in their order in the log, rather than all
+    sent at once when it starts.
+
+    The first request of the log is due at `origin`, a perf_counter()
+    value, or as soon as asked for without one. Process `shard` of
+    `shards` only replays one line out of `shards`, and shares `origin`
+    with the other processes, so that they all replay the log on the
+    same clock. Unparsable lines are counted in
+    ``results.replay["skipped"]``.
+    """
+
+    def __init__(self, path, results, speedup=None, shard=0, shards=1, origin=None):
+        if speedup is not None and speedup <= 0:
+            raise ValueError("The speedup must be positive")
+        self.path = path
+        self.results = results
+        self.speedup = speedup
+        self.shard = shard
+        self.shards = shards
+        self._entries = self._read()
+        self._buffer = deque()
+        self._ended = False
+        # created in the loop of the run
+        self._lock = None
+        # perf_counter() value and log timestamp of the first request
+        self._start = origin
+        self._first = None
+
+    def _read(self):
+        stream = _open(self.path)
+        try:
+            # the requests of the shard in the current second of the log,
+            # with their position among all the requests of this second
+            second, size, group = None, 0, []
+            for number, line in enumerate(stream):
+                mine = number % self.shards == self.shard
+                match = _LINE.search(line)
+                if match is not None and match.group(1) != second:
+                    yield from self._spread(group, size)
+                    second, size, group = match.group(1), 0, []
+                if mine or self._first is None:
+                    entry = _parse(match)
+                    if entry is not None and self._first is None:
+                        # the clock of the log starts with its first
+                        # request, whichever shard replays it
+                        self._first = entry[0]
+                if not mine:
+                    size += match is not None
+                    continue
+                if entry is None:
+                    self.results.replay["skipped"] += 1
+                    continue
+                group.append((size, entry))
+                size += 1
+            yield from self._spread(group, size)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    def _spread(self, group, size):
+        for position, (timestamp, method, path) in group:
+            yield timestamp + position / size, method, path
+
+    def _read_ahead(self):
+        entries = []
+        for entry in self._entries:
+            entries.append(entry)
+            if len(entries) == READ_AHEAD:
+                break
+        return entries
+
+    async def _next_entry(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # a single read at a time, the other workers wait for its lines
+        async with self._lock:
+            if not self._buffer and not self._ended:
+                loop = asyncio.get_event_loop()
+                entries = await loop.run_in_executor(None, self._read_ahead)
+                self._buffer.extend(entries)
+                self._ended = len(entries) < READ_AHEAD
+        if not self._buffer:
+            return None
+        return self._buffer.popleft()
+
+    async def next_request(self):
+        """Returns the (start, method, path) of the next request.
+
+        `start` is when the request is due, a time.perf_counter() value.
+        Returns None at the end of the log.
+        """
+        if self._buffer:
+            entry = self._buffer.popleft()
+        else:
+            entry = await self._next_entry()
+        if entry is None:
+            return None
+        timestamp, method, path = entry
+        now = time.perf_counter()
+        if self.speedup is None:
+            return now, method, path
+
+        if self._start is None:
+            self._start = now
+        intended = self._start + (timestamp - self._first) / self.speedup
+        if intended > now:
+            await asyncio.sleep(intended - now)
+        elif now - intended > LATE_AFTER:
+            self.results.late += 1
+        return intended, method, path
+
+    def close(self):
+        try:
+            self._entries.close()
+        except ValueError:
+            # still read ahead by the executor, which closes it when done
+            pass
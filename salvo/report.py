@@ -0,0 +1,277 @@
+"""
+Result files, read by the report and compare subcommands.
+
+``--save FILE`` writes the results of a run (see RunResults.snapshot)
+with its command line and server info into a gzipped JSON file, which
+``salvo report FILE`` prints again and ``salvo compare BASE NEW`` checks
+for regressions, exiting with EXIT_REGRESSION when it finds some.
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import time
+
+from salvo import __version__
+from salvo.histogram import percentile_label
+from salvo.output import RunResults, print_errors
+from salvo.stats import mann_whitney, normal_sf, student_sf, welch
+from salvo.util import print_server_info
+
+
+FORMAT = "salvo-results"
+VERSION = 1
+EXIT_REGRESSION = 1
+# files that can't be read
+EXIT_INVALID = 2
+# latency percentiles compared, on top of the average
+PERCENTILES = (50, 90, 99)
+
+
+def save_results(path, res, argv):
+    """Writes the results `res` of the command line `argv` into `path`."""
+    data = {
+        "format": FORMAT,
+        "version": VERSION,
+        "salvo": __version__,
+        "created": time.time(),
+        "argv": list(argv),
+        "server_info": res.server_info,
+        "results": res.snapshot(),
+    }
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+
+
+def load_results(path):
+    """Reads a result file, returns the RunResults and the file content."""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, EOFError, ValueError) as e:
+        raise ValueError("Can't read %s: %s" % (path, e))
+    if not isinstance(data, dict) or data.get("format") != FORMAT:
+        raise ValueError("%s is not a salvo result file" % path)
+    if data.get("version") != VERSION:
+        raise ValueError(
+            "%s has the version %r of the format, not %d"
+            % (path, data.get("version"), VERSION)
+        )
+    res = RunResults.from_snapshot(data["results"], server_info=data["server_info"])
+    return res, data
+
+
+def _rps_samples(res):
+    # the last interval is usually cut short by the end of the run
+    rows = res.timeseries.rows()
+    if len(rows) > 2:
+        rows = rows[:-1]
+    return [row["rps"] for row in rows]
+
+
+def _change(base, new):
+    # None when there is nothing to compare with: a change from 0 has no
+    # ratio, and JSON no infinity
+    if base == 0:
+        return 0.0 if new == 0 else None
+    return (new - base) / base
+
+
+def compare_runs(base, new, alpha=0.05, threshold=0.05):
+    """Compares the RunResults of two runs.
+
+    A regression is a change that is both statistically significant at
+    the `alpha` level and larger than `threshold`, relative to `base`:
+
+    - latencies: new requests take longer according to a Mann-Whitney U
+      test, with the average, p50, p90 or p99 growing beyond the threshold
+    - throughput: the requests per second of the intervals of the new run
+      are lower according to a Welch's t-test, with their average dropping
+      beyond the threshold. Runs with less than two intervals can't be
+      tested.
+    """
+    base_stats, new_stats = base._calc_stats(), new._calc_stats()
+    base_percentiles = base._calc_percentiles()
+    new_percentiles = new._calc_percentiles()
+    metrics = {
+        "rps": (base_stats.rps, new_stats.rps),
+        "avg": (base_stats.avg, new_stats.avg),
+    }
+    for percentile in PERCENTILES:
+        label = percentile_label(percentile)
+        metrics[label] = (base_percentiles[label], new_percentiles[label])
+    base_count = base_stats.count or 1
+    new_count = new_stats.count or 1
+    metrics["error_rate"] = (
+        sum(base.errors.values()) / base_count,
+        sum(new.errors.values()) / new_count,
+    )
+    res = {
+        "metrics": {
+            name: {"base": b, "new": n, "change": _change(b, n)}
+            for name, (b, n) in metrics.items()
+        },
+        "alpha": alpha,
+        "threshold": threshold,
+    }
+
+    z = mann_whitney(base._all_histogram(), new._all_histogram())
+    p = normal_sf(z)
+    # a latency growing from 0 grew beyond any threshold
+    grown = any(
+        change is None or change > threshold
+        for change in (
+            res["metrics"][name]["change"]
+            for name in ["avg"] + [percentile_label(p) for p in PERCENTILES]
+        )
+    )
+    res["latency"] = {
+        "test": "mann-whitney",
+        "z": z,
+        "p": p,
+        "regression": p < alpha and grown,
+    }
+
+    base_samples, new_samples = _rps_samples(base), _rps_samples(new)
+    if len(base_samples) < 2 or len(new_samples) < 2:
+        res["throughput"] = {"test": "welch", "t": None, "p": None, "regression": False}
+    else:
+        t, df = welch(base_samples, new_samples)
+        p = student_sf(-t, df)
+        change = _change(
+            sum(base_samples) / len(base_samples), sum(new_samples) / len(new_samples)
+        )
+        # no drop from 0 requests per second
+        dropped = change is not None and -change > threshold
+        res["throughput"] = {
+            "test": "welch",
+            "t": t,
+            "p": p,
+            "regression": p < alpha and dropped,
+        }
+
+    res["regression"] = res["latency"]["regression"] or res["throughput"]["regression"]
+    return res
+
+
+def _percent(change):
+    if change is None:
+        return "%10s" % "n/a"
+    return "%+9.1f%%" % (change * 100)
+
+
+def print_comparison(comparison, stream=sys.stdout):
+    metrics = comparison["metrics"]
+    stream.write("-------- Comparison --------\n\n")
+    stream.write("%-20s%12s%12s%10s\n" % ("", "Base", "New", "Change"))
+    rps = metrics["rps"]
+    stream.write(
+        "%-20s%12.2f%12.2f%s\n"
+        % ("Requests Per Second", rps["base"], rps["new"], _percent(rps["change"]))
+    )
+    for name in ["avg"] + [percentile_label(p) for p in PERCENTILES]:
+        metric = metrics[name]
+        stream.write(
+            "%-20s%10.4f s%10.4f s%s\n"
+            % (name, metric["base"], metric["new"], _percent(metric["change"]))
+        )
+    errors = metrics["error_rate"]
+    stream.write(
+        "%-20s%11.2f%%%11.2f%%\n\n"
+        % ("Error rate", errors["base"] * 100, errors["new"] * 100)
+    )
+
+    def _verdict(test):
+        if test["p"] is None:
+            return "not enough intervals to test"
+        verdict = "REGRESSION" if test["regression"] else "ok"
+        return "%s (p=%.4f)" % (verdict, test["p"])
+
+    stream.write("Latency             \t\t%s\n" % _verdict(comparison["latency"]))
+    stream.write("Throughput          \t\t%s\n\n" % _verdict(comparison["throughput"]))
+    stream.flush()
+
+
+def _load(path):
+    try:
+        return load_results(path)
+    except ValueError as e:
+        print(str(e))
+        sys.exit(EXIT_INVALID)
+
+
+def report_main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="salvo report", description="Prints the results saved with --save."
+    )
+    parser.add_argument("file", help="Result file")
+    parser.add_argument(
+        "--json-output",
+        help="Prints the results in JSON",
+        action="store_true",
+        default=False,
+    )
+    args = parser.parse_args(argv)
+    res, data = _load(args.file)
+
+    if args.json_output:
+        res.print_json()
+        return res
+
+    created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(data["created"]))
+    print("Run of %s with salvo %s" % (created, data["salvo"]))
+    print("salvo " + " ".join(data["argv"]))
+    print("")
+    if res.server_info is not None:
+        print_server_info(res.server_info)
+    if res.errors_desc:
+        print_errors(res.describe_errors())
+    res.print_stats()
+    return res
+
+
+def compare_main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="salvo compare",
+        description=(
+            "Compares two runs saved with --save, and exits with %d when the "
+            "new one regressed" % EXIT_REGRESSION
+        ),
+    )
+    parser.add_argument("base", help="Result file of the reference run")
+    parser.add_argument("new", help="Result file of the run to check")
+    parser.add_argument(
+        "--alpha",
+        help="Significance level of the tests, 0.05 by default",
+        type=float,
+        default=0.05,
+    )
+    parser.add_argument(
+        "--threshold",
+        help="Smallest change counted as a regression, in percent, 5 by default",
+        type=float,
+        default=5.0,
+    )
+    parser.add_argument(
+        "--json-output",
+        help="Prints the comparison in JSON",
+        action="store_true",
+        default=False,
+    )
+    args = parser.parse_args(argv)
+    if not 0 < args.alpha < 1 or args.threshold < 0:
+        print("The significance level is between 0 and 1, the threshold positive")
+        parser.print_usage()
+        sys.exit(1)
+
+    base, _ = _load(args.base)
+    new, _ = _load(args.new)
+    comparison = compare_runs(base, new, args.alpha, args.threshold / 100.0)
+    if args.json_output:
+        print(json.dumps(comparison))
+    else:
+        print_comparison(comparison)
+    if comparison["regression"]:
+        sys.exit(EXIT_REGRESSION)
+    return comparison
@@ -0,0 +1,177 @@
+"""
+Request functions compiled once per run.
+
+The options of a run don't change while it goes, so instead of looking
+them up for every request, compile_request() returns a function with the
+options bound as closure variables. Runs using none of the optional
+features get a leaner variant than the general one.
+"""
+
+import time
+
+from aiohttp import ClientResponseError
+from molotov import util
+
+from salvo.phases import PhaseTimer
+
+
+# bytes read at once when draining a response body
+CHUNK_SIZE = 64 * 1024
+
+
+def body_size(data):
+    if isinstance(data, str):
+        return len(data.encode("utf-8"))
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return len(data)
+    # forms and streams are encoded by aiohttp
+    return 0
+
+
+async def _drain(resp):
+    received = 0
+    async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+        received += len(chunk)
+    return received
+
+
+def _record_error(res, exc, start, duration, sent=0, name=None):
+    if not res.incr(exc.status, duration, start, 0, sent, name):
+        # the warm-up counts its own errors
+        return False
+    res.errors[exc.status] += 1
+    # a string, like the counts it survives pickling and snapshots
+    res.errors_desc.setdefault(exc.status, str(exc))
+    return True
+
+
+def _basic_request(url, method, res, data=None):
+    # XXX we should implement raise_for_status globally in
+    # the session in Molotov
+    options = {"raise_for_status": True}
+    if data:
+        options["data"] = data
+    incr = res.incr
+    perf_counter = time.perf_counter
+
+    async def request(session):
+        start = perf_counter()
+        try:
+            async with session.request(method, url, **options) as resp:
+                incr(resp.status, perf_counter() - start, start)
+        except ClientResponseError as exc:
+            _record_error(res, exc, start, perf_counter() - start)
+
+    return request
+
+
+def _request(
+    url,
+    method,
+    res,
+    data=None,
+    schedule=None,
+    profile=None,
+    replay=None,
+    endpoints=None,
+    pre_hook=None,
+    post_hook=None,
+    payloads=None,
+    read_body=False,
+    trace=None,
+):
+    data_callable = callable(data)
+    phases = res.phases
+    perf_counter = time.perf_counter
+
+    async def request(session):
+        if profile is not None and schedule is None:
+            await profile.wait_active(session.worker_id, session.args.workers)
+
+        meth, target = method, url
+        if replay is not None:
+            entry = await replay.next_request()
+            if entry is None:
+                # the end of the log ends the run
+                util.stop()
+                return
+            start, meth, path = entry
+            target = url.rstrip("/") + path
+
+        options = {}
+        if endpoints is not None:
+            endpoint = endpoints.pick()
+            meth, target = endpoint.method, endpoint.url
+            if endpoint.headers:
+                options["headers"] = endpoint.headers
+            if endpoint.data is not None:
+                options["data"] = endpoint.data
+            name = endpoint.name
+        else:
+            name = None
+
+        if pre_hook is not None:
+            meth, target, options = pre_hook(meth, target, options)
+
+        if payloads is not None:
+            options["data"] = payloads.next()
+        elif data_callable:
+            options["data"] = data(meth, target, options)
+        elif data:
+            options["data"] = data
+
+        sent = body_size(options.get("data")) if read_body else 0
+
+        if phases:
+            timer = options["trace_request_ctx"] = PhaseTimer()
+
+        if schedule is not None:
+            # latencies of open-loop runs start at the intended send time
+            start = await schedule.next_slot()
+        elif replay is None:
+            start = perf_counter()
+        try:
+            async with session.request(
+                meth, target, raise_for_status=True, **options
+            ) as resp:
+                if post_hook is not None:
+                    resp = await post_hook(resp)
+                if read_body:
+                    # a post hook reading the body leaves nothing to drain
+                    received = size = await _drain(resp)
+                else:
+                    received, size = 0, resp.content_length or 0
+                end = perf_counter()
+                duration = end - start
+                measured = res.incr(resp.status, duration, start, received, sent, name)
+                status = resp.status
+        except ClientResponseError as exc:
+            end = perf_counter()
+            duration = end - start
+            measured = _record_error(res, exc, start, duration, sent, name)
+            status, size = exc.status, 0
+
+        if phases and measured:
+            res.record_phases(timer, end)
+
+        if trace is not None:
+            trace.add(start, duration, status, size, session.worker_id)
+
+    return request
+
+
+def compile_request(url, method, results, **options):
+    """Returns the coroutine function sending a request of the run.
+
+    `options` are the keyword arguments of the optional features: the
+    request `data` or `payloads`, the `pre_hook` and `post_hook`, the
+    `schedule`, `profile` and `replay` driving the requests, the
+    `endpoints` picker, `read_body` and the `trace` writer.
+    """
+    method = method.upper()
+    data = options.get("data")
+    features = dict(options)
+    features.pop("data", None)
+    if not callable(data) and not results.phases and not any(features.values()):
+        return _basic_request(url, method, results, data)
+    return _request(url, method, results, **options)
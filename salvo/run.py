@@ -1,10 +1,27 @@
 import argparse
+import json
 import logging
 import sys
 
 from salvo import __version__
+from salvo.abort import EXIT_ABORTED, parse_rule
+from salvo.agents import AgentError, parse_agents
+from salvo.capacity import (
+    MAX_CONCURRENCY,
+    MAX_RATE,
+    CapacitySearch,
+    parse_error_rate,
+    parse_slo,
+)
+from salvo.connector import parse_resolve
+from salvo.endpoints import load_endpoints
+from salvo.export import LiveSeries, MetricsExporter, parse_statsd
 from salvo.output import RunResults
-from salvo.util import get_server_info, print_server_info
+from salvo.payloads import ORDERS, PayloadPool, from_callable, load_payloads
+from salvo.profile import parse_profile
+from salvo.report import save_results
+from salvo.util import LOOPS, available_loop, get_server_info, print_server_info
+from salvo.util import resolve, warmup_requests
 
 
 logger = logging.getLogger("break")
@@ -14,46 +31,151 @@ _H = "--------"
 
 
 def load(url, args, stream=sys.stdout):
-    server_info = get_server_info(url, args.method, headers=args.headers)
+    server_info = get_server_info(
+        url, args.method, headers=args.headers, addresses=dict(args.resolve)
+    )
 
     if not args.quiet:
         print_server_info(server_info, stream)
-        if args.duration is None:
+        if args.agents:
+            extra = f" - agents {len(args.agents)}"
+        else:
+            extra = ""
+        if args.processes > 1:
+            extra += f" - processes {args.processes}"
+        if args.rate is not None:
+            extra += f" - rate {args.rate:g}/s"
+        if args.warmup is not None:
+            extra += f" - warm-up {args.warmup:g}s"
+        elif args.warmup_requests is not None:
+            extra += f" - warm-up {args.warmup_requests} queries"
+        if args.replay is not None:
+            print(
+                _H + f" Replaying {args.replay} - concurrency "
+                f"{args.concurrency}{extra} " + _H
+            )
+        elif args.duration is None:
             print(
                 _H + f" Running {args.requests} queries - concurrency "
-                f"{args.concurrency} " + _H
+                f"{args.concurrency}{extra} " + _H
             )
         else:
             print(
                 _H + f" Running for ~{args.duration} seconds - concurrency "
-                f"{args.concurrency} " + _H
+                f"{args.concurrency}{extra} " + _H
             )
 
         print("")
 
-    if args.duration is not None:
+    if args.duration is not None or args.replay is not None:
         num = None
     else:
         num = args.concurrency * args.requests
 
-    res = RunResults(server_info, num=num, duration=args.duration, quiet=args.quiet)
+    res = RunResults(
+        server_info,
+        num=num,
+        duration=args.duration,
+        quiet=args.quiet,
+        significant_figures=args.precision,
+        rate=args.rate,
+        profile=args.profile,
+        interval=args.interval,
+        phases=args.phases,
+        endpoints=[endpoint.name for endpoint in args.endpoints],
+        replay=args.replay is not None,
+        speedup=args.speedup,
+        loop=args.loop,
+        warmup=args.warmup,
+        warmup_requests=warmup_requests(args),
+    )
 
-    from salvo.scenario import run_test
+    if args.agents:
+        from salvo.agents import run_agents as run_test
+    elif args.processes > 1:
+        from salvo.processes import run_processes as run_test
+    else:
+        from salvo.scenario import run_test
+
+    if args.statsd is not None or args.prometheus_port is not None:
+        if args.agents or args.processes > 1:
+            # the processes or agents send their intervals as they go
+            res.live = LiveSeries(args.interval)
+            source, options = res.live, {"clock": res.live.clock}
+        else:
+            source, options = res, {}
+        try:
+            exporter = MetricsExporter(
+                source, args.statsd, args.prometheus_port, **options
+            )
+        except OSError as e:
+            raise Exception(f"Can't export the metrics: {e}")
+        exporter.start()
+    else:
+        exporter = None
 
+    res.start_progress()
     try:
         molotov_res = run_test(url, res, args)
     except SystemExit as e:
         raise Exception(f"Molotov exit {e.code}")
     finally:
+        res.stop_progress()
+        if exporter is not None:
+            exporter.stop()
         if not args.quiet:
             print("")
 
     return res, molotov_res
 
 
-def main():
+def find_capacity(url, args, stream=sys.stdout):
+    server_info = get_server_info(
+        url, args.method, headers=args.headers, addresses=dict(args.resolve)
+    )
+    search = CapacitySearch(url, args, args.slo, args.max_error_rate, stream=stream)
+
+    if not args.quiet:
+        print_server_info(server_info, stream)
+        by = "rate" if search.by_rate else "concurrency"
+        print(
+            _H + f" Searching the capacity by {by} - "
+            f"{args.probe_duration} seconds probes " + _H
+        )
+        print("")
+
+    try:
+        search.run()
+    except SystemExit as e:
+        raise Exception(f"Molotov exit {e.code}")
+
+    return search
+
+
+def _payload_pool(args):
+    if args.payloads is not None:
+        if args.data is not None or args.pregenerate is not None:
+            raise ValueError("You can't use --payloads with --data or --pregenerate")
+        if args.method not in _DATA_VERBS or args.scenario_file is not None:
+            raise ValueError("--payloads is for POST or PUT requests to an URL")
+        payloads = load_payloads(args.payloads)
+    elif args.pregenerate is not None:
+        if args.data is None or not args.data.startswith("py:"):
+            raise ValueError("--pregenerate needs a -D py: callable")
+        if args.pregenerate < 1:
+            raise ValueError("--pregenerate needs at least one payload")
+        func = resolve(args.data.split(":")[1])
+        payloads = from_callable(func, args.pregenerate, args.method, args.url)
+    else:
+        return None
+    return PayloadPool(payloads, args.payload_order)
+
+
+def build_parser(replay=False):
+    """Returns the parser of the options, of salvo replay with `replay`."""
     parser = argparse.ArgumentParser(
-        description="Simple HTTP Load runner based on Molotov."
+        prog="salvo replay" if replay else None,
+        description="Simple HTTP Load runner based on Molotov.",
     )
 
     parser.add_argument(
@@ -90,8 +212,170 @@ def main():
         default=None,
     )
 
+    parser.add_argument(
+        "--pregenerate",
+        help=(
+            "Calls the -D py: callable this many times before the run and "
+            "sends these bodies instead of calling it for every request"
+        ),
+        type=int,
+        default=None,
+        metavar="N",
+    )
+
+    parser.add_argument(
+        "--payloads",
+        help=(
+            "Sends the bodies read from a directory, a file each, or from "
+            "an NDJSON file, a line each, instead of --data. Large files "
+            "are memory-mapped, those of a directory when they are sent"
+        ),
+        type=str,
+        default=None,
+        metavar="PATH",
+    )
+
+    parser.add_argument(
+        "--payload-order",
+        help="Order of the --pregenerate or --payloads bodies",
+        type=str,
+        default="cycle",
+        choices=ORDERS,
+    )
+
     parser.add_argument("-c", "--concurrency", help="Concurrency", type=int, default=1)
 
+    parser.add_argument(
+        "-p",
+        "--processes",
+        help=(
+            "Number of processes. The concurrency is split across them "
+            "and their results are merged"
+        ),
+        type=int,
+        default=1,
+    )
+
+    parser.add_argument(
+        "--agents",
+        help=(
+            "Comma-separated host:port of salvo agents, started with "
+            "salvo agent. The concurrency is split across them and their "
+            "results are merged"
+        ),
+        type=str,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--agent-token",
+        help="Token of the agents started with salvo agent --token",
+        type=str,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--rate",
+        help=(
+            "Sends requests at this fixed rate per second whatever the "
+            "response times, using the concurrency as the maximum number "
+            "of requests in flight. Latencies are measured from the "
+            "intended send time"
+        ),
+        type=float,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--poisson",
+        help="With --rate, spaces requests with a Poisson process",
+        action="store_true",
+        default=False,
+    )
+
+    parser.add_argument(
+        "--max-lag",
+        help=(
+            "With --rate, drops requests that could not be sent within "
+            "this many seconds of their intended send time"
+        ),
+        type=float,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--profile",
+        help=(
+            "Load profile of a --duration run, applied to the concurrency "
+            "or to the rate: ramp:SECONDS for a linear ramp, "
+            "steps:COUNT:SECONDS for a staircase, spike:START:SECONDS[:BASE] "
+            "for a spike over a BASE level (0.1 by default). "
+            "Each stage gets its own statistics"
+        ),
+        type=str,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--find-capacity",
+        help=(
+            "Searches the highest concurrency, or rate with --rate, that "
+            "meets the --slo and --max-error-rate objectives, starting at "
+            "the given value"
+        ),
+        action="store_true",
+        default=False,
+    )
+
+    parser.add_argument(
+        "--slo",
+        help=(
+            "Latency objective of --find-capacity, eg. p99<200ms. " "Can be repeated"
+        ),
+        type=str,
+        action="append",
+    )
+
+    parser.add_argument(
+        "--max-error-rate",
+        help="Maximum error rate of --find-capacity, eg. 0.1%%",
+        type=str,
+        default="1%",
+    )
+
+    parser.add_argument(
+        "--probe-duration",
+        help="Duration in seconds of each --find-capacity probe",
+        type=int,
+        default=10,
+    )
+
+    parser.add_argument(
+        "--max-concurrency",
+        help="Highest concurrency probed by --find-capacity, %d by default"
+        % MAX_CONCURRENCY,
+        type=int,
+        default=MAX_CONCURRENCY,
+    )
+
+    parser.add_argument(
+        "--max-rate",
+        help="Highest rate probed by --find-capacity --rate, %g by default" % MAX_RATE,
+        type=float,
+        default=MAX_RATE,
+    )
+
+    parser.add_argument(
+        "--scenario-file",
+        help=(
+            "JSON, YAML or TOML file listing weighted endpoints to hit "
+            "instead of a single URL, which is then their base URL, over "
+            "the base_url of the file. Each endpoint gets its own statistics"
+        ),
+        type=str,
+        default=None,
+    )
+
     parser.add_argument(
         "-a",
         "--auth",
@@ -140,6 +424,148 @@ def main():
         default=False,
     )
 
+    parser.add_argument(
+        "--interval",
+        help="Interval in seconds of the time series of the results",
+        type=float,
+        default=1.0,
+    )
+
+    parser.add_argument(
+        "--timeseries-csv",
+        help="Writes the time series of the results in a CSV file",
+        type=str,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--save",
+        help=(
+            "Saves the results in this file, for salvo report FILE and "
+            "salvo compare BASE NEW"
+        ),
+        type=str,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--abort-on",
+        help=(
+            "Stops the run when this rule breaks over a sliding window, eg. "
+            "'p99>500ms over 10s' or 'errors>5%%', and exits with %d. The "
+            "window defaults to 10 seconds. Can be repeated" % EXIT_ABORTED
+        ),
+        type=str,
+        action="append",
+    )
+
+    parser.add_argument(
+        "--statsd",
+        help=(
+            "Sends the requests, errors and latencies of each interval to "
+            "this StatsD server, host:port, during the run. With --processes "
+            "or --agents, once they all completed the interval"
+        ),
+        type=str,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--prometheus-port",
+        help=(
+            "Serves the requests, errors and latencies of the last interval "
+            "on /metrics on this port, for Prometheus, during the run"
+        ),
+        type=int,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--trace-file",
+        help=(
+            "Writes a record per request in this file: start, duration, "
+            "status, bytes and worker. NDJSON if the file ends with .ndjson "
+            "or .jsonl, CSV otherwise, compressed when it ends with .gz. "
+            "With --processes, each process writes its own file"
+        ),
+        type=str,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--pool-limit",
+        help=(
+            "Maximum number of connections open at once, shared by the "
+            "workers of each process. 0 for no limit"
+        ),
+        type=int,
+        default=0,
+    )
+
+    parser.add_argument(
+        "--per-host-limit",
+        help="Maximum number of connections open at once to a host. 0 for no limit",
+        type=int,
+        default=0,
+    )
+
+    parser.add_argument(
+        "--keepalive-timeout",
+        help="Seconds an idle connection is kept open, 15 by default",
+        type=float,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--force-close",
+        help="Opens a new connection for every request",
+        action="store_true",
+        default=False,
+    )
+
+    parser.add_argument(
+        "--dns-ttl",
+        help=(
+            "Seconds the DNS lookups are cached, 0 to resolve the host on "
+            "every new connection. By default, the host is resolved once "
+            "for the whole run"
+        ),
+        type=float,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--resolve",
+        help=(
+            "Connects to ADDRESS for HOST:PORT instead of resolving HOST, "
+            "eg. example.com:443:10.0.0.1. Can be repeated"
+        ),
+        type=str,
+        action="append",
+        metavar="HOST:PORT:ADDRESS",
+    )
+
+    parser.add_argument(
+        "--read-body",
+        help=(
+            "Downloads the body of each response, in chunks, and reports "
+            "the bytes received and sent"
+        ),
+        action="store_true",
+        default=False,
+    )
+
+    parser.add_argument(
+        "--phases",
+        help=(
+            "Times the connection phases of each request (DNS, connect, "
+            "time to first byte and body) and counts new and reused "
+            "connections. Adds some overhead to each request"
+        ),
+        action="store_true",
+        default=False,
+    )
+
     parser.add_argument(
         "-q",
         "--quiet",
@@ -148,6 +574,29 @@ def main():
         default=False,
     )
 
+    parser.add_argument(
+        "--precision",
+        help=(
+            "Number of significant figures kept by the latency histograms, "
+            "from 1 to 5. Each one more multiplies by about ten the memory "
+            "and time spent on very spread out latencies"
+        ),
+        type=int,
+        default=3,
+        choices=range(1, 6),
+        metavar="{1-5}",
+    )
+
+    parser.add_argument(
+        "--loop",
+        help=(
+            "Event loop running the requests. uvloop needs to be installed, "
+            "the asyncio one is used otherwise"
+        ),
+        choices=LOOPS,
+        default="asyncio",
+    )
+
     group = parser.add_mutually_exclusive_group()
 
     group.add_argument(
@@ -158,28 +607,281 @@ def main():
         "-d", "--duration", help="Duration in seconds", type=int, default=None
     )
 
+    warmup = parser.add_mutually_exclusive_group()
+
+    warmup.add_argument(
+        "--warmup",
+        help=(
+            "Seconds of warm-up at full load before a --duration run. Its "
+            "requests are reported apart and left out of the results"
+        ),
+        type=float,
+        default=None,
+    )
+
+    warmup.add_argument(
+        "--warmup-requests",
+        help=(
+            "Number of warm-up requests of each worker before the ones of "
+            "--requests. They are reported apart and left out of the results"
+        ),
+        type=int,
+        default=None,
+    )
+
+    if replay:
+        parser.add_argument(
+            "--speedup",
+            help=(
+                "Replays the requests at their original times, sped up by "
+                "this factor. By default they are sent as fast as possible"
+            ),
+            type=float,
+            default=None,
+        )
+        parser.add_argument(
+            "log",
+            help=(
+                "Access log in the common or combined format, gzipped when "
+                "it ends with .gz, - for the standard input"
+            ),
+        )
+
     parser.add_argument("url", help="URL to hit", nargs="?")
-    args = parser.parse_args()
+    return parser
+
+
+def parse_args(argv=None):
+    """Parses and checks the options, `argv` defaults to sys.argv[1:].
+
+    Invalid options are printed and exit.
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    argv = list(argv)
+    # salvo replay LOG URL replays an access log against URL
+    replay = argv[:1] == ["replay"]
+    parser = build_parser(replay)
+    args = parser.parse_args(argv[1:] if replay else argv)
+
+    # sent to the agents and saved with the results
+    args.argv = argv
+    if replay:
+        args.replay = args.log
+    else:
+        args.replay = args.speedup = None
+    # the lines of the log replayed by the process and when the first one
+    # is due, see salvo.replay
+    args.replay_shard = (0, 1)
+    args.replay_origin = None
 
     if args.version:
         print(__version__)
         sys.exit(0)
 
+    if args.scenario_file is not None:
+        if args.data is not None:
+            print("You can't use --data with a scenario file")
+            parser.print_usage()
+            sys.exit(1)
+        try:
+            args.endpoints = load_endpoints(args.scenario_file, args.url, args.method)
+        except (OSError, ValueError) as e:
+            print(str(e))
+            parser.print_usage()
+            sys.exit(1)
+        for endpoint in args.endpoints:
+            if endpoint.method not in _VERBS:
+                print("Unknown method %r" % endpoint.method)
+                parser.print_usage()
+                sys.exit(1)
+        if args.url is None:
+            args.url = args.endpoints[0].url
+    else:
+        args.endpoints = []
+
     if args.url is None:
         print("You need to provide an URL.")
         parser.print_usage()
         sys.exit(1)
 
+    if args.replay is not None:
+        if args.rate is not None or args.profile is not None or args.find_capacity:
+            print("You can't use --rate, --profile or --find-capacity in a replay")
+            parser.print_usage()
+            sys.exit(1)
+        if args.scenario_file is not None:
+            print("You can't use a scenario file in a replay")
+            parser.print_usage()
+            sys.exit(1)
+        if args.replay == "-" and args.processes > 1:
+            print("You can't replay the standard input with several processes")
+            parser.print_usage()
+            sys.exit(1)
+        if args.speedup is not None and args.speedup <= 0:
+            print("The speedup must be positive")
+            parser.print_usage()
+            sys.exit(1)
+
     if args.data is not None and args.method not in _DATA_VERBS:
         print("You can't provide data with %r" % args.method)
         parser.print_usage()
         sys.exit(1)
 
+    try:
+        args.payload_pool = _payload_pool(args)
+    except (AttributeError, ImportError, OSError, ValueError) as e:
+        print(str(e))
+        parser.print_usage()
+        sys.exit(1)
+
+    if args.agents is not None:
+        try:
+            args.agents = parse_agents(args.agents)
+        except ValueError as e:
+            print(str(e))
+            parser.print_usage()
+            sys.exit(1)
+        if args.replay is not None or args.find_capacity:
+            print("You can't use agents in a replay or to find the capacity")
+            parser.print_usage()
+            sys.exit(1)
+
+    if args.save is not None and args.find_capacity:
+        print("You can't save the results of a capacity search")
+        parser.print_usage()
+        sys.exit(1)
+
+    try:
+        args.abort_on = [parse_rule(rule) for rule in args.abort_on or []]
+    except ValueError as e:
+        print(str(e))
+        parser.print_usage()
+        sys.exit(1)
+    if args.abort_on and args.find_capacity:
+        print("You can't abort a capacity search, its probes have objectives")
+        parser.print_usage()
+        sys.exit(1)
+
+    if args.statsd is not None:
+        try:
+            args.statsd = parse_statsd(args.statsd)
+        except ValueError as e:
+            print(str(e))
+            parser.print_usage()
+            sys.exit(1)
+    exporting = args.statsd is not None or args.prometheus_port is not None
+    if exporting and args.find_capacity:
+        print("Live metrics are not exported by --find-capacity")
+        parser.print_usage()
+        sys.exit(1)
+
+    if args.processes < 1 or args.concurrency < 1:
+        print("You need at least one process and a concurrency of 1")
+        parser.print_usage()
+        sys.exit(1)
+
+    if args.rate is None and (args.poisson or args.max_lag is not None):
+        print("You can't use --poisson or --max-lag without --rate")
+        parser.print_usage()
+        sys.exit(1)
+
+    if args.rate is not None and args.rate <= 0:
+        print("The rate must be positive")
+        parser.print_usage()
+        sys.exit(1)
+
+    if args.profile is not None:
+        if args.duration is None:
+            print("You need --duration to use a profile")
+            parser.print_usage()
+            sys.exit(1)
+        try:
+            args.profile = parse_profile(args.profile, args.duration)
+        except ValueError as e:
+            print(str(e))
+            parser.print_usage()
+            sys.exit(1)
+
+    if args.find_capacity:
+        if args.profile is not None:
+            print("You can't use a profile when searching the capacity")
+            parser.print_usage()
+            sys.exit(1)
+        try:
+            args.slo = [parse_slo(slo) for slo in args.slo or []]
+            args.max_error_rate = parse_error_rate(args.max_error_rate)
+        except ValueError as e:
+            print(str(e))
+            parser.print_usage()
+            sys.exit(1)
+        if args.probe_duration < 1:
+            print("The probes need to last at least a second")
+            parser.print_usage()
+            sys.exit(1)
+        if args.rate is not None and args.max_rate < args.rate:
+            print("The --max-rate ceiling can't be below the rate")
+            parser.print_usage()
+            sys.exit(1)
+        if args.rate is None and args.max_concurrency < args.concurrency:
+            print("The --max-concurrency ceiling can't be below the concurrency")
+            parser.print_usage()
+            sys.exit(1)
+
+    if args.warmup is not None or args.warmup_requests is not None:
+        if args.replay is not None or args.find_capacity or args.profile is not None:
+            print("You can't warm up a replay, a profile or a capacity search")
+            parser.print_usage()
+            sys.exit(1)
+        if args.warmup is not None and (args.duration is None or args.warmup <= 0):
+            print("You need --duration and a positive number of seconds to warm up")
+            parser.print_usage()
+            sys.exit(1)
+        if args.warmup_requests is not None and (
+            args.duration is not None or args.warmup_requests < 1
+        ):
+            print("You need --requests and at least a request to warm up")
+            parser.print_usage()
+            sys.exit(1)
+
+    if args.pool_limit < 0 or args.per_host_limit < 0:
+        print("The connection limits can't be negative")
+        parser.print_usage()
+        sys.exit(1)
+
+    if args.force_close and args.keepalive_timeout is not None:
+        print("You can't use --force-close and --keepalive-timeout at the same time")
+        parser.print_usage()
+        sys.exit(1)
+
+    if args.dns_ttl is not None and args.dns_ttl < 0:
+        print("The DNS TTL can't be negative")
+        parser.print_usage()
+        sys.exit(1)
+
+    try:
+        args.resolve = [parse_resolve(spec) for spec in args.resolve or []]
+    except ValueError as e:
+        print(str(e))
+        parser.print_usage()
+        sys.exit(1)
+
+    if args.interval <= 0:
+        print("The interval must be positive")
+        parser.print_usage()
+        sys.exit(1)
+
     if args.quiet and args.verbose > 0:
         print("You can't use --quiet and --verbose at the same time")
         parser.print_usage()
         sys.exit(1)
 
+    loop = available_loop(args.loop)
+    if loop != args.loop:
+        if not args.quiet:
+            print("uvloop isn't installed, running on the asyncio loop")
+        args.loop = loop
+
     def _split(header):
         header = header.split(":")
 
@@ -196,9 +898,48 @@ def main():
         headers = dict([_split(header) for header in args.header])
 
     args.headers = headers
+    return args
+
+
+def main(argv=None):
+    """Runs the salvo command line `argv`, sys.argv[1:] by default."""
+    if argv is None:
+        argv = sys.argv[1:]
+    # salvo agent runs the loads sent by a coordinator, see salvo.agents
+    if argv[:1] == ["agent"]:
+        from salvo.agents import agent_main
+
+        return agent_main(argv[1:])
+    # salvo report and salvo compare read the files of --save
+    if argv[:1] == ["report"]:
+        from salvo.report import report_main
+
+        return report_main(argv[1:])
+    if argv[:1] == ["compare"]:
+        from salvo.report import compare_main
 
-    res, molotov_res = load(args.url, args)
-    if molotov_res["SETUP_FAILED"] > 0 or molotov_res["SESSION_SETUP_FAILED"] > 0:
+        return compare_main(argv[1:])
+
+    args = parse_args(argv)
+
+    if args.find_capacity:
+        search = find_capacity(args.url, args, stream=sys.stdout)
+        if args.json_output:
+            print(json.dumps(search.get_json()))
+        else:
+            search.print_result()
+        if search.capacity is None:
+            sys.exit(1)
+        return search, None
+
+    try:
+        res, molotov_res = load(args.url, args)
+    except AgentError as e:
+        print(str(e))
+        sys.exit(1)
+    # lost agents don't send their Molotov counters
+    setup_failed = molotov_res.get("SETUP_FAILED", 0)
+    if setup_failed > 0 or molotov_res.get("SESSION_SETUP_FAILED", 0) > 0:
         sys.exit(1)
 
     if not args.json_output:
@@ -206,14 +947,24 @@ def main():
             print("")
             print("-------- Errors --------")
             print("")
-            for code, desc in res.errors_desc.items():
-                print("%s (%d occurences)" % (desc, res.errors[code]))
+            for line in res.describe_errors():
+                print(line)
         res.print_stats()
         print("Want to build a more powerful load test ? Try Molotov !")
         print("Bye!")
     else:
         res.print_json()
 
+    if args.timeseries_csv is not None:
+        with open(args.timeseries_csv, "w", newline="") as f:
+            res.timeseries.write_csv(f)
+
+    if args.save is not None:
+        save_results(args.save, res, args.argv)
+
+    if res.aborted is not None:
+        sys.exit(EXIT_ABORTED)
+
     return res, molotov_res
 
 
@@ -1,10 +1,17 @@
 import asyncio
-import time
 import base64
 from collections import namedtuple
-from aiohttp import ClientResponseError
 
-from salvo.util import resolve
+from salvo.util import resolve, use_loop
+from salvo.rate import ArrivalSchedule
+from salvo.request import compile_request
+from salvo.trace import TraceWriter
+from salvo.phases import phase_trace_config
+from salvo.connector import SharedConnector, connector_options
+from salvo.endpoints import EndpointPicker
+from salvo.replay import LogReplay
+from salvo.monitor import LoopMonitor
+from salvo.abort import AbortWatcher
 
 import molotov
 from molotov.run import run
@@ -24,45 +31,39 @@ async def init_worker(worker_num, args):
         basic = base64.b64encode(auth.encode())
         headers["Authorization"] = "Basic %s" % basic.decode()
 
-    return {"headers": headers}
+    # tracing adds its signals to every request, only for --phases
+    if molotov.get_var("results").phases:
+        trace_configs = [phase_trace_config()]
+    else:
+        trace_configs = None
+
+    molotov.get_var("monitor").acquire()
+    return {
+        "headers": headers,
+        "connector": molotov.get_var("connector").acquire(),
+        "connector_owner": False,
+        "trace_configs": trace_configs,
+    }
+
+
+@molotov.teardown_session()
+async def close_worker(worker_num, session):
+    await molotov.get_var("connector").release()
+    await molotov.get_var("monitor").release()
 
 
 @molotov.scenario()
 async def http_test(session):
-    url = molotov.get_var("url")
-    res = molotov.get_var("results")
-    meth = molotov.get_var("method")
-
-    options = {}
-    pre_hook = molotov.get_var("pre_hook")
-    if pre_hook is not None:
-        meth, url, options = pre_hook(meth, url, options)
-
-    post_hook = molotov.get_var("post_hook")
-    data = molotov.get_var("data")
-    if data:
-        if callable(data):
-            options["data"] = data(meth, url, options)
-        else:
-            options["data"] = data
-
-    meth = getattr(session, meth.lower())
-    start = time.time()
+    # compiled by run_test, see salvo.request
     try:
-        # XXX we should implement raise_for_status globally in
-        # the session in Molotov
-        async with meth(url, raise_for_status=True, **options) as resp:
-            if post_hook is not None:
-                resp = await post_hook(resp)
-            res.incr(resp.status, time.time() - start)
-    except ClientResponseError as exc:
-        res.incr(exc.status, time.time() - start)
-        res.errors[exc.status] += 1
-        if exc.message not in res.errors_desc:
-            res.errors_desc[exc.message] = exc
-
-
-def run_test(url, results, salvoargs):
+        await molotov.get_var("request")(session)
+    except Exception:
+        # refused connections, timeouts... Molotov counts them as failed
+        molotov.get_var("results").record_failure()
+        raise
+
+
+def run_test(url, results, salvoargs, trace_origin=None):
     args = namedtuple("args", "")
     args.force_shutdown = False
     args.ramp_up = 0.0
@@ -76,11 +77,16 @@ def run_test(url, results, salvoargs):
     args.statsd = False
     args.single_mode = None
     if salvoargs.duration:
-        args.duration = salvoargs.duration
+        # the warm-up comes on top of the measured run
+        args.duration = salvoargs.duration + (salvoargs.warmup or 0)
+        args.max_runs = None
+    elif salvoargs.replay is not None:
+        # the end of the log stops the run
+        args.duration = float("inf")
         args.max_runs = None
     else:
         args.duration = 9999
-        args.max_runs = salvoargs.requests
+        args.max_runs = salvoargs.requests + (salvoargs.warmup_requests or 0)
     args.delay = 0.0
     args.sizing = False
     args.sizing_tolerance = 0.0
@@ -89,32 +95,58 @@ def run_test(url, results, salvoargs):
     args.fail = None
     args.force_reconnection = False
     args.scenario = __file__
-    args.disable_dns_resolve = False
+    # molotov caches its lookups for the whole run, the DNS options
+    # leave the resolution to aiohttp instead
+    args.disable_dns_resolve = bool(salvoargs.resolve) or salvoargs.dns_ttl is not None
     args.single_run = False
 
-    molotov.set_var("method", salvoargs.method)
-    molotov.set_var("url", url)
     molotov.set_var("results", results)
+    molotov.set_var("monitor", LoopMonitor(results))
     molotov.set_var("auth", salvoargs.auth)
     molotov.set_var("content_type", salvoargs.content_type)
+    molotov.set_var(
+        "connector",
+        SharedConnector(
+            connector_options(salvoargs),
+            dict(salvoargs.resolve or ()),
+            connections=results.connections,
+        ),
+    )
+
+    if salvoargs.rate is not None:
+        schedule = ArrivalSchedule(
+            salvoargs.rate,
+            results,
+            poisson=salvoargs.poisson,
+            max_lag=salvoargs.max_lag,
+            profile=salvoargs.profile,
+        )
+    else:
+        schedule = None
 
     data = salvoargs.data
-    if data and data.startswith("py:"):
+    if salvoargs.payload_pool is not None:
+        # the pool replaces the data
+        data = None
+    elif data and data.startswith("py:"):
         data = resolve(data.split(":")[1])
-    molotov.set_var("data", data)
 
     if salvoargs.pre_hook is not None:
-        molotov.set_var("pre_hook", resolve(salvoargs.pre_hook))
+        pre_hook = resolve(salvoargs.pre_hook)
     else:
-        molotov.set_var("pre_hook", None)
+        pre_hook = None
 
     if salvoargs.post_hook is not None:
         post_hook = resolve(salvoargs.post_hook)
         if not asyncio.iscoroutinefunction(post_hook):
             raise Exception("The post hook needs to be a coroutine")
-        molotov.set_var("post_hook", post_hook)
     else:
-        molotov.set_var("post_hook", None)
+        post_hook = None
+
+    if salvoargs.endpoints:
+        endpoints = EndpointPicker(salvoargs.endpoints)
+    else:
+        endpoints = None
 
     class Stream:
         def __init__(self):
@@ -135,8 +167,58 @@ def run_test(url, results, salvoargs):
     api._SCENARIO.clear()
     api._FIXTURES.clear()
 
+    if salvoargs.trace_file is not None:
+        trace = TraceWriter(salvoargs.trace_file, origin=trace_origin)
+    else:
+        trace = None
+
+    if salvoargs.replay is not None:
+        shard, shards = salvoargs.replay_shard
+        replay = LogReplay(
+            salvoargs.replay,
+            results,
+            salvoargs.speedup,
+            shard=shard,
+            shards=shards,
+            origin=salvoargs.replay_origin,
+        )
+    else:
+        replay = None
+
+    request = compile_request(
+        url,
+        salvoargs.method,
+        results,
+        data=data,
+        schedule=schedule,
+        profile=salvoargs.profile,
+        replay=replay,
+        endpoints=endpoints,
+        pre_hook=pre_hook,
+        post_hook=post_hook,
+        payloads=salvoargs.payload_pool,
+        read_body=salvoargs.read_body,
+        trace=trace,
+    )
+    molotov.set_var("request", request)
+
+    if salvoargs.abort_on:
+        watcher = AbortWatcher(results, salvoargs.abort_on)
+        watcher.start()
+    else:
+        watcher = None
+
+    use_loop(salvoargs.loop)
     stream = Stream()
-    res = run(args, stream=stream)
+    try:
+        res = run(args, stream=stream)
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        if trace is not None:
+            trace.close()
+        if replay is not None:
+            replay.close()
 
     if res["SETUP_FAILED"] > 0 or res["SESSION_SETUP_FAILED"] > 0:
         print("Setup failed. read the Molotov session below to get the error")
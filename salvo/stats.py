@@ -0,0 +1,114 @@
+"""
+Significance tests comparing two runs, see salvo.report.
+
+Latencies are compared with a Mann-Whitney U test, which works on the
+buckets of their histograms and makes no assumption about the shape of
+their distributions. Throughputs are compared with a Welch's t-test over
+the requests per second of each interval of the time series.
+"""
+
+import math
+
+
+def normal_sf(z):
+    """Returns P(Z > z) for a standard normal Z."""
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def _beta_fraction(a, b, x):
+    # continued fraction of the incomplete beta function, Lentz's method
+    tiny = 1e-300
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    res = d
+    for m in range(1, 201):
+        m2 = 2 * m
+        for aa in (
+            m * (b - m) * x / ((a - 1.0 + m2) * (a + m2)),
+            -(a + m) * (a + b + m) * x / ((a + m2) * (a + 1.0 + m2)),
+        ):
+            d = 1.0 + aa * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + aa / c
+            c = c if abs(c) > tiny else tiny
+            res *= d * c
+        if abs(d * c - 1.0) < 3e-14:
+            break
+    return res
+
+
+def incomplete_beta(a, b, x):
+    """Returns the regularized incomplete beta function I_x(a, b)."""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    lbeta = math.lgamma(a) + math.lgamma(b) - math.lgamma(a + b)
+    front = math.exp(a * math.log(x) + b * math.log(1.0 - x) - lbeta)
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _beta_fraction(a, b, x) / a
+    return 1.0 - front * _beta_fraction(b, a, 1.0 - x) / b
+
+
+def student_sf(t, df):
+    """Returns P(T > t) for a Student's T with `df` degrees of freedom."""
+    if math.isinf(t):
+        return 0.0 if t > 0 else 1.0
+    tail = 0.5 * incomplete_beta(df / 2.0, 0.5, df / (df + t * t))
+    return tail if t > 0 else 1.0 - tail
+
+
+def mann_whitney(base, new):
+    """Mann-Whitney U test of two salvo.histogram.Histogram.
+
+    Returns the z score of the normal approximation, with the correction
+    for ties, positive when the values of `new` tend to be larger. Values
+    in the same bucket are ties, histograms of different precisions are
+    compared on the values of their buckets.
+    """
+    n1, n2 = base.count, new.count
+    n = n1 + n2
+    if n1 == 0 or n2 == 0:
+        return 0.0
+    counts = {}
+    for value, count in base.buckets():
+        counts.setdefault(value, [0, 0])[0] += count
+    for value, count in new.buckets():
+        counts.setdefault(value, [0, 0])[1] += count
+
+    # pairs where the new value is larger, ties counting for half
+    u = 0.0
+    below = 0
+    ties = 0.0
+    for value in sorted(counts):
+        a, b = counts[value]
+        u += b * (below + a / 2.0)
+        below += a
+        t = a + b
+        ties += t * t * t - t
+    variance = n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 0.0
+    return (u - n1 * n2 / 2.0) / math.sqrt(variance)
+
+
+def welch(base, new):
+    """Welch's t-test of two lists of samples.
+
+    Returns the t statistic, positive when the mean of `new` is larger,
+    and its degrees of freedom. Needs at least two samples on each side.
+    """
+    n1, n2 = len(base), len(new)
+    if n1 < 2 or n2 < 2:
+        raise ValueError("Welch's t-test needs two samples on each side")
+    m1, m2 = sum(base) / n1, sum(new) / n2
+    v1 = sum((x - m1) ** 2 for x in base) / (n1 - 1) / n1
+    v2 = sum((x - m2) ** 2 for x in new) / (n2 - 1) / n2
+    if v1 + v2 == 0:
+        if m1 == m2:
+            return 0.0, n1 + n2 - 2
+        return math.copysign(float("inf"), m2 - m1), n1 + n2 - 2
+    t = (m2 - m1) / math.sqrt(v1 + v2)
+    df = (v1 + v2) ** 2 / (v1 * v1 / (n1 - 1) + v2 * v2 / (n2 - 1))
+    return t, df
@@ -1,6 +1,7 @@
 import asyncio
 import pathlib
 import os
+import socket
 import socketserver
 import multiprocessing
 import signal
@@ -128,3 +129,46 @@ def dedicatedloop(func):
             asyncio.set_event_loop(old_loop)
 
     return _loop
+
+
+def free_port():
+    """Returns a port of localhost nobody listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def agents(count=2, options=()):
+    """Runs `count` salvo agents on localhost, yields their --agents.
+
+    `options` are added to the salvo agent options of each one.
+    """
+    from salvo.agents import agent_main
+
+    ports = [free_port() for _ in range(count)]
+    jobs = []
+    try:
+        for port in ports:
+            job = multiprocessing.Process(
+                target=agent_main, args=(["--port", str(port), *options],)
+            )
+            job.start()
+            jobs.append(job)
+        for port in ports:
+            start = time.time()
+            while True:
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                    break
+                except OSError:
+                    if time.time() - start > 5:
+                        raise OSError("Could not connect to the agent")
+                    time.sleep(0.1)
+        yield ",".join("127.0.0.1:%d" % port for port in ports)
+    finally:
+        for job in jobs:
+            job.terminate()
+            job.join(timeout=1.0)
+            if job.is_alive():
+                job.kill()
@@ -0,0 +1,89 @@
+import pytest
+
+from salvo.abort import AbortWatcher, parse_rule
+from salvo.output import RunResults
+
+
+def test_parse_rule():
+    assert parse_rule("p99>500ms over 10s") == (
+        "p99>500ms over 10s",
+        "p99",
+        99,
+        0.5,
+        10,
+    )
+    assert parse_rule(" p99.9 > 1.5s over 2.5s ") == (
+        "p99.9 > 1.5s over 2.5s",
+        "p99.9",
+        99.9,
+        1.5,
+        2.5,
+    )
+    assert parse_rule("max>500us") == ("max>500us", "max", 100, 0.0005, 10)
+    assert parse_rule("avg>1s").percentile is None
+    assert parse_rule("errors>5%") == ("errors>5%", "errors", None, 0.05, 10)
+    assert parse_rule("errors>0.1 over 30s").threshold == 0.1
+    for spec in (
+        "p99<500ms",
+        "p99>500",
+        "p101>1s",
+        "errors>200%",
+        "errors>5ms",
+        "p99>1s over 0s",
+        "p99>1s over 10",
+        "rps>10",
+    ):
+        with pytest.raises(ValueError):
+            parse_rule(spec)
+
+
+def _results(durations, start=100.0):
+    # one request per duration, a tenth of a second apart
+    res = RunResults(num=None, quiet=True)
+    for index, duration in enumerate(durations):
+        status = 500 if duration is None else 200
+        res.incr(status, duration or 0.001, start=start + index / 10.0)
+    return res
+
+
+def test_latency():
+    res = _results([0.01] * 20 + [0.6] * 20)
+    watcher = AbortWatcher(res, [parse_rule("p99>500ms over 2s")])
+    # the window isn't over yet
+    assert watcher.check(now=101.5) is None
+    # the first 2 seconds are fine
+    assert watcher.check(now=102.0) is None
+    assert watcher.check(now=103.1) == (
+        "p99>500ms over 2s: p99 of 0.6000 s over the last 2 s"
+    )
+    assert res.aborted == watcher.check(now=200)
+
+    res = _results([0.01] * 20 + [0.6] * 20)
+    watcher = AbortWatcher(res, [parse_rule("avg>500ms over 2s")])
+    assert watcher.check(now=103.1) is None
+    assert watcher.check(now=104.1) is not None
+
+
+def test_errors():
+    res = _results([0.01] * 20 + [None] * 5)
+    watcher = AbortWatcher(res, [parse_rule("errors>10% over 1s")])
+    assert watcher.check(now=102.0) is None
+    # 5 errors out of 5 requests: too few to tell
+    assert watcher.check(now=103.0) is None
+
+    res = _results([0.01] * 20 + [None] * 10)
+    for _ in range(10):
+        res.timeseries.record_failure(102.5)
+    watcher = AbortWatcher(res, [parse_rule("errors>10% over 1s")])
+    assert watcher.check(now=103.0).endswith("100.00% of errors over the last 1 s")
+
+
+def test_rules_order():
+    res = _results([0.6] * 20)
+    rules = [
+        parse_rule("errors>1% over 1s"),
+        parse_rule("max>1s"),
+        parse_rule("max>0.5s over 1s"),
+    ]
+    watcher = AbortWatcher(res, rules)
+    assert watcher.check(now=102.0).startswith("max>0.5s over 1s:")
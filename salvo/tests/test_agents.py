@@ -0,0 +1,94 @@
+import pytest
+
+import threading
+from unittest.mock import patch
+
+from salvo import agents
+from salvo.agents import parse_agents, refused_options, run_load
+from salvo.output import RunResults
+
+
+def test_parse_agents():
+    assert parse_agents("one:8877, two:9000") == [("one", 8877), ("two", 9000)]
+    assert parse_agents("::1:8877") == [("::1", 8877)]
+    for spec in ("one", "one:", ":8877", "one:port"):
+        with pytest.raises(ValueError):
+            parse_agents(spec)
+
+
+def test_run_load_invalid_options():
+    sent = []
+    request = {"argv": ["-c", "0", "http://localhost"], "index": 0}
+    assert run_load(request, sent.append, None) is None
+    assert sent[0]["type"] == "error"
+    assert "concurrency" in sent[0]["error"]
+
+
+def test_run_load_not_started():
+    sent = []
+    request = {
+        "argv": ["http://localhost"],
+        "index": 0,
+        "concurrency": 1,
+        "rate": None,
+    }
+    # the coordinator went away before the start
+    assert run_load(request, sent.append, lambda: None) is None
+    assert [message["type"] for message in sent] == ["ready"]
+
+
+def test_refused_options():
+    url = "http://localhost"
+    assert refused_options([url, "-c", "2", "-D", "data", "-m", "POST"]) == []
+    hooks = [url, "--pre-hook", "os.system", "--post-hook", "os.abort"]
+    assert refused_options(hooks) == ["--pre-hook", "--post-hook"]
+    assert refused_options(hooks, allow_hooks=True) == []
+    assert refused_options([url, "-m", "POST", "-D", "py:os.getcwd"]) == ["--data py:"]
+    files = [url, "--payloads", "/etc", "--trace-file", "/tmp/trace.csv"]
+    assert refused_options(files) == ["--payloads", "--trace-file"]
+    assert refused_options(files, allow_files=True) == []
+    assert refused_options([url, "--scenario-file", "/etc/passwd"]) == [
+        "--scenario-file"
+    ]
+    # even when allowed
+    replay = ["replay", "/etc/passwd", url]
+    assert refused_options(replay, allow_hooks=True, allow_files=True) == ["replay"]
+
+
+def test_run_load_refused():
+    sent = []
+    # the payloads are never read
+    argv = ["http://localhost", "-m", "POST", "--payloads", "/nothing/here"]
+    request = {"argv": argv, "index": 0}
+    assert run_load(request, sent.append, None) is None
+    assert "refuses --payloads" in sent[0]["error"]
+
+    sent = []
+    request["argv"] = ["http://localhost", "--unknown"]
+    assert run_load(request, sent.append, None) is None
+    assert "unrecognized arguments" in sent[0]["error"]
+
+
+def test_stream_progress():
+    res = RunResults(num=None, quiet=True)
+    res.done = 3
+    sent = []
+    stopped = threading.Event()
+
+    def send(message):
+        sent.append(message)
+        if len(sent) == 3:
+            stopped.set()
+
+    with patch.object(agents, "AGENT_PROGRESS_INTERVAL", 0.01), patch.object(
+        agents, "CHECKPOINT_INTERVAL", 0.025
+    ):
+        agents._stream_progress(res, send, stopped)
+    # light progress messages, the results now and then
+    assert sent[0] == {"type": "progress", "done": 3, "aborted": None}
+    assert [message["type"] for message in sent] == [
+        "progress",
+        "progress",
+        "checkpoint",
+    ]
+    assert RunResults.from_snapshot(sent[2]["results"]).done == 3
@@ -0,0 +1,83 @@
+import importlib.util
+import socket
+import sys
+
+import pytest
+
+from salvo.tests.support import HERE, free_port
+
+
+BENCHMARKS = HERE.parent.parent / "benchmarks"
+
+
+def _load(name):
+    spec = importlib.util.spec_from_file_location(
+        name, str(BENCHMARKS / (name + ".py"))
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def server():
+    return _load("server")
+
+
+@pytest.fixture
+def selfbench(server, monkeypatch):
+    # selfbench imports the server next to it
+    monkeypatch.setitem(sys.modules, "server", server)
+    return _load("selfbench")
+
+
+def _exchange(port, data):
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        sock.sendall(data)
+        received = b""
+        while not received.endswith(b"xx"):
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            received += chunk
+        return received
+
+
+def test_server_head(server, selfbench):
+    port = free_port()
+    jobs = server.start(port=port)
+    try:
+        selfbench._wait_for("http://127.0.0.1:%d/" % port)
+        # no body for HEAD, the next response on the connection is intact
+        received = _exchange(
+            port,
+            b"HEAD /size/10 HTTP/1.1\r\nHost: test\r\n\r\n"
+            b"GET / HTTP/1.1\r\nHost: test\r\n\r\n",
+        )
+    finally:
+        server.stop(jobs)
+    head, get = received.split(b"HTTP/1.1 200 OK")[1:]
+    assert b"Content-Length: 10\r\n" in head
+    assert head.endswith(b"\r\n\r\n")
+    assert get.endswith(b"\r\n\r\nxx")
+
+
+def test_selfbench_run(server, selfbench):
+    port = free_port()
+    url = "http://127.0.0.1:%d/size/1024" % port
+    jobs = server.start(port=port)
+    try:
+        selfbench._wait_for(url)
+        results, usage = selfbench.run_salvo(url, 2, 1, requests=10)
+    finally:
+        server.stop(jobs)
+    assert results["count"] == 20
+    assert list(results["status_codes"]) == ["200"]
+    assert usage.ru_utime > 0
+
+
+def test_max_rss(selfbench, monkeypatch):
+    usage = type("usage", (), {"ru_maxrss": 1000})
+    assert selfbench._max_rss(usage) == 1024000
+    monkeypatch.setattr(sys, "platform", "darwin")
+    assert selfbench._max_rss(usage) == 1000
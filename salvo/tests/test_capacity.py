@@ -0,0 +1,107 @@
+import io
+from argparse import Namespace
+
+import pytest
+
+from salvo.capacity import CapacitySearch, parse_error_rate, parse_slo
+from salvo.output import RunResults
+
+
+def test_parse_slo():
+    assert parse_slo("p99<200ms") == ("p99", 99, 0.2)
+    assert parse_slo(" p99.9 < 1.5s ") == ("p99.9", 99.9, 1.5)
+    assert parse_slo("max<500us") == ("max", 100, 0.0005)
+    for spec in ("p99>200ms", "p99<200", "p101<1s", "avg<1s"):
+        with pytest.raises(ValueError):
+            parse_slo(spec)
+
+
+def test_parse_error_rate():
+    assert parse_error_rate("0.1%") == 0.001
+    assert parse_error_rate("0.05") == 0.05
+    for spec in ("lots", "200%", "-1"):
+        with pytest.raises(ValueError):
+            parse_error_rate(spec)
+
+
+class FakeSearch(CapacitySearch):
+    """Server answering in 1ms per concurrent user, failing above 40 users."""
+
+    def _run(self, load):
+        res = RunResults(num=None, quiet=True)
+        for i in range(100):
+            res.incr(duration=load / 1000.0, start=i / 100.0)
+        failed = 10 if load > 40 else 0
+        return res, {"FAILED": failed}
+
+
+def _search(rate=None, slos=("p99<30ms",), concurrency=1, max_concurrency=1024):
+    args = Namespace(
+        rate=rate,
+        concurrency=concurrency,
+        max_concurrency=max_concurrency,
+        max_rate=1000.0,
+        quiet=False,
+        probe_duration=1,
+        precision=3,
+        loop="asyncio",
+    )
+    stream = io.StringIO()
+    search = FakeSearch(
+        "http://localhost", args, [parse_slo(slo) for slo in slos], 0.01, stream
+    )
+    search.run()
+    return search, stream.getvalue()
+
+
+def test_search_concurrency():
+    search, output = _search()
+    loads = [probe.load for probe in search.probes]
+    assert loads == [1, 2, 4, 8, 16, 32, 24, 28, 30, 29]
+    assert search.capacity.load == 29
+    assert "FAIL" in output
+
+    search.print_result()
+    assert "Concurrency         \t\t29" in search.stream.getvalue()
+    assert search.get_json()["capacity"] == 29
+    assert search.get_json()["loop"] == "asyncio"
+    assert not search.get_json()["at_ceiling"]
+
+
+def test_search_ceiling():
+    search, _ = _search(max_concurrency=12)
+    assert [probe.load for probe in search.probes] == [1, 2, 4, 8, 12]
+    assert search.capacity.load == 12
+    assert search.at_ceiling
+    search.print_result()
+    assert "12 (the --max-concurrency ceiling" in search.stream.getvalue()
+
+
+def test_search_downwards():
+    # the first load already breaks the SLO
+    search, _ = _search(concurrency=100)
+    loads = [probe.load for probe in search.probes]
+    assert loads == [100, 50, 25, 37, 31, 28, 29, 30]
+    assert search.capacity.load == 29
+
+
+def test_search_errors():
+    search, _ = _search(slos=())
+    assert search.capacity.load == 40
+    assert search.probes[-1].error_rate == pytest.approx(10 / 110.0)
+
+
+def test_search_rate():
+    search, _ = _search(rate=10.0)
+    assert search.by_rate
+    assert 28 <= search.capacity.load < 30
+    search, _ = _search(rate=200.0)
+    assert 28 <= search.capacity.load < 30
+
+
+def test_nothing_passes():
+    search, _ = _search(slos=("p99<1us",))
+    assert len(search.probes) == 1
+    assert search.capacity is None
+    search.print_result()
+    assert "No load level met the objectives" in search.stream.getvalue()
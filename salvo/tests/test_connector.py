@@ -0,0 +1,110 @@
+import asyncio
+import socket
+from argparse import Namespace
+
+import pytest
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+
+from salvo.connector import (
+    CountingConnector,
+    SharedConnector,
+    StaticResolver,
+    connector_options,
+    parse_resolve,
+)
+from salvo.tests.support import dedicatedloop
+
+
+def _args(**options):
+    args = dict(
+        pool_limit=0,
+        per_host_limit=0,
+        force_close=False,
+        keepalive_timeout=None,
+        dns_ttl=None,
+    )
+    args.update(options)
+    return Namespace(**args)
+
+
+def test_parse_resolve():
+    assert parse_resolve("example.com:443:10.0.0.1") == (
+        ("example.com", 443),
+        "10.0.0.1",
+    )
+    assert parse_resolve("example.com:80:[::1]") == (("example.com", 80), "::1")
+    for spec in ("example.com", "example.com:http:10.0.0.1", ":80:10.0.0.1"):
+        with pytest.raises(ValueError):
+            parse_resolve(spec)
+
+
+def test_connector_options():
+    assert connector_options(_args()) == {
+        "limit": 0,
+        "limit_per_host": 0,
+        "force_close": False,
+    }
+    options = connector_options(_args(pool_limit=10, keepalive_timeout=2, dns_ttl=5))
+    assert options["limit"] == 10
+    assert options["keepalive_timeout"] == 2
+    assert options["ttl_dns_cache"] == 5
+    assert connector_options(_args(dns_ttl=0))["use_dns_cache"] is False
+
+
+@dedicatedloop
+def test_static_resolver():
+    async def _resolve():
+        resolver = StaticResolver({("example.com", 80): "10.0.0.1"})
+        static = await resolver.resolve("example.com", 80)
+        default = await resolver.resolve("localhost", 80)
+        await resolver.close()
+        return static, default
+
+    static, default = asyncio.get_event_loop().run_until_complete(_resolve())
+    assert static[0]["host"] == "10.0.0.1"
+    assert static[0]["family"] == socket.AF_INET
+    assert default[0]["hostname"] == "localhost"
+
+
+@dedicatedloop
+def test_shared_connector():
+    shared = SharedConnector({"limit": 2})
+
+    async def _sessions():
+        one, two = shared.acquire(), shared.acquire()
+        assert one is two
+        assert one.limit == 2
+        await shared.release()
+        assert not one.closed
+        await shared.release()
+        assert one.closed
+        return shared.acquire()
+
+    connector = asyncio.get_event_loop().run_until_complete(_sessions())
+    assert not connector.closed
+
+
+@pytest.mark.parametrize("force_close,counts", [(False, (1, 2)), (True, (3, 0))])
+@dedicatedloop
+def test_counting_connector(force_close, counts):
+    async def _hello(request):
+        return web.Response(text="hello")
+
+    app = web.Application()
+    app.router.add_get("/", _hello)
+    connections = {"new": 0, "reused": 0}
+    shared = SharedConnector({"force_close": force_close}, connections=connections)
+
+    async def _requests():
+        async with TestServer(app) as server:
+            connector = shared.acquire()
+            assert isinstance(connector, CountingConnector)
+            async with ClientSession(connector=connector, connector_owner=False) as s:
+                for _ in range(3):
+                    async with s.get(server.make_url("/")) as resp:
+                        await resp.read()
+            await shared.release()
+
+    asyncio.get_event_loop().run_until_complete(_requests())
+    assert (connections["new"], connections["reused"]) == counts
@@ -0,0 +1,103 @@
+import json
+from collections import Counter
+
+import pytest
+
+from salvo.endpoints import Endpoint, EndpointPicker, load_endpoints
+
+
+def _write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    return str(path)
+
+
+def test_load_json(tmp_path):
+    spec = {
+        "endpoints": [
+            {"name": "list", "path": "/items", "weight": 70},
+            {"path": "/items/1", "headers": {"X-Test": "1"}},
+            {"name": "order", "path": "/orders", "method": "post", "json": [1]},
+            {"url": "http://other:8080/", "data": "DATA"},
+        ]
+    }
+    path = _write(tmp_path, "scenario.json", json.dumps(spec))
+    endpoints = load_endpoints(path, "http://localhost:8888/api/")
+    assert endpoints[0] == Endpoint(
+        "list", "GET", "http://localhost:8888/items", 70, {}, None
+    )
+    assert endpoints[1].name == "GET /items/1"
+    assert endpoints[1].weight == 1
+    assert endpoints[1].headers == {"X-Test": "1"}
+    assert endpoints[2].method == "POST"
+    assert endpoints[2].data == "[1]"
+    assert endpoints[2].headers == {"Content-Type": "application/json"}
+    assert endpoints[3].url == "http://other:8080/"
+    assert endpoints[3].data == "DATA"
+
+
+def test_base_url(tmp_path):
+    spec = {"base_url": "http://example.com", "endpoints": [{"path": "/"}]}
+    path = _write(tmp_path, "scenario.json", json.dumps(spec))
+    assert load_endpoints(path)[0].url == "http://example.com/"
+    # the URL of the command line wins
+    assert load_endpoints(path, "http://localhost:8888")[0].url == (
+        "http://localhost:8888/"
+    )
+
+
+def test_load_yaml(tmp_path):
+    pytest.importorskip("yaml")
+    content = "endpoints:\n  - path: /\n    weight: 2\n"
+    path = _write(tmp_path, "scenario.yml", content)
+    assert load_endpoints(path, "http://localhost:8888")[0].weight == 2
+
+
+def test_load_toml(tmp_path):
+    try:
+        import tomllib  # noqa: F401
+    except ImportError:
+        pytest.importorskip("toml")
+    content = '[[endpoints]]\npath = "/"\nweight = 2\n'
+    path = _write(tmp_path, "scenario.toml", content)
+    assert load_endpoints(path, "http://localhost:8888")[0].weight == 2
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        [],
+        {"endpoints": []},
+        {"endpoints": [{"name": "x"}]},
+        {"endpoints": [{"path": "/", "weight": 0}]},
+        {"endpoints": [{"path": "/", "data": "x", "json": "x"}]},
+        {"endpoints": [{"path": "/", "body": "x"}]},
+        {"endpoints": [{"path": "/"}, {"path": "/"}]},
+    ],
+)
+def test_invalid(tmp_path, spec):
+    path = _write(tmp_path, "scenario.json", json.dumps(spec))
+    with pytest.raises(ValueError):
+        load_endpoints(path, "http://localhost:8888")
+
+
+def test_invalid_format(tmp_path):
+    with pytest.raises(ValueError):
+        load_endpoints(_write(tmp_path, "scenario.txt", ""))
+    with pytest.raises(ValueError):
+        load_endpoints(_write(tmp_path, "scenario.json", "{"))
+    path = _write(tmp_path, "scenario.json", '{"endpoints": [{"path": "/"}]}')
+    with pytest.raises(ValueError):
+        load_endpoints(path)
+
+
+def test_picker():
+    endpoints = [
+        Endpoint(name, "GET", "/", weight, {}, None)
+        for name, weight in (("a", 70), ("b", 20), ("c", 10))
+    ]
+    picker = EndpointPicker(endpoints, seed=1)
+    counts = Counter(picker.pick().name for _ in range(10000))
+    assert 6800 < counts["a"] < 7200
+    assert 1800 < counts["b"] < 2200
+    assert 800 < counts["c"] < 1200
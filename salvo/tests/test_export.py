@@ -0,0 +1,140 @@
+import socket
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from salvo.export import (
+    LiveSeries,
+    MetricsExporter,
+    completed_intervals,
+    parse_statsd,
+    statsd_lines,
+)
+from salvo.output import RunResults
+
+
+def _results(start):
+    res = RunResults(num=None, quiet=True)
+    # two intervals of one second, a 500 in the second one
+    res.incr(200, 0.01, start=start)
+    res.incr(200, 0.02, start=start + 0.5)
+    res.incr(500, 0.04, start=start + 1.2)
+    res.errors[500] += 1
+    return res
+
+
+def _receive(sock, count):
+    return [sock.recv(65536).decode() for _ in range(count)]
+
+
+def test_parse_statsd():
+    assert parse_statsd("localhost:8125") == ("localhost", 8125)
+    assert parse_statsd("[::1]:8125") == ("::1", 8125)
+    for spec in ("localhost", ":8125", "localhost:port"):
+        with pytest.raises(ValueError):
+            parse_statsd(spec)
+
+
+def test_statsd_lines():
+    res = _results(100.0)
+    lines = statsd_lines(res.timeseries.row(0))
+    assert lines[:3] == ["salvo.requests:2|c", "salvo.errors:0|c", "salvo.rps:2|g"]
+    assert "salvo.latency.max:20.000|g" in lines
+    # an empty interval has no latency
+    assert statsd_lines(res.timeseries.row(5), "load") == [
+        "load.requests:0|c",
+        "load.errors:0|c",
+        "load.rps:0|g",
+    ]
+
+
+def test_statsd():
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    server.settimeout(5)
+    try:
+        start = time.perf_counter()
+        res = _results(start)
+        exporter = MetricsExporter(res, statsd=server.getsockname())
+        # the first interval is over, the second one isn't
+        rows = exporter.publish(now=start + 1.5)
+        assert [row["count"] for row in rows] == [2]
+        assert exporter.publish(now=start + 1.6) == []
+        first = _receive(server, 1)[0]
+        assert first.startswith("salvo.requests:2|c\nsalvo.errors:0|c")
+
+        exporter.stop()
+        second = _receive(server, 1)[0]
+        assert "salvo.errors:1|c" in second
+        assert "salvo.latency.p50:40.000|g" in second
+    finally:
+        server.close()
+
+
+def test_completed_intervals():
+    series = _results(100.0).timeseries
+    data, start = completed_intervals(series, 0, 101.03)
+    # the first interval is left to settle
+    assert (data["end"], start, data["intervals"]) == (0, 0, None)
+    data, start = completed_intervals(series, 0, 101.5, clock_offset=10.0)
+    assert (data["origin"], data["end"], data["until"], start) == (110, 1, 111.45, 1)
+    assert data["intervals"]["start"] == 0
+    assert len(data["intervals"]["buckets"]) == 1
+    data, start = completed_intervals(series, start, None, final=True)
+    assert (data["end"], data["until"], start) == (2, None, 2)
+    assert data["intervals"]["start"] == 1
+
+
+def test_live_series():
+    one, two = _results(100.2).timeseries, _results(100.3).timeseries
+    live = LiveSeries()
+    live.start(2, 100.0)
+    exporter = MetricsExporter(live, clock=live.clock)
+
+    data, start_one = completed_intervals(one, 0, 101.6)
+    live.add(0, data)
+    # the other source did not send its first interval yet
+    assert live.clock() == 100
+    assert exporter.publish() == []
+    data, start_two = completed_intervals(two, 0, 101.6)
+    live.add(1, data)
+    assert live.clock() == 101
+    assert [row["count"] for row in exporter.publish()] == [4]
+
+    live.add(0, completed_intervals(one, start_one, None, final=True)[0])
+    live.finish(1)
+    assert live.clock() == 101
+    # the last interval of the lost source is missing
+    assert [row["count"] for row in exporter.publish(final=True)] == [1]
+    assert exporter.requests == 5
+
+
+def test_prometheus():
+    start = time.perf_counter()
+    res = _results(start)
+    exporter = MetricsExporter(res, prometheus_port=0, host="127.0.0.1")
+    exporter.start()
+    url = "http://%s:%d/metrics" % exporter.prometheus_address
+    try:
+        exporter.publish(now=start)
+        with urllib.request.urlopen(url) as response:
+            text = response.read().decode()
+        assert "salvo_requests_total 0\n" in text
+        assert 'salvo_request_duration_seconds{quantile="0.99"} NaN\n' in text
+
+        exporter.publish(now=start + 2)
+        with urllib.request.urlopen(url) as response:
+            text = response.read().decode()
+        assert "# TYPE salvo_request_duration_seconds summary\n" in text
+        assert "salvo_requests_total 3\n" in text
+        assert "salvo_errors_total 1\n" in text
+        assert "salvo_requests_per_second 1.0\n" in text
+        assert 'salvo_request_duration_seconds{quantile="1"} 0.04\n' in text
+        assert "salvo_request_duration_seconds_count 3\n" in text
+
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(url[: -len("metrics")])
+    finally:
+        exporter.stop()
@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+from salvo.histogram import Histogram
+
+
+def test_empty():
+    hist = Histogram()
+    assert len(hist) == 0
+    assert hist.mean == 0
+    assert hist.stdev == 0
+
+
+def test_record():
+    hist = Histogram()
+    for value in (0.1, 0.2, 0.3):
+        hist.record(value)
+    assert len(hist) == 3
+    assert hist.min == 0.1
+    assert hist.max == 0.3
+    assert hist.mean == pytest.approx(0.2)
+    assert hist.stdev == pytest.approx(0.0816, abs=1e-4)
+    assert sum(hist.counts.values()) == 3
+
+
+def test_bounded_size():
+    hist = Histogram()
+    for i in range(10000):
+        hist.record(i / 1000.0)
+    size = len(hist.counts)
+    for i in range(10000):
+        hist.record(i / 1000.0)
+    hist.record(hist.max_value * 10)
+    assert len(hist.counts) == size + 1 <= hist.size
+    assert len(hist) == 20001
+    assert hist.max == hist.max_value * 10
+
+
+def test_precision():
+    assert Histogram(1).size < Histogram(3).size < Histogram(5).size
+    # only the counters used take memory
+    hists = [Histogram(precision) for precision in (1, 3, 5)]
+    for hist in hists:
+        for i in range(1000):
+            hist.record(i / 1000.0)
+    sizes = [len(hist.counts) for hist in hists]
+    assert sizes == sorted(sizes)
+    assert sizes[2] <= 1000
+    with pytest.raises(ValueError):
+        Histogram(0)
+    with pytest.raises(ValueError):
+        Histogram(6)
+
+
+def test_merge():
+    one, two = Histogram(), Histogram()
+    one.record(0.1)
+    two.record(0.3)
+    two.record(0.5)
+    one.merge(two).merge(Histogram())
+    assert len(one) == 3
+    assert one.min == 0.1
+    assert one.max == 0.5
+    assert sum(one.counts.values()) == 3
+
+    with pytest.raises(ValueError):
+        one.merge(Histogram(significant_figures=2))
+
+
+def test_snapshot():
+    hist = Histogram(significant_figures=2)
+    for value in (0.001, 0.002, 0.002, 1.5):
+        hist.record(value)
+    data = json.loads(json.dumps(hist.snapshot()))
+    assert len(data["counts"]) == 3
+    copy = Histogram.from_snapshot(data)
+    assert copy.significant_figures == 2
+    assert copy.counts == hist.counts
+    assert (copy.count, copy.min, copy.max) == (4, 0.001, 1.5)
+    assert copy.percentiles([50, 99]) == hist.percentiles([50, 99])
+
+
+def test_reset():
+    hist = Histogram()
+    hist.record(1)
+    assert len(hist.reset()) == 0
+    assert sum(hist.counts.values()) == 0
+
+
+def test_percentiles():
+    hist = Histogram()
+    assert hist.percentiles([50, 100]) == {50: 0, 100: 0}
+
+    for i in range(1, 1001):
+        hist.record(i / 1000.0)
+    res = hist.percentiles([99.9, 50, 100, 0])
+    assert res[0] == 0.001
+    assert res[50] == pytest.approx(0.5, rel=1e-3)
+    assert res[99.9] == pytest.approx(0.999, rel=1e-3)
+    assert res[100] == 1.0
+    assert hist.value_at_percentile(90) == pytest.approx(0.9, rel=1e-3)
+
+
+def test_percentiles_recorded_since():
+    hist = Histogram()
+    hist.record(0.1)
+    assert hist.value_at_percentile(100) == 0.1
+    # the sorted counters are not stale
+    hist.record(0.2)
+    hist.merge(Histogram().merge(hist))
+    assert hist.percentiles([25, 75]) == {
+        25: pytest.approx(0.1, rel=1e-3),
+        75: pytest.approx(0.2, rel=1e-3),
+    }
+
+
+def test_percentiles_clamped():
+    hist = Histogram(max_value=1)
+    hist.record(0.5)
+    hist.record(5)
+    assert hist.value_at_percentile(100) == 5
+    assert hist.value_at_percentile(50) == pytest.approx(0.5, rel=1e-3)
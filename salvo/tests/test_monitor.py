@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+from salvo.monitor import LoopMonitor
+from salvo.output import RunResults
+
+
+async def _busy_run(monitor):
+    monitor.acquire()
+    monitor.acquire()
+    await asyncio.sleep(0.05)
+    # blocks the loop like a client short of CPU
+    time.sleep(0.1)
+    await asyncio.sleep(0.05)
+    await monitor.release()
+    # the probe runs until the last session is released
+    assert monitor._task is not None
+    await monitor.release()
+    assert monitor._task is None
+
+
+def test_loop_monitor():
+    res = RunResults(num=None, quiet=True)
+    monitor = LoopMonitor(res, interval=0.01)
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(_busy_run(monitor))
+    finally:
+        loop.close()
+    assert res.loop_lag.count > 2
+    assert res.loop_lag.max >= 0.09
+    assert res.cpu["time"] >= 0.0
+    assert 0 <= res.cpu["percent"] <= 100
+    assert res.saturated()
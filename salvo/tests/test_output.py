@@ -1,6 +1,12 @@
 import json
 import io
+import pickle
+import time
+import pytest
+from salvo.connector import connection_kind
 from salvo.output import print_errors, RunResults
+from salvo.phases import PhaseTimer
+from salvo.profile import parse_profile
 
 
 def one_print(func, *args):
@@ -25,8 +31,8 @@ def test_run_results_with_progress_no_res():
 def test_run_results_with_progress_no_tot():
     # corner case when total time is zero
     res = RunResults(server_info={"extra": "info"}, num=10)
-    res.incr(duration=1)
-    res.total_time = 0
+    res.incr(duration=1, start=10)
+    res.last_end = res.first_start
     output = one_print(res.print_stats)
     output = json.loads(one_print(res.print_json))
     assert output["count"] == 1
@@ -66,3 +72,387 @@ def test_run_results():
 
     output = json.loads(one_print(res.print_json))
     assert output["count"] == 10
+
+
+def test_run_results_histograms():
+    res = RunResults(num=None, quiet=True, significant_figures=2)
+    for i in range(1, 101):
+        res.incr(duration=i / 100.0)
+    res.incr(status=500, duration=2)
+
+    assert res.status_code_counter[200].significant_figures == 2
+    assert len(res.status_code_counter[200]) == 100
+    assert len(res.status_code_counter[500]) == 1
+
+    stats = res._calc_stats()
+    assert stats.count == 101
+    assert stats.min == 0.01
+    assert stats.max == 2
+    assert stats.avg == pytest.approx(52.5 / 101)
+
+
+def test_run_results_percentiles():
+    res = RunResults(num=None, quiet=True)
+    for i in range(1, 101):
+        res.incr(duration=i / 100.0)
+    res.incr(status=500, duration=2)
+
+    output = one_print(res.print_stats)
+    assert "Latency percentiles" in output
+    assert "Code 500" in output
+
+    output = json.loads(one_print(res.print_json))
+    assert output["percentiles"]["max"] == 2
+    assert output["percentiles"]["p50"] == pytest.approx(0.51, rel=1e-3)
+    assert output["status_codes"]["200"]["count"] == 100
+    assert output["status_codes"]["200"]["percentiles"]["max"] == 1
+    assert output["status_codes"]["500"]["percentiles"]["p99.9"] == 2
+
+
+def test_run_results_wall_time():
+    res = RunResults(num=None, quiet=True)
+    # two concurrent requests of 1s each, and a third one right after
+    res.incr(duration=1, start=10)
+    res.incr(duration=1, start=10.5)
+    res.incr(duration=0.5, start=11)
+
+    stats = res._calc_stats()
+    assert stats.total_time == 1.5
+    assert stats.cumulative_latency == 2.5
+    assert stats.rps == 2
+
+    output = one_print(res.print_stats)
+    assert "Wall time           \t\t1.5000 s" in output
+    assert "Cumulative latency  \t\t2.5000 s" in output
+
+
+def test_run_results_merge():
+    one = RunResults(num=10)
+    one.incr(duration=1, start=10)
+    one.errors[500] += 1
+    one.errors_desc[500] = "500, message='BAM'"
+
+    two = RunResults(num=None, quiet=True)
+    two.incr(duration=1, start=11)
+    two.incr(status=500, duration=2, start=11)
+    two.errors[500] += 1
+
+    # results are sent across processes
+    two = pickle.loads(pickle.dumps(two))
+    one.merge(pickle.loads(pickle.dumps(one))).merge(two)
+
+    assert len(one.status_code_counter[200]) == 3
+    assert len(one.status_code_counter[500]) == 1
+    assert one.errors[500] == 3
+    assert one.describe_errors() == ["500, message='BAM' (3 occurences)"]
+    assert one.total_time == 3
+
+
+def test_all_histogram_cached():
+    res = RunResults(num=None, quiet=True)
+    res.incr(duration=1, start=10)
+    res.incr(status=500, duration=2, start=10)
+    merged = res._all_histogram()
+    assert res._all_histogram() is merged
+    assert merged.count == 2
+    res.incr(status=500, duration=3, start=11)
+    assert res._all_histogram().count == 3
+    assert res._calc_stats().max == 3
+
+
+def test_run_results_transfer():
+    res = RunResults(num=None, quiet=True)
+    res.incr(duration=1, start=10, received=3000000, sent=100)
+    res.incr(duration=1, start=11, received=1000000, sent=100)
+    res.merge(pickle.loads(pickle.dumps(res)))
+    output = one_print(res.print_stats)
+    assert "Received            \t\t8.00 MB" in output
+    assert "Received per second \t\t4.00 MB/s" in output
+    assert "Sent per request    \t\t100 bytes" in output
+    output = json.loads(one_print(res.print_json))
+    assert output["transfer"]["sent"] == 400
+    assert "transfer" not in RunResults(num=None).get_json()
+
+
+def test_run_results_rate():
+    res = RunResults(num=None, quiet=True, rate=10)
+    res.incr(duration=1)
+    res.late += 2
+    res.dropped += 1
+    output = one_print(res.print_stats)
+    assert "Late requests       \t\t2" in output
+    output = json.loads(one_print(res.print_json))
+    assert output["rate"] == {"target": 10, "late": 2, "dropped": 1}
+    assert "rate" not in RunResults(num=None).get_json()
+
+
+def test_run_results_stages():
+    profile = parse_profile("steps:2:10", 20)
+    res = RunResults(num=None, quiet=True, profile=profile)
+    res.incr(duration=1, start=5)
+    profile.start(10)
+    res.incr(duration=1, start=11)
+    res.incr(duration=3, start=21)
+    res.incr(duration=2, start=25)
+
+    res = pickle.loads(pickle.dumps(res))
+    res.merge(RunResults(num=None, quiet=True, profile=profile))
+    assert [len(histogram) for histogram in res.stage_counter] == [1, 2]
+
+    output = one_print(res.print_stats)
+    assert "step 2 100%" in output
+    output = json.loads(one_print(res.print_json))
+    assert output["stages"][1]["count"] == 2
+    assert output["stages"][1]["rps"] == 0.2
+    assert output["stages"][1]["avg"] == 2.5
+
+
+def test_run_results_timeseries():
+    res = RunResults(num=None, quiet=True, interval=0.5)
+    res.incr(duration=0.2, start=10)
+    res.incr(status=500, duration=0.2, start=11)
+    output = json.loads(one_print(res.print_json))
+    assert [row["count"] for row in output["timeseries"]] == [1, 0, 1]
+    assert [row["errors"] for row in output["timeseries"]] == [0, 0, 1]
+
+
+def test_run_results_phases():
+    assert "phases" not in RunResults(num=None).get_json()
+
+    res = RunResults(num=None, quiet=True, phases=True)
+    timer = PhaseTimer()
+    timer.start, timer.connect, timer.headers = 10.0, 0.5, 11.0
+    res.record_phases(timer, 11.5)
+    timer = PhaseTimer()
+    timer.start, timer.headers = 12.0, 12.5
+    res.record_phases(timer, 13.0)
+
+    res = pickle.loads(pickle.dumps(res))
+    res.merge(RunResults(num=None, quiet=True, phases=True))
+    output = one_print(res.print_stats)
+    assert "Connection phases" in output
+    output = json.loads(one_print(res.print_json))
+    assert output["phases"]["dns"]["count"] == 0
+    assert output["phases"]["connect"]["count"] == 1
+    assert output["phases"]["ttfb"]["avg"] == 0.75
+    assert output["phases"]["body"]["count"] == 2
+
+
+def test_run_results_connections():
+    res = RunResults(num=None, quiet=True)
+    for start in range(10, 14):
+        res.incr(duration=1, start=start)
+    res.connections["new"] += 1
+    res.connections["reused"] += 3
+    res.merge(pickle.loads(pickle.dumps(res)))
+    output = one_print(res.print_stats)
+    assert "Reused connections  \t\t6" in output
+    output = json.loads(one_print(res.print_json))
+    assert output["connections"] == {
+        "new": 2,
+        "reused": 6,
+        "new_per_second": 0.5,
+        "requests_per_connection": 4,
+    }
+
+
+def _connect(res, kind):
+    # what salvo.connector.CountingConnector does for a request
+    res.connections[kind] += 1
+    connection_kind.set(kind)
+
+
+def test_run_results_warmup():
+    res = RunResults(num=None, quiet=True, warmup=2)
+    # the warm-up starts with the first request
+    _connect(res, "new")
+    assert not res.incr(200, 1, start=10)
+    _connect(res, "new")
+    assert not res.incr(500, 3, start=11.5)
+    _connect(res, "reused")
+    assert res.incr(200, 0.5, start=12)
+    # started during the warm-up, done after the first measured request
+    _connect(res, "reused")
+    assert not res.incr(200, 2, start=11.9)
+    assert res.done == 1
+    assert res.total_time == 0.5
+    assert len(res.timeseries) == 1
+    assert res.connections == {"new": 0, "reused": 1}
+
+    output = json.loads(one_print(res.print_json))
+    assert output["count"] == 1
+    warmup = output["warmup"]
+    assert warmup["count"] == 3
+    assert warmup["errors"] == 1
+    assert warmup["percentiles"]["max"] == 3
+    assert warmup["connections"] == {"new": 2, "reused": 1}
+    assert "Warm-up (not in the results)" in one_print(res.print_stats)
+
+    copy = RunResults.from_snapshot(json.loads(json.dumps(res.snapshot())))
+    assert copy.get_json() == res.get_json()
+    res.merge(copy)
+    assert res.get_json()["warmup"]["connections"] == {"new": 4, "reused": 2}
+
+
+def test_run_results_warmup_requests():
+    res = RunResults(num=4, quiet=True, warmup_requests=2)
+    for start in range(5):
+        res.incr(200, 1, start=start)
+    assert res.done == 3
+    assert res.warmup_counter.count == 2
+    assert res.first_start == 2
+    assert "warmup" not in RunResults(num=None, quiet=True).get_json()
+
+
+def test_run_results_endpoints():
+    assert "endpoints" not in RunResults(num=None).get_json()
+
+    res = RunResults(num=None, quiet=True, endpoints=["list", "order"])
+    res.incr(duration=1, start=10, endpoint="list")
+    res.incr(duration=3, start=10, endpoint="list")
+    res.incr(status=500, duration=1, start=11, endpoint="order")
+    res.merge(pickle.loads(pickle.dumps(res)))
+
+    output = one_print(res.print_stats)
+    assert "-------- Endpoints --------" in output
+    output = json.loads(one_print(res.print_json))
+    assert list(output["endpoints"]) == ["list", "order"]
+    assert output["endpoints"]["list"]["count"] == 4
+    assert output["endpoints"]["list"]["avg"] == 2
+    assert output["endpoints"]["order"]["errors"] == 2
+    assert output["count"] == 6
+
+
+def test_run_results_replay():
+    assert "replay" not in RunResults(num=None).get_json()
+
+    res = RunResults(num=None, quiet=True, replay=True, speedup=2)
+    res.replay["skipped"] += 1
+    res.late += 1
+    res.merge(pickle.loads(pickle.dumps(res)))
+    output = one_print(res.print_stats)
+    assert "Skipped lines       \t\t2" in output
+    output = json.loads(one_print(res.print_json))
+    assert output["replay"] == {"speedup": 2, "skipped": 2, "late": 2}
+    output = one_print(RunResults(num=None, quiet=True, replay=True).print_stats)
+    assert "as fast as possible" in output
+
+
+def test_run_results_client_saturation():
+    res = RunResults(num=None, quiet=True)
+    res.loop_lag.record(0.001)
+    res.record_cpu(0.5, 1.0)
+    assert not res.saturated()
+    assert "Warning" not in one_print(res.print_stats)
+
+    other = RunResults(num=None, quiet=True)
+    other.record_cpu(0.95, 1.0)
+    res.merge(pickle.loads(pickle.dumps(other)))
+    assert res.saturated()
+    output = json.loads(one_print(res.print_json))
+    assert output["client"]["cpu_time"] == pytest.approx(1.45)
+    assert output["client"]["cpu_percent"] == pytest.approx(95)
+    assert output["client"]["saturated"]
+
+    res = RunResults(num=None, quiet=True)
+    for _ in range(10):
+        res.loop_lag.record(0.1)
+    assert res.saturated()
+    output = json.loads(one_print(res.print_json))
+    assert output["client"]["loop_lag"]["count"] == 10
+    assert output["client"]["loop_lag"]["percentiles"]["p99"] == pytest.approx(0.1)
+    assert "The client was the bottleneck" in one_print(res.print_stats)
+
+
+def test_run_results_snapshot():
+    profile = parse_profile("steps:2:2", 4)
+    res = RunResults(
+        num=None,
+        quiet=True,
+        profile=profile,
+        phases=True,
+        endpoints=["home"],
+        rate=10,
+        loop="uvloop",
+    )
+    profile.start(100.0)
+    res.incr(200, 0.25, 100.5, received=10, endpoint="home")
+    res.incr(500, 0.5, 102.5, endpoint="home")
+    res.errors[500] += 1
+    res.errors_desc[500] = "500, message='Internal Server Error'"
+    timer = PhaseTimer()
+    timer.start = 100.5
+    timer.headers = 100.7
+    res.record_phases(timer, 100.75)
+    res.loop_lag.record(0.001)
+    res.record_cpu(1.0, 4.0)
+
+    data = json.loads(json.dumps(res.snapshot(clock_offset=1000.0)))
+    copy = RunResults.from_snapshot(data)
+    assert copy.first_start == 1100.5
+    assert copy.total_time == res.total_time
+    assert copy.done == 2
+    expected, output = res.get_json(), copy.get_json()
+    expected.pop("timeseries")
+    output.pop("timeseries")
+    assert output == expected
+    assert copy.errors_desc == {500: "500, message='Internal Server Error'"}
+    assert copy.describe_errors() == [
+        "500, message='Internal Server Error' (1 occurences)"
+    ]
+    assert copy.timeseries.origin == res.timeseries.origin + 1000
+    assert one_print(copy.print_stats) == one_print(res.print_stats)
+
+    # snapshots merge into the results of a run
+    merged = RunResults(
+        num=None, quiet=True, profile=profile, phases=True, endpoints=["home"], rate=10
+    )
+    merged.merge(copy).merge(RunResults.from_snapshot(data))
+    assert merged.get_json()["count"] == 4
+
+    data["version"] = 0
+    with pytest.raises(ValueError):
+        RunResults.from_snapshot(data)
+
+
+class TTY(io.StringIO):
+    def isatty(self):
+        return True
+
+
+def test_run_results_progress_tty():
+    res = RunResults(num=10)
+    res._progress_bar.stdout = stream = TTY()
+    res.start_progress()
+    for i in range(5):
+        res.incr(duration=0.1)
+    # nothing is drawn by incr itself
+    res.stop_progress()
+    output = stream.getvalue()
+    assert output.endswith("50%")
+    assert "\n" not in output
+    # stopping twice is harmless
+    res.stop_progress()
+
+
+def test_run_results_progress_status_lines(monkeypatch):
+    monkeypatch.setattr("salvo.output.STATUS_INTERVAL", 0.01)
+    res = RunResults(num=10)
+    res._progress_bar.stdout = stream = io.StringIO()
+    res.start_progress()
+    for i in range(10):
+        res.incr(duration=0.1)
+    time.sleep(0.05)
+    res.stop_progress()
+    lines = stream.getvalue().splitlines()
+    assert len(lines) > 1
+    assert lines[-1] == "100% - 10 requests"
+
+
+def test_run_results_progress_quiet():
+    res = RunResults(num=10, quiet=True)
+    res.start_progress()
+    assert res.timer is None
+    res = RunResults(num=None)
+    res.start_progress()
+    assert res.timer is None
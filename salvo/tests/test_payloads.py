@@ -0,0 +1,76 @@
+from collections import Counter
+
+import pytest
+
+from salvo import payloads
+from salvo.payloads import PayloadPool, from_callable, load_payloads
+
+
+def test_from_callable():
+    calls = []
+
+    def data(method, url, options):
+        calls.append((method, url))
+        return "payload %d" % len(calls)
+
+    pool = from_callable(data, 3, "POST", "http://localhost")
+    assert pool == [b"payload 1", b"payload 2", b"payload 3"]
+    assert calls == [("POST", "http://localhost")] * 3
+
+    with pytest.raises(ValueError):
+        from_callable(lambda *args: {"a": 1}, 1, "POST", "http://localhost")
+
+
+def test_from_directory(tmp_path):
+    (tmp_path / "b.json").write_bytes(b"2")
+    (tmp_path / "a.json").write_bytes(b"1")
+    (tmp_path / "sub").mkdir()
+    assert load_payloads(str(tmp_path)) == [b"1", b"2"]
+
+
+def test_from_directory_mapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(payloads, "MMAP_THRESHOLD", 2)
+    (tmp_path / "a.json").write_bytes(b"1")
+    (tmp_path / "b.json").write_bytes(b"22")
+    (tmp_path / "c.json").write_bytes(b"333")
+    loaded = load_payloads(str(tmp_path))
+    # the large files are only mapped when handed out
+    assert isinstance(loaded[0], bytes)
+    assert isinstance(loaded[1], payloads.MappedFile)
+    pool = PayloadPool(loaded)
+    sent = [pool.next() for _ in range(3)]
+    assert [bytes(payload) for payload in sent] == [b"1", b"22", b"333"]
+    assert isinstance(sent[1], memoryview)
+
+
+@pytest.mark.parametrize("threshold", [payloads.MMAP_THRESHOLD, 0])
+def test_from_ndjson(tmp_path, monkeypatch, threshold):
+    monkeypatch.setattr(payloads, "MMAP_THRESHOLD", threshold)
+    path = tmp_path / "payloads.ndjson"
+    path.write_bytes(b'{"a": 1}\n\n{"a": 2}\n{"a": 3}')
+    pool = load_payloads(str(path))
+    assert [bytes(payload) for payload in pool] == [
+        b'{"a": 1}',
+        b'{"a": 2}',
+        b'{"a": 3}',
+    ]
+    assert isinstance(pool[0], memoryview) == (threshold == 0)
+
+
+def test_pool_cycle():
+    pool = PayloadPool([b"a", b"b", b"c"])
+    assert len(pool) == 3
+    assert [pool.next() for _ in range(5)] == [b"a", b"b", b"c", b"a", b"b"]
+
+
+def test_pool_random():
+    pool = PayloadPool([b"a", b"b"], order="random", seed=1)
+    counts = Counter(pool.next() for _ in range(1000))
+    assert 400 < counts[b"a"] < 600
+
+
+def test_pool_invalid():
+    with pytest.raises(ValueError):
+        PayloadPool([])
+    with pytest.raises(ValueError):
+        PayloadPool([b"a"], order="sorted")
@@ -0,0 +1,27 @@
+from salvo.phases import PHASES, PhaseTimer
+
+
+def test_new_connection():
+    timer = PhaseTimer()
+    timer.start = 10.0
+    timer.dns = 0.5
+    timer.connect = 1.5
+    timer.sent = 11.5
+    timer.headers = 13.0
+    durations = timer.durations(end=13.25)
+    assert list(durations) == list(PHASES)
+    assert durations == {"dns": 0.5, "connect": 1.0, "ttfb": 1.5, "body": 0.25}
+
+
+def test_reused_connection():
+    timer = PhaseTimer()
+    timer.start = 10.0
+    timer.headers = 11.0
+    durations = timer.durations(end=11.0)
+    assert durations == {"dns": None, "connect": None, "ttfb": 1.0, "body": 0.0}
+
+
+def test_no_response():
+    timer = PhaseTimer()
+    timer.start = 10.0
+    assert set(timer.durations(end=11.0).values()) == {None}
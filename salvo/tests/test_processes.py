@@ -0,0 +1,14 @@
+from salvo.processes import split, merge_molotov_results
+
+
+def test_split():
+    assert split(10, 3) == [4, 3, 3]
+    assert split(4, 4) == [1, 1, 1, 1]
+    assert sum(split(1001, 7)) == 1001
+
+
+def test_merge_molotov_results():
+    res = merge_molotov_results(
+        [{"OK": 1, "FAILED": 2, "RATIO": 0.5}, {"OK": 3, "FAILED": 0, "RATIO": 0.1}]
+    )
+    assert res == {"OK": 4, "FAILED": 2, "RATIO": 0.5}
@@ -0,0 +1,99 @@
+import asyncio
+import time
+import pytest
+
+from salvo.output import RunResults
+from salvo.profile import parse_profile
+from salvo.rate import ArrivalSchedule
+from salvo.tests.support import dedicatedloop
+
+
+def test_ramp():
+    profile = parse_profile("ramp:10", 20)
+    assert [name for name, _, _ in profile.stages] == [
+        "ramp 0%-20%",
+        "ramp 20%-40%",
+        "ramp 40%-60%",
+        "ramp 60%-80%",
+        "ramp 80%-100%",
+        "hold 100%",
+    ]
+    assert [profile.level(t) for t in (0, 5, 10, 15)] == [0, 0.5, 1, 1]
+    # the area under the ramp is 5, 50 requests at a rate of 10
+    assert profile.elapsed_at(5) == 10
+    assert profile.elapsed_at(0.5) == pytest.approx(10**0.5)
+    assert profile.elapsed_at(10) == 15
+
+
+def test_steps():
+    profile = parse_profile("steps:4:5", 30)
+    assert profile.stages[0] == ("step 1 25%", 0, 5)
+    assert profile.stages[-1] == ("step 4 100%", 15, 30)
+    assert [profile.level(t) for t in (0, 5, 10, 19.9, 25)] == [
+        0.25,
+        0.5,
+        0.75,
+        1,
+        1,
+    ]
+    assert profile.elapsed_at(1.25) == 5
+    assert profile.elapsed_at(6.25) == pytest.approx(13.3333, rel=1e-4)
+
+
+def test_spike():
+    profile = parse_profile("spike:5:2:0.5", 20)
+    assert [stage for stage, _, _ in profile.stages] == [
+        "before spike",
+        "spike",
+        "after spike",
+    ]
+    assert [profile.level(t) for t in (0, 5, 6, 7, 8)] == [0.5, 1, 1, 0.5, 0.5]
+
+
+def test_truncated_stages():
+    profile = parse_profile("steps:4:5", 12)
+    assert profile.stages == [
+        ("step 1 25%", 0, 5),
+        ("step 2 50%", 5, 10),
+        ("step 3 75%", 10, 12),
+    ]
+
+
+@pytest.mark.parametrize(
+    "spec",
+    ["nope:1", "ramp", "ramp:a", "ramp:0", "steps:1.5:2", "spike:1:2:3", "spike:1"],
+)
+def test_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_profile(spec, 10)
+
+
+@dedicatedloop
+def test_wait_active():
+    profile = parse_profile("steps:2:0.2", 1)
+    start = time.perf_counter()
+
+    async def _wait():
+        await profile.wait_active(0, 2)
+        first = time.perf_counter() - start
+        await profile.wait_active(1, 2)
+        return first, time.perf_counter() - start
+
+    first, second = asyncio.get_event_loop().run_until_complete(_wait())
+    assert first < 0.1
+    assert 0.2 <= second < 0.4
+
+
+@dedicatedloop
+def test_rate_profile():
+    profile = parse_profile("steps:2:0.1", 1)
+    schedule = ArrivalSchedule(100, RunResults(num=None, quiet=True), profile=profile)
+
+    async def _slots():
+        return [await schedule.next_slot() for _ in range(10)]
+
+    slots = asyncio.get_event_loop().run_until_complete(_slots())
+    intervals = [round(b - a, 6) for a, b in zip(slots, slots[1:])]
+    # half the rate during the first step
+    assert intervals == [0.02] * 5 + [0.01] * 4
+    assert profile.origin == slots[0]
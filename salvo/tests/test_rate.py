@@ -0,0 +1,58 @@
+import asyncio
+import time
+import pytest
+
+from salvo.output import RunResults
+from salvo.rate import ArrivalSchedule
+from salvo.tests.support import dedicatedloop
+
+
+def _slots(schedule, count):
+    async def _next():
+        return [await schedule.next_slot() for _ in range(count)]
+
+    return asyncio.get_event_loop().run_until_complete(_next())
+
+
+def test_invalid_rate():
+    with pytest.raises(ValueError):
+        ArrivalSchedule(0, RunResults(num=None, quiet=True))
+
+
+@dedicatedloop
+def test_constant_rate():
+    res = RunResults(num=None, quiet=True)
+    schedule = ArrivalSchedule(100, res)
+    start = time.perf_counter()
+    slots = _slots(schedule, 5)
+    assert time.perf_counter() - start >= 0.04
+    assert [round(b - a, 6) for a, b in zip(slots, slots[1:])] == [0.01] * 4
+    assert res.dropped == 0
+
+
+@dedicatedloop
+def test_poisson_rate():
+    res = RunResults(num=None, quiet=True)
+    schedule = ArrivalSchedule(1000, res, poisson=True, seed=1)
+    slots = _slots(schedule, 50)
+    intervals = [b - a for a, b in zip(slots, slots[1:])]
+    assert len(set(intervals)) == len(intervals)
+    assert 0.0005 < sum(intervals) / len(intervals) < 0.002
+
+
+@dedicatedloop
+def test_late_and_dropped():
+    res = RunResults(num=None, quiet=True)
+
+    # the schedule started one second ago and no slot was taken since
+    schedule = ArrivalSchedule(100, res)
+    schedule.start(time.perf_counter() - 1)
+    _slots(schedule, 10)
+    assert res.late == 10
+    assert res.dropped == 0
+
+    schedule = ArrivalSchedule(100, res, max_lag=0.5)
+    schedule.start(time.perf_counter() - 1)
+    _slots(schedule, 1)
+    assert 49 <= res.dropped <= 51
+    assert res.late == 11
@@ -0,0 +1,172 @@
+import asyncio
+import gzip
+import time
+from unittest.mock import patch
+
+import pytest
+
+from salvo import replay as _replay
+from salvo.output import RunResults
+from salvo.replay import LogReplay, parse_line
+from salvo.tests.support import dedicatedloop
+
+
+LINE = (
+    '127.0.0.1 - - [10/Oct/2020:13:55:%02d +0000] "%s %s HTTP/1.1" 200 612 '
+    '"-" "curl/7.68.0"\n'
+)
+
+
+def _log(tmp_path, lines, name="access.log"):
+    path = str(tmp_path / name)
+    opener = gzip.open if name.endswith(".gz") else open
+    with opener(path, "wt") as f:
+        f.writelines(lines)
+    return path
+
+
+def _requests(replay):
+    async def _all():
+        requests = []
+        while True:
+            request = await replay.next_request()
+            if request is None:
+                return requests
+            requests.append(request)
+
+    return asyncio.get_event_loop().run_until_complete(_all())
+
+
+def test_parse_line():
+    timestamp, method, path = parse_line(LINE % (36, "GET", "/a?b=1"))
+    assert (method, path) == ("GET", "/a?b=1")
+    assert timestamp == 1602338136
+    common = '1.2.3.4 - bob [10/Oct/2020:13:55:36 +0200] "POST /orders HTTP/1.0" 200 2'
+    assert parse_line(common)[0] == 1602338136 - 7200
+    assert parse_line("garbage") is None
+    assert parse_line(LINE % (36, "CONNECT", "/")) is None
+    assert parse_line(LINE % (36, "GET", "http://example.com/")) is None
+    assert parse_line(LINE.replace("Oct", "Foo") % (36, "GET", "/")) is None
+
+
+@dedicatedloop
+def test_as_fast_as_possible(tmp_path):
+    lines = [LINE % (i, "GET", "/%d" % i) for i in range(0, 50, 10)]
+    path = _log(tmp_path, lines[:2] + ["garbage\n"] + lines[2:], "access.log.gz")
+    res = RunResults(num=None, quiet=True, replay=True)
+    replay = LogReplay(path, res)
+    start = time.perf_counter()
+    requests = _requests(replay)
+    assert time.perf_counter() - start < 1
+    assert [path for _, _, path in requests] == ["/0", "/10", "/20", "/30", "/40"]
+    assert res.replay["skipped"] == 1
+    assert res.late == 0
+
+
+@dedicatedloop
+def test_speedup(tmp_path):
+    path = _log(tmp_path, [LINE % (i, "GET", "/") for i in (0, 1, 1, 2, 0)])
+    res = RunResults(num=None, quiet=True, replay=True, speedup=20)
+    start = time.perf_counter()
+    requests = _requests(LogReplay(path, res, speedup=20))
+    assert time.perf_counter() - start >= 0.1
+    starts = [round(start - requests[0][0], 6) for start, _, _ in requests]
+    # the two requests of the second second are spread across it
+    assert starts == [0, 0.05, 0.075, 0.1, 0]
+    # the last line is older than the previous ones
+    assert res.late == 1
+
+
+@dedicatedloop
+def test_spread_second(tmp_path):
+    lines = [LINE % (second, "GET", "/") for second in range(3) for _ in range(10)]
+    path = _log(tmp_path, lines)
+    res = RunResults(num=None, quiet=True, replay=True, speedup=5)
+    replay = LogReplay(path, res, speedup=5)
+    latencies = []
+
+    async def _worker():
+        while True:
+            request = await replay.next_request()
+            if request is None:
+                return
+            # a 5ms request, its latency measured from when it is due
+            await asyncio.sleep(0.005)
+            latencies.append(time.perf_counter() - request[0])
+
+    async def _workers():
+        await asyncio.gather(*[_worker() for _ in range(4)])
+
+    asyncio.get_event_loop().run_until_complete(_workers())
+    # 10 requests a second, due every 20ms rather than all at once
+    assert len(latencies) == 30
+    assert res.late == 0
+    assert sum(latencies) / len(latencies) < 0.01
+
+
+@dedicatedloop
+def test_shards_spread(tmp_path):
+    path = _log(tmp_path, [LINE % (0, "GET", "/%d" % i) for i in range(4)])
+    origin = time.perf_counter()
+    starts = []
+    for shard in range(2):
+        res = RunResults(num=None, quiet=True, replay=True, speedup=20)
+        replay = LogReplay(path, res, speedup=20, shard=shard, shards=2, origin=origin)
+        starts.append([round(start - origin, 6) for start, _, _ in _requests(replay)])
+    # spread according to their position among the requests of all shards
+    assert starts == [[0, 0.025], [0.0125, 0.0375]]
+
+
+@dedicatedloop
+def test_shards(tmp_path):
+    path = _log(tmp_path, [LINE % (i, "GET", "/%d" % i) for i in range(5)])
+    paths = []
+    for shard in range(2):
+        res = RunResults(num=None, quiet=True, replay=True)
+        replay = LogReplay(path, res, shard=shard, shards=2)
+        paths.append([path for _, _, path in _requests(replay)])
+    assert paths == [["/0", "/2", "/4"], ["/1", "/3"]]
+
+
+@dedicatedloop
+def test_shards_origin(tmp_path):
+    path = _log(tmp_path, ["garbage\n"] + [LINE % (i, "GET", "/") for i in range(4)])
+    origin = time.perf_counter()
+    starts = []
+    for shard in range(2):
+        res = RunResults(num=None, quiet=True, replay=True, speedup=20)
+        replay = LogReplay(path, res, speedup=20, shard=shard, shards=2, origin=origin)
+        starts.append([round(start - origin, 6) for start, _, _ in _requests(replay)])
+    # the shards replay the log on the same clock
+    assert starts == [[0.05, 0.15], [0, 0.1]]
+
+
+@dedicatedloop
+def test_read_ahead(tmp_path):
+    path = _log(tmp_path, [LINE % (0, "GET", "/%d" % i) for i in range(25)])
+    res = RunResults(num=None, quiet=True, replay=True)
+    replay = LogReplay(path, res)
+
+    async def _worker(paths):
+        while True:
+            request = await replay.next_request()
+            if request is None:
+                return
+            paths.append(request[2])
+            await asyncio.sleep(0)
+
+    async def _workers():
+        paths = []
+        await asyncio.gather(*[_worker(paths) for _ in range(4)])
+        return paths
+
+    with patch.object(_replay, "READ_AHEAD", 10):
+        paths = asyncio.get_event_loop().run_until_complete(_workers())
+    # read in three batches, in order, out of the event loop
+    assert paths == ["/%d" % i for i in range(25)]
+
+
+def test_invalid_speedup(tmp_path):
+    res = RunResults(num=None, quiet=True, replay=True)
+    with pytest.raises(ValueError):
+        LogReplay(_log(tmp_path, []), res, speedup=0)
@@ -0,0 +1,99 @@
+import gzip
+import io
+import json
+
+import pytest
+
+from salvo.output import RunResults
+from salvo.report import compare_runs, load_results, print_comparison, save_results
+
+
+def _run(latency, rps=100, seconds=5, errors=0):
+    res = RunResults(num=None, quiet=True, server_info={"software": "Test"})
+    step = 1.0 / rps
+    for index in range(rps * seconds):
+        # a little noise, around the latency
+        duration = latency * (1 + (index % 7) / 70.0)
+        status = 500 if index < errors else 200
+        res.incr(status, duration, start=100 + index * step)
+        if status == 500:
+            res.errors[500] += 1
+    return res
+
+
+def test_save_load(tmpdir):
+    path = str(tmpdir.join("run.salvo"))
+    res = _run(0.01, errors=2)
+    res.errors_desc[500] = "500, message='Internal Server Error'"
+    save_results(path, res, ["http://localhost", "-d", "5"])
+    copy, data = load_results(path)
+    assert data["argv"] == ["http://localhost", "-d", "5"]
+    assert copy.server_info == {"software": "Test"}
+    assert copy.get_json() == res.get_json()
+    assert copy.describe_errors() == res.describe_errors()
+    assert "(2 occurences)" in copy.describe_errors()[0]
+
+
+def test_load_invalid(tmpdir):
+    path = tmpdir.join("run.salvo")
+    for content in (b"not gzip", gzip.compress(b"{}"), gzip.compress(b"[1")):
+        path.write_binary(content)
+        with pytest.raises(ValueError):
+            load_results(str(path))
+    with pytest.raises(ValueError):
+        load_results(str(tmpdir.join("missing.salvo")))
+
+    save_results(str(path), _run(0.01), [])
+    data = json.loads(gzip.decompress(path.read_binary()))
+    data["version"] = 99
+    path.write_binary(gzip.compress(json.dumps(data).encode()))
+    with pytest.raises(ValueError, match="version 99"):
+        load_results(str(path))
+
+
+def test_compare_same():
+    comparison = compare_runs(_run(0.01), _run(0.01))
+    assert not comparison["regression"]
+    assert comparison["metrics"]["p50"]["change"] == 0
+    assert comparison["latency"]["p"] == pytest.approx(0.5)
+
+
+def test_compare_slower():
+    comparison = compare_runs(_run(0.01), _run(0.012))
+    assert comparison["latency"]["regression"]
+    assert comparison["metrics"]["avg"]["change"] == pytest.approx(0.2)
+    assert comparison["regression"]
+    # below the threshold, significant or not
+    assert not compare_runs(_run(0.01), _run(0.0102))["regression"]
+    # faster is not a regression
+    assert not compare_runs(_run(0.012), _run(0.01))["regression"]
+
+
+def test_compare_throughput():
+    comparison = compare_runs(_run(0.01, rps=100), _run(0.01, rps=50))
+    assert comparison["throughput"]["regression"]
+    assert comparison["throughput"]["p"] < 0.05
+    assert comparison["metrics"]["rps"]["change"] == pytest.approx(-0.5, abs=0.01)
+
+    # a single interval can't be tested
+    comparison = compare_runs(_run(0.01, seconds=1), _run(0.01, rps=50, seconds=1))
+    assert comparison["throughput"]["p"] is None
+    assert not comparison["regression"]
+
+
+def test_compare_errors():
+    comparison = compare_runs(_run(0.01), _run(0.01, errors=50))
+    assert comparison["metrics"]["error_rate"]["new"] == pytest.approx(0.1)
+    # no errors to compare with, and no infinity in JSON
+    assert comparison["metrics"]["error_rate"]["change"] is None
+    json.dumps(comparison, allow_nan=False)
+
+
+def test_compare_from_zero():
+    comparison = compare_runs(_run(0), _run(0.01))
+    assert comparison["metrics"]["avg"]["change"] is None
+    assert comparison["latency"]["regression"]
+    stream = io.StringIO()
+    print_comparison(comparison, stream)
+    assert "inf" not in stream.getvalue()
+    assert stream.getvalue().splitlines()[4].endswith("n/a")
@@ -1,25 +1,29 @@
 from unittest.mock import patch
+import socket
 import sys
 import io
+import json
 import pytest
 
+from salvo.trace import process_path
 from salvo.util import raise_response_error
+from salvo.report import load_results
 from salvo.run import main
-from salvo.tests.support import coserver, dedicatedloop
+from salvo.tests.support import agents, coserver, dedicatedloop
 from salvo import __version__
 
 
 @dedicatedloop
 def _test(*args):
     code = 0
-    testargs = [sys.executable] + list(args)
     main_res = molotov_res = None
 
+    # the command line is given to main, not read from sys.argv
     with patch("sys.stdout", new_callable=io.StringIO) as stdout, patch.object(
-        sys, "argv", testargs
+        sys, "argv", [sys.executable, "--unused"]
     ), coserver():
         try:
-            main_res, molotov_res = main()
+            main_res, molotov_res = main(list(args))
         except SystemExit as e:
             code = e.code
 
@@ -202,3 +206,461 @@ def test_data_not_callable():
         "2",
     )
     assert res["OK"] == 2, res
+
+
+def test_read_body():
+    args = "http://localhost:8888", "-m", "POST", "-D", "DATA", "-n", "2"
+    res = get_salvo_res(*args, "--read-body").get_json()
+    assert res["transfer"]["received"] == 8
+    assert res["transfer"]["sent"] == 8
+    assert res["transfer"]["received_per_request"] == 4
+    assert "transfer" not in get_salvo_res(*args).get_json()
+
+
+def test_connector_options():
+    url = "http://localhost:8888"
+    res = get_salvo_res(url, "-n", "2", "-c", "2", "--pool-limit", "1")
+    assert len(res.status_code_counter[200]) == 4
+    res = get_salvo_res(url, "-n", "2", "--force-close", "--dns-ttl", "0")
+    assert res.connections["new"] == 2
+
+
+def test_resolve():
+    res = get_salvo_res(
+        "http://salvo.test:8888", "-n", "2", "--resolve", "salvo.test:8888:127.0.0.1"
+    )
+    assert len(res.status_code_counter[200]) == 2
+
+
+def test_connector_options_invalid():
+    assert_code(1, "--pool-limit", "-1", "http://localhost:8888")
+    assert_code(1, "--force-close", "--keepalive-timeout", "1", "http://localhost:8888")
+    assert_code(1, "--dns-ttl", "-1", "http://localhost:8888")
+    assert_code(1, "--resolve", "localhost", "http://localhost:8888")
+
+
+def _scenario_file(tmp_path):
+    spec = {
+        "endpoints": [
+            {"name": "home", "path": "/", "weight": 3},
+            {"name": "error", "path": "/error"},
+            {"name": "post", "path": "/", "method": "POST", "json": {"a": 1}},
+        ]
+    }
+    path = tmp_path / "scenario.json"
+    path.write_text(json.dumps(spec))
+    return str(path)
+
+
+def test_scenario_file(tmp_path):
+    path = _scenario_file(tmp_path)
+    args = "http://localhost:8888", "-n", "10", "-c", "2", "--scenario-file", path
+    res = get_salvo_res(*args).get_json()
+    endpoints = res["endpoints"]
+    assert sum(endpoint["count"] for endpoint in endpoints.values()) == 20
+    assert endpoints["error"]["errors"] == endpoints["error"]["count"]
+    assert endpoints["home"]["errors"] == endpoints["post"]["errors"] == 0
+
+
+def test_scenario_file_base_url(tmp_path):
+    path = tmp_path / "scenario.json"
+    spec = {"base_url": "http://localhost:1", "endpoints": [{"path": "/"}]}
+    path.write_text(json.dumps(spec))
+    # the URL of the command line takes precedence over the file's one
+    args = "http://localhost:8888", "-n", "2", "--scenario-file", str(path)
+    res = get_salvo_res(*args)
+    assert len(res.status_code_counter[200]) == 2
+
+
+def test_scenario_file_processes(tmp_path):
+    path = _scenario_file(tmp_path)
+    args = "http://localhost:8888", "-n", "5", "-c", "2", "-p", "2"
+    res = get_salvo_res(*args, "--scenario-file", path).get_json()
+    assert sum(endpoint["count"] for endpoint in res["endpoints"].values()) == 10
+
+
+def test_scenario_file_invalid(tmp_path):
+    path = _scenario_file(tmp_path)
+    assert_code(1, "--scenario-file", path)
+    assert_code(1, "--scenario-file", path, "-D", "data", "http://localhost:8888")
+    assert_code(1, "--scenario-file", "missing.json", "http://localhost:8888")
+
+
+def _access_log(tmp_path, count):
+    line = '127.0.0.1 - - [10/Oct/2020:13:55:%02d +0000] "GET %s HTTP/1.1" 200 2\n'
+    path = tmp_path / "access.log"
+    paths = ["/error" if i % 4 == 3 else "/" for i in range(count)]
+    path.write_text("".join(line % (i // 2, p) for i, p in enumerate(paths)))
+    return str(path)
+
+
+def test_replay(tmp_path):
+    path = _access_log(tmp_path, 8)
+    code, stdout, res, _ = _test("replay", path, "http://localhost:8888", "-c", "2")
+    assert code == 0
+    assert "Replaying %s" % path in stdout
+    assert res.replay == {"speedup": None, "skipped": 0}
+    assert len(res.status_code_counter[200]) == 6
+    assert len(res.status_code_counter[500]) == 2
+
+
+def test_replay_speedup(tmp_path):
+    path = _access_log(tmp_path, 8)
+    args = "replay", path, "http://localhost:8888", "--speedup", "10", "-p", "2"
+    res = get_salvo_res(*args, "-c", "4").get_json()
+    assert res["count"] == 8
+    assert res["total_time"] >= 0.3
+    assert res["replay"]["speedup"] == 10
+    assert res["replay"]["skipped"] == 0
+
+
+def test_replay_invalid(tmp_path):
+    path = _access_log(tmp_path, 2)
+    assert_code(1, "replay", path, "http://localhost:8888", "--speedup", "0")
+    assert_code(1, "replay", path, "http://localhost:8888", "--rate", "10")
+    assert_code(1, "replay", "-", "http://localhost:8888", "-p", "2")
+    assert_code(2, "replay", "http://localhost:8888", "--speedup")
+
+
+def test_pregenerate():
+    args = "http://localhost:8888", "-m", "POST", "-n", "3", "--read-body"
+    data = "py:salvo.tests.test_run.get_data"
+    res = get_salvo_res(*args, "-D", data, "--pregenerate", "2")
+    assert res.bytes_sent == res.bytes_received == 12
+
+
+def test_payloads(tmp_path):
+    path = tmp_path / "payloads.ndjson"
+    path.write_text('{"a": 1}\n{"a": 22}\n')
+    args = "http://localhost:8888", "-m", "POST", "-n", "3", "--read-body"
+    res = get_salvo_res(*args, "--payloads", str(path), "-c", "2")
+    # the workers share the pool
+    assert res.bytes_sent == (8 + 9) * 3
+    assert res.bytes_sent == res.bytes_received
+
+
+def test_payloads_invalid(tmp_path):
+    path = tmp_path / "payloads.ndjson"
+    path.write_text("")
+    url = "http://localhost:8888"
+    assert_code(1, url, "-m", "POST", "--payloads", str(path))
+    assert_code(1, url, "--payloads", str(tmp_path))
+    assert_code(1, url, "-m", "POST", "-D", "DATA", "--pregenerate", "2")
+    assert_code(
+        1, url, "-m", "POST", "-D", "py:salvo.tests.test_run.nope", "--pregenerate", "2"
+    )
+
+
+def test_processes():
+    args = "http://localhost:8888", "-n", "3", "-c", "5", "-p", "2"
+    code, stdout, res, molotov_res = _test(*args)
+    assert molotov_res["OK"] == 15, molotov_res
+    assert molotov_res["MAX_WORKERS"] == 5, molotov_res
+    assert len(res.status_code_counter[200]) == 15
+    assert res.done == 15
+
+
+def test_processes_errors():
+    code, stdout, res, _ = _test(
+        "http://localhost:8888/error", "-n", "2", "-c", "2", "-p", "2"
+    )
+    assert len(res.status_code_counter[500]) == 4, res
+    assert res.errors[500] == 4
+    # the descriptions merged from the processes keep their counts
+    assert "500, message='Internal Server Error'" in stdout
+    assert "(4 occurences)" in stdout
+
+
+def test_processes_invalid():
+    assert_code(1, "-p", "0", "http://localhost:8888")
+
+
+def test_rate():
+    args = "http://localhost:8888", "-n", "5", "-c", "2", "--rate", "50", "--json"
+    res = get_salvo_res(*args)
+    assert len(res.status_code_counter[200]) == 10
+    # 10 requests at 50 per second
+    assert res.total_time >= 0.18
+    assert res.get_json()["rate"]["target"] == 50
+
+
+def test_rate_processes():
+    args = "http://localhost:8888", "-n", "2", "-c", "2", "-p", "2", "--rate", "20"
+    res = get_salvo_res(*args)
+    assert len(res.status_code_counter[200]) == 4
+    assert res.rate == 20
+
+
+def test_rate_options():
+    assert_code(1, "--poisson", "http://localhost:8888")
+    assert_code(1, "--max-lag", "1", "http://localhost:8888")
+    assert_code(1, "--rate", "0", "http://localhost:8888")
+
+
+def test_profile():
+    res = get_salvo_res("http://localhost:8888", "-d", "2", "--profile", "steps:2:1")
+    counts = [len(histogram) for histogram in res.stage_counter]
+    assert 0 < counts[0]
+    assert 0 < counts[1]
+    # requests sent after the last stage are not part of it
+    assert sum(counts) <= len(res.status_code_counter[200])
+
+
+def test_profile_rate():
+    args = "http://localhost:8888", "-d", "2", "--rate", "20", "-c", "2"
+    res = get_salvo_res(*args, "--profile", "ramp:2")
+    # 20 requests during the ramp, the first fifth gets 1/25th of them
+    counts = [len(histogram) for histogram in res.stage_counter]
+    assert 18 <= sum(counts[:5]) <= 21
+    assert counts[0] < counts[4]
+
+
+def test_profile_options():
+    assert_code(1, "--profile", "ramp:2", "http://localhost:8888")
+    assert_code(1, "-d", "1", "--profile", "ramp", "http://localhost:8888")
+
+
+def test_find_capacity():
+    args = "http://localhost:8888", "--find-capacity", "--probe-duration", "1"
+    code, stdout, _, _ = _test(*args, "--slo", "p99<1us")
+    assert code == 1
+    assert "FAIL" in stdout
+    assert "No load level met the objectives" in stdout
+
+    assert_code(1, *args, "--slo", "p99")
+    assert_code(1, *args, "--max-error-rate", "nope")
+    assert_code(1, *args, "-d", "2", "--profile", "ramp:1")
+    assert_code(1, *args, "-c", "8", "--max-concurrency", "4")
+    assert_code(1, *args, "--rate", "8", "--max-rate", "4")
+
+
+def test_timeseries_csv(tmp_path):
+    path = str(tmp_path / "timeseries.csv")
+    res = get_salvo_res("http://localhost:8888", "-d", "1", "--timeseries-csv", path)
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == len(res.timeseries) + 1
+    assert sum(int(line.split(",")[1]) for line in lines[1:]) == len(
+        res.status_code_counter[200]
+    )
+
+
+def test_invalid_interval():
+    assert_code(1, "--interval", "0", "http://localhost:8888")
+
+
+def test_loop():
+    res = get_salvo_res("http://localhost:8888", "-n", "2", "--loop", "asyncio")
+    assert res.get_json()["loop"] == "asyncio"
+    assert_code(2, "http://localhost:8888", "--loop", "tokio")
+
+
+def test_loop_fallback():
+    with patch.dict(sys.modules, {"uvloop": None}):
+        code, stdout, res, _ = _test("http://localhost:8888", "--loop", "uvloop")
+    assert code == 0
+    assert "uvloop isn't installed" in stdout
+    assert res.loop == "asyncio"
+
+
+def test_warmup():
+    args = "http://localhost:8888", "-n", "2", "-c", "2", "--warmup-requests", "1"
+    res = get_salvo_res(*args).get_json()
+    assert res["count"] == 4
+    assert res["warmup"]["count"] == 2
+
+    args = "http://localhost:8888", "-d", "1", "-c", "4", "--warmup", "0.5"
+    res = get_salvo_res(*args)
+    assert res.warmup_counter.count > 0
+    # a connection per request, those in flight at the end of the warm-up
+    # included
+    warmup = res.warmup["connections"]
+    assert warmup["new"] + warmup["reused"] == res.warmup_counter.count
+    assert res.connections["new"] + res.connections["reused"] == res.done
+    # Molotov stops the run within half a second or so
+    assert 0.5 < res.total_time < 2
+
+    assert_code(1, "http://localhost:8888", "--warmup", "1")
+    assert_code(1, "http://localhost:8888", "-d", "1", "--warmup-requests", "1")
+    assert_code(1, "http://localhost:8888", "-d", "2", "--warmup", "-1")
+    assert_code(2, "http://localhost:8888", "--warmup", "1", "--warmup-requests", "1")
+    args = "http://localhost:8888", "-d", "2", "--warmup", "1"
+    assert_code(1, *args, "--profile", "ramp:1")
+
+
+def test_abort_on(tmp_path):
+    path = str(tmp_path / "run.salvo")
+    args = "http://localhost:8888/error", "-d", "10", "--abort-on", "errors>50% over 1s"
+    assert_code(3, *args, "--save", path)
+    res, _ = load_results(path)
+    assert res.aborted.startswith("errors>50% over 1s: 100.00% of errors")
+    assert res.total_time < 5
+
+    # the first process to break the rule stops the others
+    assert_code(3, *args, "-c", "2", "-p", "2", "--save", path)
+    res, _ = load_results(path)
+    assert res.aborted is not None
+    assert res.total_time < 5
+
+    # and the coordinator stops the other agents
+    with agents(2) as addresses:
+        assert_code(3, *args, "-c", "2", "--agents", addresses, "--save", path)
+    res, _ = load_results(path)
+    assert res.total_time < 5
+
+    args = "http://localhost:8888", "-n", "2"
+    assert get_salvo_res(*args, "--abort-on", "max>10s").aborted is None
+    assert_code(1, *args, "--abort-on", "p99>1")
+    assert_code(1, *args, "--find-capacity", "--abort-on", "p99>1s")
+
+
+def _statsd_requests(*args):
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    server.settimeout(5)
+    try:
+        address = "127.0.0.1:%d" % server.getsockname()[1]
+        res = get_salvo_res(*args, "--statsd", address)
+        requests = 0
+        while requests < res.done:
+            for line in server.recv(65536).decode().splitlines():
+                if line.startswith("salvo.requests:"):
+                    requests += int(line.split(":")[1].split("|")[0])
+        return requests, res.done
+    finally:
+        server.close()
+
+
+@pytest.mark.parametrize("options", [(), ("-p", "2", "-c", "2")])
+def test_statsd(options):
+    requests, done = _statsd_requests("http://localhost:8888", "-d", "2", *options)
+    # the intervals of the processes are merged as they complete
+    assert requests == done
+
+
+def test_statsd_agents():
+    with agents(2) as addresses:
+        requests, done = _statsd_requests(
+            "http://localhost:8888", "-d", "2", "-c", "2", "--agents", addresses
+        )
+    assert requests == done
+
+
+def test_export_options():
+    assert_code(1, "http://localhost:8888", "--statsd", "localhost")
+    assert_code(1, "http://localhost:8888", "--find-capacity", "--statsd", "a:1")
+
+
+def test_save_report_compare(tmp_path, capsys):
+    base, new = str(tmp_path / "base.salvo"), str(tmp_path / "new.salvo")
+    res = get_salvo_res("http://localhost:8888", "-d", "2", "--save", base)
+    get_salvo_res("http://localhost:8888", "-d", "2", "--save", new)
+    assert_code(1, "http://localhost:8888", "--find-capacity", "--save", base)
+
+    capsys.readouterr()
+    with patch.object(sys, "argv", ["salvo", "report", base]):
+        report = main()
+    assert "-d 2 --save" in capsys.readouterr().out
+    assert report.get_json()["count"] == res.get_json()["count"]
+
+    with patch.object(sys, "argv", ["salvo", "compare", base, new, "--alpha", "2"]):
+        with pytest.raises(SystemExit) as e:
+            main()
+    assert e.value.code == 1
+    with patch.object(sys, "argv", ["salvo", "compare", base, base]):
+        assert not main()["regression"]
+    with patch.object(sys, "argv", ["salvo", "compare", base, str(tmp_path)]):
+        with pytest.raises(SystemExit) as e:
+            main()
+    assert e.value.code == 2
+
+
+def test_agents():
+    with agents(2) as addresses:
+        args = "http://localhost:8888", "-n", "2", "-c", "3", "--phases"
+        res = get_salvo_res(*args, "--agents", addresses)
+    # 3 workers split across the agents
+    assert len(res.status_code_counter[200]) == 6
+    assert res.phase_counter["ttfb"].count == 6
+    assert res.connections["new"] == 6
+    assert res.total_time > 0
+
+
+def test_agents_errors():
+    assert_code(1, "http://localhost:8888", "--agents", "localhost")
+    assert_code(1, "replay", "access.log", "http://localhost:8888", "--agents", "a:1")
+    with agents(1) as addresses:
+        addresses += ",127.0.0.1:1"
+        code, stdout, _, _ = _test(
+            "http://localhost:8888", "-c", "2", "--agents", addresses
+        )
+    assert code == 1
+    assert stdout.splitlines()[-1].startswith("Can't reach the agent 127.0.0.1:1")
+
+
+def test_agents_refused():
+    with agents(1) as addresses:
+        code, stdout, _, _ = _test(
+            "http://localhost:8888", "--agents", addresses, "--pre-hook", "a.b"
+        )
+    # a line per agent, not a traceback
+    assert code == 1
+    assert stdout.splitlines()[-1] == (
+        "Agent %s failed: The agent refuses --pre-hook, see salvo agent --help"
+        % addresses
+    )
+
+
+def test_agents_token():
+    with agents(1, ["--token", "secret"]) as addresses:
+        args = "http://localhost:8888", "--agents", addresses
+        for token in ((), ("--agent-token", "other")):
+            code, stdout, _, _ = _test(*args, *token)
+            assert code == 1
+            last = stdout.splitlines()[-1]
+            assert last == "Agent %s failed: Wrong agent token" % addresses
+        res = get_salvo_res(*args, "--agent-token", "secret")
+    assert len(res.status_code_counter[200]) == 1
+
+
+def test_phases():
+    res = get_salvo_res("http://localhost:8888", "-n", "4", "-c", "1", "--phases")
+    res = res.get_json()
+    # the test server closes its connections
+    assert res["connections"]["new"] == 4
+    assert res["phases"]["connect"]["count"] == 4
+    assert res["phases"]["ttfb"]["count"] == 4
+
+
+def test_client_monitor():
+    res = get_salvo_res("http://localhost:8888", "-n", "2", "-c", "2", "-p", "2")
+    client = res.get_json()["client"]
+    assert client["cpu_time"] > 0
+    assert 0 < client["cpu_percent"]
+    assert "p99" in client["loop_lag"]["percentiles"]
+
+
+def test_phases_processes():
+    args = "http://localhost:8888/error", "-n", "2", "-c", "2", "-p", "2"
+    res = get_salvo_res(*args, "--phases").get_json()
+    assert res["connections"]["new"] == 4
+    assert res["phases"]["ttfb"]["count"] == 4
+
+
+def test_trace_file(tmp_path):
+    path = str(tmp_path / "trace.csv")
+    get_salvo_res("http://localhost:8888", "-n", "3", "-c", "2", "--trace-file", path)
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 7
+    assert sorted(line.split(",")[-1] for line in lines[1:]) == ["0"] * 3 + ["1"] * 3
+
+
+def test_trace_file_processes(tmp_path):
+    path = str(tmp_path / "trace.ndjson")
+    args = "http://localhost:8888/error", "-n", "2", "-c", "2", "-p", "2"
+    get_salvo_res(*args, "--trace-file", path)
+    for index in range(2):
+        with open(process_path(path, index)) as f:
+            records = [json.loads(line) for line in f]
+        assert [record["status"] for record in records] == [500, 500]
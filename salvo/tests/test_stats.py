@@ -0,0 +1,54 @@
+import math
+
+import pytest
+
+from salvo.histogram import Histogram
+from salvo.stats import incomplete_beta, mann_whitney, normal_sf, student_sf, welch
+
+
+def _histogram(values, significant_figures=3):
+    histogram = Histogram(significant_figures=significant_figures)
+    for value in values:
+        histogram.record(value)
+    return histogram
+
+
+def test_distributions():
+    assert normal_sf(0) == pytest.approx(0.5)
+    assert normal_sf(1.96) == pytest.approx(0.025, abs=1e-4)
+    assert incomplete_beta(2, 3, 0.4) == pytest.approx(0.5248)
+    assert student_sf(2.0, 10) == pytest.approx(0.036694, abs=1e-6)
+    assert student_sf(-1.5, 4) == pytest.approx(0.896, abs=1e-6)
+    # converges to the normal distribution
+    assert student_sf(1.96, 1e6) == pytest.approx(normal_sf(1.96), abs=1e-5)
+    assert student_sf(float("inf"), 3) == 0.0
+
+
+def test_mann_whitney():
+    base = _histogram([0.001, 0.002, 0.003, 0.004, 0.005])
+    new = _histogram([0.006, 0.007, 0.008, 0.009, 0.010])
+    # U = 25, its mean 12.5 and its deviation 4.787
+    assert mann_whitney(base, new) == pytest.approx(2.611, abs=1e-3)
+    assert mann_whitney(new, base) == pytest.approx(-2.611, abs=1e-3)
+    assert mann_whitney(base, base) == 0
+    assert mann_whitney(base, Histogram()) == 0
+    # different precisions are compared on the values
+    coarse = _histogram([0.006, 0.007, 0.008, 0.009, 0.010], 1)
+    assert mann_whitney(base, coarse) > 2
+
+
+def test_mann_whitney_ties():
+    # all the values in one bucket
+    base = _histogram([0.001] * 10)
+    assert mann_whitney(base, _histogram([0.001] * 10)) == 0
+
+
+def test_welch():
+    t, df = welch([1, 2, 3, 4], [2, 3, 4, 5, 6])
+    assert t == pytest.approx(1.5667, abs=1e-4)
+    assert df == pytest.approx(6.98, abs=0.01)
+    assert welch([1, 1], [1, 1]) == (0.0, 2)
+    t, _ = welch([2, 2], [1, 1])
+    assert math.isinf(t) and t < 0
+    with pytest.raises(ValueError):
+        welch([1], [1, 2])
@@ -0,0 +1,106 @@
+import io
+import json
+import pickle
+
+import pytest
+
+from salvo.timeseries import TimeSeries
+
+
+def _series(origin=100.0, interval=1.0):
+    series = TimeSeries(interval)
+    series.record(origin + 0.5, 0.5)
+    series.record(origin + 0.9, 0.2, error=True)
+    # nothing completed during the next two seconds
+    series.record(origin + 3.2, 1.5)
+    return series
+
+
+def test_record():
+    series = _series()
+    assert len(series) == 4
+    assert series.origin == 100
+    assert series.buckets[1] is None
+
+    rows = series.rows()
+    assert [row["time"] for row in rows] == [0, 1, 2, 3]
+    assert [row["count"] for row in rows] == [2, 0, 0, 1]
+    assert [row["errors"] for row in rows] == [1, 0, 0, 0]
+    assert rows[0]["avg"] == pytest.approx(0.35)
+    assert rows[0]["percentiles"]["max"] == 0.5
+    assert rows[1]["percentiles"]["p99"] == 0
+    assert rows[3]["rps"] == 1
+
+
+def test_failures():
+    series = _series()
+    series.record_failure(101.5)
+    series.record_failure(101.7)
+    assert [row["failed"] for row in series.rows()] == [0, 2, 0, 0]
+    # errors stay the HTTP errors
+    assert series.rows()[1]["errors"] == 0
+
+    copy = TimeSeries.from_snapshot(series.snapshot())
+    series.merge(copy)
+    assert series.rows()[1]["failed"] == 4
+
+    empty = TimeSeries()
+    empty.record_failure(50.0)
+    assert empty.origin == 50
+
+
+def test_interval():
+    series = _series(interval=0.5)
+    assert [row["count"] for row in series.rows()] == [0, 2, 0, 0, 0, 0, 1]
+    with pytest.raises(ValueError):
+        TimeSeries(0)
+
+
+def test_snapshot():
+    series = _series()
+    data = json.loads(json.dumps(series.snapshot(clock_offset=1000.0)))
+    copy = TimeSeries.from_snapshot(data)
+    assert copy.origin == 1100.0
+    assert copy.buckets[1] is None
+    assert copy.rows() == series.rows()
+    assert TimeSeries.from_snapshot(TimeSeries().snapshot()).origin is None
+
+    # the intervals from the third one
+    part = TimeSeries.from_snapshot(series.snapshot(start=2, end=4))
+    assert part.origin == 100
+    assert [row["count"] for row in part.rows()] == [0, 0, 0, 1]
+    assert series.completed(102.5) == 2
+    assert TimeSeries().completed(102.5) == 0
+
+
+def test_merge():
+    series = _series()
+    series.merge(TimeSeries())
+    series.merge(pickle.loads(pickle.dumps(_series(origin=102.0))))
+    assert [row["count"] for row in series.rows()] == [2, 0, 2, 1, 0, 1]
+
+    # a series starting earlier
+    series.merge(_series(origin=99.0))
+    assert series.origin == 99
+    assert [row["count"] for row in series.rows()] == [2, 2, 0, 3, 1, 0, 1]
+    assert sum(row["errors"] for row in series.rows()) == 3
+
+    empty = TimeSeries()
+    empty.merge(_series())
+    assert empty.origin == 100
+    assert len(empty) == 4
+
+    with pytest.raises(ValueError):
+        series.merge(TimeSeries(2))
+
+
+def test_write_csv():
+    stream = io.StringIO()
+    series = _series()
+    series.record_failure(101.5)
+    series.write_csv(stream)
+    lines = stream.getvalue().splitlines()
+    assert lines[0] == "time,count,errors,failed,rps,avg,p50,p90,p99,max"
+    assert lines[1].startswith("0,2,1,0,2.00,0.350000,")
+    assert lines[2] == "1,0,0,1,0.00,0.000000,0.000000,0.000000,0.000000,0.000000"
+    assert len(lines) == 5
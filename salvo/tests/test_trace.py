@@ -0,0 +1,67 @@
+import gzip
+import json
+import os
+
+from salvo.trace import TraceWriter, process_path, trace_format
+
+
+def _write(path, count=25, batch_size=10):
+    trace = TraceWriter(path, origin=100, batch_size=batch_size)
+    for i in range(count):
+        trace.add(100 + i, 0.5, 200, 12, i % 3)
+    trace.close()
+
+
+def test_trace_format():
+    assert trace_format("trace.csv") == "csv"
+    assert trace_format("trace") == "csv"
+    assert trace_format("trace.ndjson") == "ndjson"
+    assert trace_format("trace.jsonl.gz") == "ndjson"
+
+
+def test_csv(tmp_path):
+    path = str(tmp_path / "trace.csv")
+    _write(path)
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert lines[0] == "start,duration,status,bytes,worker"
+    assert lines[1] == "0.000000,0.500000,200,12,0"
+    assert lines[-1] == "24.000000,0.500000,200,12,0"
+    assert len(lines) == 26
+
+
+def test_ndjson_gzip(tmp_path):
+    path = str(tmp_path / "trace.ndjson.gz")
+    _write(path, count=5)
+    with gzip.open(path, "rt") as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 5
+    assert records[2] == {
+        "start": 2,
+        "duration": 0.5,
+        "status": 200,
+        "bytes": 12,
+        "worker": 2,
+    }
+
+
+def test_batches(tmp_path):
+    path = str(tmp_path / "trace.csv")
+    trace = TraceWriter(path, batch_size=10)
+    for i in range(9):
+        trace.add(trace.origin, 0.1, 200, 0, 0)
+    assert len(trace._batch) == 9
+    trace.add(trace.origin, 0.1, 200, 0, 0)
+    # the full batch went to the writer thread
+    assert trace._batch == []
+    trace.close()
+    with open(path) as f:
+        assert len(f.readlines()) == 11
+
+
+def test_process_path():
+    assert process_path("trace.csv.gz", 1) == "trace-1.csv.gz"
+    assert process_path("trace", 2) == "trace-2"
+    assert process_path(os.path.join("a.b", "t.csv"), 0) == os.path.join(
+        "a.b", "t-0.csv"
+    )
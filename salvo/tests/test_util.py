@@ -1,8 +1,11 @@
+import asyncio
 import pytest
 import io
+import sys
 from unittest import mock
 
-from salvo.util import get_server_info, print_server_info, resolve
+from salvo.util import available_loop, get_server_info, print_server_info, resolve
+from salvo.util import use_loop
 
 
 @mock.patch("salvo.util.request")
@@ -26,3 +29,21 @@ def test_resolve():
 
     with pytest.raises(ImportError):
         resolve("OoO")
+
+
+def test_available_loop():
+    assert available_loop("asyncio") == "asyncio"
+    with mock.patch.dict(sys.modules, {"uvloop": None}):
+        assert available_loop("uvloop") == "asyncio"
+
+
+def test_use_loop():
+    old_loop = asyncio.get_event_loop()
+    try:
+        use_loop("asyncio")
+        loop = asyncio.get_event_loop()
+        assert loop is not old_loop
+        assert isinstance(loop, asyncio.SelectorEventLoop)
+        loop.close()
+    finally:
+        asyncio.set_event_loop(old_loop)
@@ -0,0 +1,175 @@
+"""
+Time series of a run, with requests bucketed by completion time.
+"""
+
+import csv
+
+from salvo.histogram import Histogram, percentile_label
+
+
+# the percentiles of the time series, coarser than the run ones
+PERCENTILES = (50, 90, 99, 100)
+
+
+class _Bucket(object):
+    __slots__ = ("histogram", "errors", "failed")
+
+    def __init__(self, significant_figures):
+        self.histogram = Histogram(significant_figures=significant_figures)
+        self.errors = 0
+        # requests that got no response
+        self.failed = 0
+
+
+class TimeSeries(object):
+    """Requests bucketed in fixed intervals of `interval` seconds.
+
+    Each bucket counts the requests and errors completed in its interval,
+    with a small histogram of their durations, and the requests that
+    failed without a response. The histograms default to
+    one significant figure so that a bucket weighs a few kilobytes and an
+    hour long run stays in the tens of megabytes.
+
+    Intervals without any request are not allocated until reported.
+    """
+
+    def __init__(self, interval=1.0, significant_figures=1):
+        if interval <= 0:
+            raise ValueError("The interval must be positive")
+        self.interval = interval
+        self.significant_figures = significant_figures
+        # perf_counter() value of the start of the first bucket
+        self.origin = None
+        self.buckets = []
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def _bucket(self, index):
+        buckets = self.buckets
+        if index >= len(buckets):
+            buckets.extend([None] * (index + 1 - len(buckets)))
+        bucket = buckets[index]
+        if bucket is None:
+            bucket = buckets[index] = _Bucket(self.significant_figures)
+        return bucket
+
+    def record(self, end, duration, error=False):
+        """Records a request completed at `end`, a perf_counter() value."""
+        if self.origin is None:
+            self.origin = end - duration
+        bucket = self._bucket(int((end - self.origin) / self.interval))
+        bucket.histogram.record(duration)
+        if error:
+            bucket.errors += 1
+
+    def record_failure(self, end):
+        """Records a request that failed without a response at `end`."""
+        if self.origin is None:
+            self.origin = end
+        self._bucket(int((end - self.origin) / self.interval)).failed += 1
+
+    def merge(self, other):
+        """Adds the buckets of `other`, aligned on their origins."""
+        if other.interval != self.interval:
+            raise ValueError("Can't merge time series with different intervals")
+        if other.origin is None:
+            return self
+        if self.origin is None:
+            self.origin = other.origin
+        shift = int(round((other.origin - self.origin) / self.interval))
+        if shift < 0:
+            self.buckets[:0] = [None] * -shift
+            self.origin -= -shift * self.interval
+            shift = 0
+        for index, bucket in enumerate(other.buckets):
+            if bucket is None:
+                continue
+            target = self._bucket(index + shift)
+            target.histogram.merge(bucket.histogram)
+            target.errors += bucket.errors
+            target.failed += bucket.failed
+        return self
+
+    def completed(self, now):
+        """Returns the number of intervals completed at `now`."""
+        if self.origin is None:
+            return 0
+        return int((now - self.origin) / self.interval)
+
+    def snapshot(self, clock_offset=0.0, start=0, end=None):
+        """Returns the series as a dict of JSON types.
+
+        `clock_offset` is added to the origin, to move it to another clock.
+        Only the intervals from `start` to `end` are included with them.
+        """
+        buckets = []
+        for bucket in self.buckets[start:end]:
+            if bucket is None:
+                buckets.append(None)
+            else:
+                buckets.append(
+                    {
+                        "histogram": bucket.histogram.snapshot(),
+                        "errors": bucket.errors,
+                        "failed": bucket.failed,
+                    }
+                )
+        return {
+            "interval": self.interval,
+            "significant_figures": self.significant_figures,
+            "origin": None if self.origin is None else self.origin + clock_offset,
+            "start": start,
+            "buckets": buckets,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data):
+        """Rebuilds a series from the dict returned by snapshot()."""
+        series = cls(data["interval"], data["significant_figures"])
+        series.origin = data["origin"]
+        # saved before the partial snapshots
+        start = data.get("start", 0)
+        series.buckets = [None] * start
+        for index, bucket in enumerate(data["buckets"], start):
+            series.buckets.append(None)
+            if bucket is not None:
+                target = series._bucket(index)
+                target.histogram = Histogram.from_snapshot(bucket["histogram"])
+                target.errors = bucket["errors"]
+                target.failed = bucket["failed"]
+        return series
+
+    def row(self, index):
+        """Returns the counts and latencies of the interval `index`, as a dict."""
+        if index < len(self.buckets) and self.buckets[index] is not None:
+            bucket = self.buckets[index]
+            histogram, errors = bucket.histogram, bucket.errors
+            failed = bucket.failed
+        else:
+            histogram = Histogram(significant_figures=self.significant_figures)
+            errors = failed = 0
+        values = histogram.percentiles(PERCENTILES)
+        return {
+            "time": index * self.interval,
+            "count": histogram.count,
+            "errors": errors,
+            "failed": failed,
+            "rps": histogram.count / self.interval,
+            "avg": histogram.mean,
+            "percentiles": {percentile_label(p): values[p] for p in PERCENTILES},
+        }
+
+    def rows(self):
+        """Returns a list of dicts, one per interval."""
+        return [self.row(index) for index in range(len(self.buckets))]
+
+    def write_csv(self, stream):
+        labels = [percentile_label(p) for p in PERCENTILES]
+        writer = csv.writer(stream)
+        writer.writerow(["time", "count", "errors", "failed", "rps", "avg"] + labels)
+        for row in self.rows():
+            values = ["%g" % row["time"], row["count"], row["errors"], row["failed"]]
+            values += ["%.2f" % row["rps"], "%.6f" % row["avg"]]
+            values += ["%.6f" % row["percentiles"][label] for label in labels]
+            writer.writerow(values)
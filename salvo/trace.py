@@ -0,0 +1,101 @@
+"""
+Per-request trace log, written by a background thread.
+"""
+
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+
+
+FIELDS = ("start", "duration", "status", "bytes", "worker")
+_CSV = "%.6f,%.6f,%d,%d,%d\n"
+
+
+def _csv_lines(batch):
+    return "".join([_CSV % record for record in batch])
+
+
+def _ndjson_lines(batch):
+    return "".join([json.dumps(dict(zip(FIELDS, record))) + "\n" for record in batch])
+
+
+_FORMATS = {"csv": _csv_lines, "ndjson": _ndjson_lines}
+
+
+def trace_format(path):
+    """Returns the format of a trace file, guessed from its extension."""
+    if path.endswith(".gz"):
+        path = path[:-3]
+    if path.endswith(".ndjson") or path.endswith(".jsonl"):
+        return "ndjson"
+    return "csv"
+
+
+class TraceWriter(object):
+    """Streams one record per request to `path`.
+
+    Records hold the start of the request in seconds from `origin`, a
+    time.perf_counter() value, its duration, status code, size in bytes
+    and the id of the worker that sent it. The format is CSV or NDJSON
+    depending on the extension of the file, compressed with gzip when it
+    ends with ``.gz``.
+
+    The event loop only appends records to a list. Full batches of
+    `batch_size` records are handed to a thread that formats and writes
+    them, so the file is never written from the event loop.
+    """
+
+    def __init__(self, path, origin=None, batch_size=1000):
+        if origin is None:
+            origin = time.perf_counter()
+        self.path = path
+        self.origin = origin
+        self.batch_size = batch_size
+        self.format = trace_format(path)
+        self._lines = _FORMATS[self.format]
+        self._batch = []
+        self._queue = queue.Queue()
+
+        if path.endswith(".gz"):
+            self._file = gzip.open(path, "wt")
+        else:
+            self._file = open(path, "w")
+        if self.format == "csv":
+            self._file.write(",".join(FIELDS) + "\n")
+
+        self._thread = threading.Thread(target=self._write)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def add(self, start, duration, status, size, worker):
+        batch = self._batch
+        batch.append((start - self.origin, duration, status, size, worker))
+        if len(batch) >= self.batch_size:
+            self._queue.put(batch)
+            self._batch = []
+
+    def _write(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                break
+            self._file.write(self._lines(batch))
+
+    def close(self):
+        """Writes the pending records and closes the file."""
+        if self._batch:
+            self._queue.put(self._batch)
+            self._batch = []
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+
+def process_path(path, index):
+    """Returns the trace file of process `index`, eg. trace-1.csv.gz"""
+    directory, filename = os.path.split(path)
+    name, dot, extensions = filename.partition(".")
+    return os.path.join(directory, "%s-%d%s%s" % (name, index, dot, extensions))
@@ -1,8 +1,14 @@
+import asyncio
 import importlib
 import sys
 
 from molotov.util import request
-from aiohttp import ClientResponseError
+from aiohttp import ClientResponseError, ClientSession
+
+from salvo.connector import SharedConnector
+
+
+LOOPS = ("asyncio", "uvloop")
 
 
 def raise_response_error(resp, status, message):
@@ -12,9 +18,31 @@ def raise_response_error(resp, status, message):
     raise err
 
 
-def get_server_info(url, method, headers):
+def _resolved_request(url, verb, headers, addresses):
+    # molotov.util.request can't be given a connector, which needs a loop
+    async def _request():
+        connector = SharedConnector({}, addresses)
+        session = ClientSession(connector=connector.acquire(), connector_owner=False)
+        try:
+            async with session.request(verb, url, headers=headers) as resp:
+                return {"status": resp.status, "headers": resp.headers}
+        finally:
+            await session.close()
+            await connector.release()
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(_request())
+    finally:
+        loop.close()
+
+
+def get_server_info(url, method, headers, addresses=None):
     info = {}
-    res = request(url, "HEAD", headers=headers)
+    if addresses:
+        res = _resolved_request(url, "HEAD", headers, addresses)
+    else:
+        res = request(url, "HEAD", headers=headers)
     server = res["headers"].get("server", "Unknown")
     info["software"] = server
     if headers:
@@ -49,3 +77,37 @@ def resolve(name):
     if func is None:
         raise ImportError(f"Cannot find '{name}'")
     return func
+
+
+def available_loop(name):
+    """Returns `name`, or "asyncio" when uvloop is asked but not installed."""
+    if name == "uvloop":
+        try:
+            import uvloop  # NOQA
+        except ImportError:
+            return "asyncio"
+    return name
+
+
+def use_loop(name):
+    """Sets a new event loop of kind `name` as the current one.
+
+    Molotov runs in the current loop, and closes it at the end of the run.
+    """
+    if name == "uvloop":
+        import uvloop
+
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    else:
+        asyncio.set_event_loop_policy(None)
+    asyncio.set_event_loop(asyncio.new_event_loop())
+
+
+def warmup_requests(args):
+    """Returns the warm-up requests of all the workers of `args`, or None.
+
+    --warmup-requests is given per worker, like --requests.
+    """
+    if args.warmup_requests is None:
+        return None
+    return args.warmup_requests * args.concurrency
@@ -32,6 +32,7 @@ setup(
     zip_safe=False,
     classifiers=classifiers,
     install_requires=install_requires,
+    extras_require={"yaml": ["PyYAML"], "toml": ["toml"], "uvloop": ["uvloop"]},
     test_suite="unittest.collector",
     entry_points="""
       [console_scripts]